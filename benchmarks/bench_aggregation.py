@@ -0,0 +1,48 @@
+"""
+Benchmarks for gene set and cluster aggregation, and the aggregation reducers
+"""
+import numpy as np
+import pytest
+from snakes import aggregation, clustering, gene_sets
+
+# custom reducers defined in snakes.aggregation, and some common pandas reducers
+REDUCERS = ["num_zero", "num_nonzero", "num_positive", "num_negative", "ratio_zero",
+            "ratio_nonzero", "ratio_positive", "ratio_negative", "sum_abs", "sum", "mean",
+            "median", "var"]
+
+
+def _get_gene_sets(dat, size=100, seed=1):
+    """Returns random gene sets, with one gene set per 100 genes"""
+    rng = np.random.default_rng(seed)
+
+    num_sets = max(dat.shape[0] // size, 1)
+
+    return {"gene_set_{}".format(i): list(rng.choice(dat.index, size, replace=False))
+            for i in range(num_sets)}
+
+
+@pytest.mark.parametrize("func", ["sum", "num_nonzero"])
+def bench_gene_set_apply(benchmark, dat, func):
+    gsets = _get_gene_sets(dat)
+
+    benchmark(gene_sets.gene_set_apply, dat, gsets, func)
+
+
+def bench_hclust(benchmark, dat):
+    # missing values are not supported by scikit-learn's clustering
+    dat = dat.fillna(0)
+
+    benchmark.pedantic(clustering.hclust, args=(dat, 10), rounds=1, iterations=1)
+
+
+@pytest.mark.parametrize("func", ["mean", "ratio_positive"])
+def bench_cluster_apply(benchmark, dat, func):
+    clusters = ["cluster_{}".format(i % 10) for i in range(dat.shape[0])]
+
+    benchmark(clustering.cluster_apply, dat, clusters, func)
+
+
+@pytest.mark.parametrize("func", REDUCERS)
+def bench_reducer(benchmark, dat, func):
+    """Reducers applied to each column, as in gene set and cluster aggregation"""
+    benchmark(dat.apply, aggregation.get_agg_func(func))
@@ -0,0 +1,62 @@
+"""
+Benchmarks for row and column filters
+"""
+import operator
+import numpy as np
+from snakes import filters, stats
+
+
+def bench_filter_rows_by_func(benchmark, dat):
+    benchmark(filters.filter_rows_by_func, dat, func=np.var, op=operator.gt, quantile=0.5)
+
+
+def bench_filter_rows_by_func_stats(benchmark, dat):
+    """Variance filter using precomputed summary statistics"""
+    dat_stats = stats.compute_stats(dat)
+
+    benchmark(filters.filter_rows_by_func, dat, func=np.var, op=operator.gt, quantile=0.5,
+              stats=dat_stats)
+
+
+def bench_filter_cols_by_func(benchmark, dat):
+    benchmark(filters.filter_cols_by_func, dat, func=np.mean, op=operator.gt, quantile=0.1)
+
+
+def bench_filter_data_by_func(benchmark, dat):
+    benchmark(filters.filter_data_by_func, dat, func=np.sum, axis=1, op=operator.gt, value=0)
+
+
+def bench_filter_rows_by_col(benchmark, dat):
+    benchmark(filters.filter_rows_by_col, dat, col=dat.columns[0], op=operator.gt, quantile=0.5)
+
+
+def bench_filter_rows_by_na(benchmark, dat):
+    benchmark(filters.filter_rows_by_na, dat, op=operator.le, value=0.01)
+
+
+def bench_filter_rows_by_nonzero(benchmark, dat):
+    benchmark(filters.filter_rows_by_nonzero, dat, op=operator.gt, quantile=0.5)
+
+
+def bench_filter_rows_col_not_na(benchmark, dat):
+    benchmark(filters.filter_rows_col_not_na, dat, col=dat.columns[0])
+
+
+def bench_filter_rows_col_val_in(benchmark, dat):
+    values = dat[dat.columns[0]].sample(frac=0.5, random_state=1).tolist()
+
+    benchmark(filters.filter_rows_col_val_in, dat, col=dat.columns[0], values=values)
+
+
+def bench_filter_rows_col_val_not_in(benchmark, dat):
+    values = dat[dat.columns[0]].sample(frac=0.5, random_state=1).tolist()
+
+    benchmark(filters.filter_rows_col_val_not_in, dat, col=dat.columns[0], values=values)
+
+
+def bench_filter_rows_by_group_func(benchmark, dat):
+    """Group-wise variance filter, with groups of ~10 rows"""
+    dat = dat.assign(group=np.arange(dat.shape[0]) // 10)
+
+    benchmark(filters.filter_rows_by_group_func, dat, group="group", col=dat.columns[0],
+              func="np.var", op=operator.gt, quantile=0.5)
@@ -0,0 +1,39 @@
+"""
+Benchmarks for cross-dataset correlation and training set construction
+"""
+import pytest
+from conftest import make_dataset
+from snakes import integration, training_sets
+
+
+@pytest.mark.parametrize("method", ["pearson", "spearman"])
+def bench_cross_cor(benchmark, dat, method):
+    """Correlations between the samples of two datasets with shared genes"""
+    other = make_dataset(dat.shape[0], 50, seed=2)
+
+    benchmark.pedantic(integration.cross_cor, args=(dat, other),
+                       kwargs={"axis": 0, "method": method}, rounds=1, iterations=1)
+
+
+def bench_load_features(benchmark, dat, tmp_path):
+    """Combining two feature datasets (samples x genes)"""
+    infiles = []
+
+    for i, genes in enumerate([dat.index[::2], dat.index[1::2]]):
+        infile = str(tmp_path / "features_{}.feather".format(i))
+        dat.loc[genes].T.reset_index().to_feather(infile)
+        infiles.append(infile)
+
+    benchmark(training_sets.load_features, infiles, include_column_prefix=True)
+
+
+def bench_create_training_sets(benchmark, dat):
+    """Training sets for 10 response variables"""
+    features = dat.T.sort_index()
+    response = make_dataset(10, features.shape[0], seed=2).T
+    response.index = features.index
+
+    def create_training_sets():
+        return list(training_sets.create_training_sets(features, response))
+
+    benchmark(create_training_sets)
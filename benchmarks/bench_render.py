@@ -0,0 +1,63 @@
+"""
+Benchmarks for Snakefile rendering with large numbers of datasets and actions
+
+Rendering time should grow linearly with the total number of actions; compare the mean time
+per action ("extra_info") across sizes.
+"""
+import sys
+import pytest
+import yaml
+from snakes import SnakefileRenderer
+
+# actions applied to each dataset, in turn
+ACTIONS = [
+    {"filter_rows_max_na": {"value": 0}},
+    {"filter_rows_min_nonzero": {"value": 2}},
+    {"filter_rows_sum_gt": {"value": 10}},
+    {"filter_rows_var_gt": {"value": 0}},
+    "transform_log2p",
+    "transform_zscore",
+]
+
+# number of datasets, each with 15 actions
+NUM_DATASETS = [100, 400, 1600]
+NUM_ACTIONS = 15
+
+
+def write_config(path, num_datasets, num_actions=NUM_ACTIONS):
+    """Writes a pipeline config with the specified number of datasets and actions"""
+    datasets = []
+
+    for i in range(num_datasets):
+        actions = [ACTIONS[j % len(ACTIONS)] for j in range(num_actions)]
+
+        datasets.append({
+            "name": "dataset{:05d}".format(i),
+            "path": "data/dataset{:05d}.csv".format(i),
+            "actions": actions,
+        })
+
+    config = {"name": "render", "version": "1.0", "output_dir": "output", "datasets": datasets}
+
+    with open(path, "w") as fp:
+        yaml.safe_dump(config, fp)
+
+
+@pytest.mark.parametrize("num_datasets", NUM_DATASETS)
+def bench_render(benchmark, num_datasets, tmp_path, monkeypatch):
+    """Parsing a config and rendering its Snakefile"""
+    config_file = str(tmp_path / "config.yml")
+    write_config(config_file, num_datasets)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["snakes", "--config", config_file])
+
+    def render():
+        SnakefileRenderer().render()
+
+    benchmark.pedantic(render, rounds=1, iterations=1)
+
+    num_actions = num_datasets * NUM_ACTIONS
+
+    benchmark.extra_info["actions"] = num_actions
+    benchmark.extra_info["ms_per_action"] = 1000 * benchmark.stats.stats.mean / num_actions
@@ -0,0 +1,108 @@
+"""
+Snakes benchmark suite
+
+Benchmarks the core snakes kernels at sizes up to a typical production dataset (20,000 rows x
+2,000 columns), using pytest-benchmark:
+
+    pip install pytest-benchmark
+
+    # run all benchmarks and save the results as a baseline
+    pytest benchmarks --benchmark-autosave
+
+    # compare against the most recent baseline, failing on a >10% slowdown
+    pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:10%
+
+    # skip the largest sizes (e.g. for a quick check)
+    pytest benchmarks --max-rows 5000
+
+Baselines are stored in benchmarks/baselines, in a separate directory for each machine, so
+results are only compared with earlier runs on the same hardware.
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:
+    collect_ignore_glob = ["bench_*.py"]
+
+# dataset sizes (rows x columns)
+SIZES = [(1000, 100), (5000, 500), (20000, 2000)]
+
+# default location of stored baselines
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--max-rows", type=int, default=None,
+        help="Skip benchmarks for datasets with more than this number of rows."
+    )
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # store baselines in the benchmarks directory, unless another location was specified
+    if config.getoption("benchmark_storage", None) == "file://./.benchmarks":
+        config.option.benchmark_storage = "file://" + BASELINE_DIR
+
+
+def pytest_collection_modifyitems(config, items):
+    max_rows = config.getoption("max_rows", None)
+
+    if max_rows is None:
+        return
+
+    skip = pytest.mark.skip(reason="dataset larger than --max-rows")
+
+    for item in items:
+        size = getattr(item, "callspec", None) and item.callspec.params.get("dat")
+
+        if size and size[0] > max_rows:
+            item.add_marker(skip)
+
+
+def make_dataset(num_rows, num_cols, seed=1):
+    """
+    Creates a random genes x samples dataset, with some zero and missing values.
+
+    Arguments
+    ---------
+    num_rows : int
+        Number of rows (genes).
+    num_cols : int
+        Number of columns (samples).
+    seed : int
+        Random seed.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Dataset of log-normally distributed values.
+    """
+    rng = np.random.default_rng(seed)
+
+    values = rng.lognormal(mean=2, sigma=1.5, size=(num_rows, num_cols))
+
+    # ~10% zeros and ~1% missing values
+    values[rng.random(values.shape) < 0.1] = 0
+    values[rng.random(values.shape) < 0.01] = np.nan
+
+    index = pd.Index(["gene{:05d}".format(i) for i in range(num_rows)], name="gene")
+    columns = ["sample{:04d}".format(i) for i in range(num_cols)]
+
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+_datasets = {}
+
+
+@pytest.fixture(params=SIZES, ids=["{}x{}".format(*x) for x in SIZES])
+def dat(request):
+    """Returns a random dataset of each benchmark size; datasets are created once per size"""
+    if request.param not in _datasets:
+        _datasets[request.param] = make_dataset(*request.param)
+
+    return _datasets[request.param]
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+"""
+Snakes end-to-end scaling harness
+
+Renders and runs the synthetic version of the example pipeline (see snakes/synthetic.py) on
+datasets of increasing size, using different numbers of cores, and reports how the pipeline as
+a whole scales:
+
+- render time: time taken to generate the Snakefile (including interpreter startup)
+- DAG time: time taken by snakemake to build the job DAG (dry-run)
+- run time: total pipeline runtime
+- disk usage: total size of the feather files written by the pipeline
+- peak memory and per-action runtimes, from the pipeline profiles (see snakes/profiling.py)
+- parallel efficiency: runtime on the fewest cores, relative to the runtime on N cores, per core
+
+Usage:
+
+    python benchmarks/scaling.py --scales 1 10 100 --cores 1 4 --output scaling
+
+The report is written both as JSON (<output>.json) and as a markdown table (<output>.md), along
+with the git commit it was generated for, so that reports for different commits can be diffed.
+"""
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+import pandas as pd
+import yaml
+from snakes import profiling, synthetic
+
+# command used to render Snakefiles; the renderer parses its own command-line arguments
+RENDER_CODE = "from snakes import SnakefileRenderer; SnakefileRenderer().render()"
+
+
+def run_pipeline(config_file, work_dir, cores):
+    """
+    Renders and runs a pipeline from scratch, and returns its timings and resource usage.
+
+    Arguments
+    ---------
+    config_file : str
+        Path to the pipeline config.
+    work_dir : str
+        Directory to render and run the pipeline in.
+    cores : int
+        Number of cores to run the pipeline with.
+
+    Returns
+    -------
+    tuple
+        Dict of pipeline metrics, and the pipeline profile (see profiling.load_profile()).
+    """
+    with open(config_file) as fp:
+        config = yaml.safe_load(fp)
+
+    output_dir = os.path.join(config["output_dir"], config["version"])
+
+    # remove outputs of any previous run
+    shutil.rmtree(config["output_dir"], ignore_errors=True)
+    shutil.rmtree(os.path.join(work_dir, ".snakemake"), ignore_errors=True)
+
+    metrics = {"cores": cores}
+
+    # the Snakefile is always rendered, even if unchanged since the previous run
+    metrics["render_time"] = _time_command(
+        [sys.executable, "-c", RENDER_CODE, "--config", config_file, "--force"], work_dir)
+
+    snakemake = [sys.executable, "-m", "snakemake", "--snakefile", "Snakefile", "--quiet"]
+
+    metrics["dag_time"] = _time_command(snakemake + ["--dry-run", "--cores", "1"], work_dir)
+    metrics["run_time"] = _time_command(snakemake + ["--cores", str(cores)], work_dir)
+
+    metrics["disk_mb"] = sum(
+        os.path.getsize(x) for x in glob.glob(os.path.join(output_dir, "**", "*.feather"),
+                                              recursive=True)
+    ) / 2 ** 20
+
+    profile = profiling.load_profile(output_dir)
+
+    metrics["jobs"] = profile.shape[0]
+    metrics["cpu_time"] = profile["cpu_time"].sum()
+    metrics["peak_rss_mb"] = profile["max_rss_mb"].max()
+
+    return metrics, profile
+
+
+def _time_command(cmd, work_dir):
+    """Runs a command and returns its wall time (seconds)"""
+    start = time.perf_counter()
+
+    res = subprocess.run(cmd, cwd=work_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    if res.returncode != 0:
+        sys.exit("[ERROR] Command failed: {}\n{}".format(" ".join(cmd), res.stderr.decode()))
+
+    return time.perf_counter() - start
+
+
+def run_scaling(work_dir, scales, cores, seed=1):
+    """
+    Runs the pipeline at each scale and number of cores.
+
+    Arguments
+    ---------
+    work_dir : str
+        Directory to generate datasets and run pipelines in.
+    scales : list
+        Dataset scale factors (see synthetic.get_sizes()).
+    cores : list
+        Numbers of cores to run each pipeline with.
+    seed : int
+        Random seed used to generate datasets.
+
+    Returns
+    -------
+    tuple
+        DataFrame of pipeline metrics (one row per scale and number of cores), and a DataFrame
+        of per-action runtimes at each scale, using the fewest cores.
+    """
+    # generated configs use absolute paths, so pipelines can be run from the working directory
+    work_dir = os.path.abspath(work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+
+    rows = []
+    action_times = {}
+
+    for scale in scales:
+        dataset_dir = os.path.join(work_dir, "scale_{:g}".format(scale))
+
+        config_file = synthetic.generate(dataset_dir, scale=scale, seed=seed)
+
+        sizes = synthetic.get_sizes(scale)
+
+        for num_cores in sorted(cores):
+            print("Running pipeline at scale {:g} with {} core(s)...".format(scale, num_cores))
+
+            metrics, profile = run_pipeline(config_file, work_dir, num_cores)
+
+            rows.append(dict(scale=scale, genes=sizes["genes"], samples=sizes["samples"],
+                             **metrics))
+
+            if num_cores == min(cores):
+                action_times[scale] = profiling.summarize(profile, by="action")["wall_time"]
+
+    res = pd.DataFrame(rows)
+
+    # parallel efficiency, relative to the runtime using the fewest cores
+    baseline = res.groupby("scale")["run_time"].transform("first")
+    min_cores = res.groupby("scale")["cores"].transform("first")
+
+    res["efficiency"] = baseline * min_cores / (res["run_time"] * res["cores"])
+
+    action_times = pd.DataFrame(action_times)
+    action_times.columns = ["scale_{:g}".format(x) for x in action_times.columns]
+
+    return res, action_times.sort_values(action_times.columns[-1], ascending=False)
+
+
+def write_report(output, metrics, action_times):
+    """
+    Writes a scaling report as JSON and markdown.
+
+    Arguments
+    ---------
+    output : str
+        Output path prefix.
+    metrics : pandas.DataFrame
+        Pipeline metrics, as returned by run_scaling().
+    action_times : pandas.DataFrame
+        Per-action runtimes, as returned by run_scaling().
+    """
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                            text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    commit = commit.stdout.strip() or "unknown"
+
+    report = {
+        "commit": commit,
+        "pipeline": metrics.round(3).to_dict(orient="records"),
+        "actions": action_times.round(3).to_dict(orient="index"),
+    }
+
+    with open(output + ".json", "w") as fp:
+        json.dump(report, fp, indent=2)
+
+    with open(output + ".md", "w") as fp:
+        fp.write("# Snakes scaling report ({})\n\n".format(commit))
+        fp.write("## Pipeline\n\n")
+        fp.write("```\n{}\n```\n\n".format(metrics.round(2).to_string(index=False)))
+        fp.write("## Action wall time (s)\n\n")
+        fp.write("```\n{}\n```\n".format(action_times.round(2).to_string()))
+
+
+def main():
+    parser = ArgumentParser(description="Measures how the snakes example pipeline scales with "
+                                        "dataset size and number of cores.")
+
+    parser.add_argument("--scales", nargs="+", type=float, default=[1, 10],
+                        help="Dataset scale factors (default: 1 10).")
+    parser.add_argument("--cores", nargs="+", type=int, default=[1, 4],
+                        help="Numbers of cores to run the pipeline with (default: 1 4).")
+    parser.add_argument("--work-dir", default="scaling_work",
+                        help="Directory to generate datasets and run pipelines in.")
+    parser.add_argument("--output", default="scaling_report",
+                        help="Output path prefix for the report (default: scaling_report).")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (default: 1).")
+
+    args = parser.parse_args()
+
+    metrics, action_times = run_scaling(args.work_dir, args.scales, args.cores, args.seed)
+
+    write_report(args.output, metrics, action_times)
+
+    with pd.option_context("display.width", 120):
+        print(metrics.round(2).to_string(index=False))
+
+    print("Report written to {0}.json and {0}.md".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
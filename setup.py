@@ -33,6 +33,7 @@ setup(
     maintainer_email="keith.hughitt@nih.gov",
     name="snakes",
     packages=find_packages(),
+    python_requires='>=3.9',
     platforms=["Linux", "Solaris", "Mac OS-X", "Unix", "Windows"],
     provides=['snakes'],
     scripts=['bin/snakes'],
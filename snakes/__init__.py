@@ -3,4 +3,13 @@ snakes
 """
 __version__ = 0.1
 
-from snakes.renderer import SnakefileRenderer
+
+def __getattr__(name):
+    # the renderer is imported on first use, so that importing snakes modules at pipeline runtime
+    # (e.g. from generated Snakefiles) does not also load the config parsing and templating code
+    if name == "SnakefileRenderer":
+        from snakes.renderer import SnakefileRenderer
+
+        return SnakefileRenderer
+
+    raise AttributeError("module 'snakes' has no attribute '{}'".format(name))
@@ -0,0 +1,75 @@
+"""
+Snakes gene annotation functionality
+
+Gene identifiers and biotypes are looked up in static annotation tables bundled with snakes,
+taken from the R annotables package (see data/annotations/annotables), so that no network
+queries (e.g. to biomaRt) are needed.
+"""
+import functools
+from importlib.resources import files
+
+# biomaRt attribute names, and the equivalent annotables fields
+KEY_TYPES = {
+    "ensembl_gene_id": "ensgene",
+    "entrezgene": "entrez",
+    "entrezgene_id": "entrez",
+    "external_gene_name": "symbol",
+    "hgnc_symbol": "symbol",
+}
+
+
+@functools.lru_cache()
+def load_annotations(mapping="grch38"):
+    """
+    Loads a bundled gene annotation table.
+
+    Arguments
+    ---------
+    mapping : str
+        Name of annotation table to load ("grch37" or "grch38").
+
+    Returns
+    -------
+    pandas.DataFrame
+        Gene annotations, with all fields loaded as strings. The table is shared between
+        callers, and should not be modified.
+    """
+    import pandas as pd
+
+    path = get_annotation_path(mapping)
+
+    if not path.is_file():
+        raise ValueError(f"Unknown gene annotation mapping: {mapping}")
+
+    return pd.read_csv(path, sep="\t", dtype=str)
+
+
+def get_annotation_path(mapping):
+    """Returns the path to a bundled gene annotation table (see load_annotations())"""
+    return files("snakes") / "data" / "annotations" / "annotables" / f"{mapping}.tsv.gz"
+
+
+def get_key_field(annot, key_type):
+    """
+    Returns the annotation table field corresponding to a gene identifier type.
+
+    Arguments
+    ---------
+    annot : pandas.DataFrame
+        Gene annotation table.
+    key_type : str
+        Gene identifier type, either as a biomaRt attribute name (e.g. "ensembl_gene_id"), or
+        an annotation table field name (e.g. "ensgene").
+
+    Returns
+    -------
+    str
+        Name of the annotation table field containing identifiers of that type.
+    """
+    field = KEY_TYPES.get(key_type, key_type)
+
+    if field not in annot.columns:
+        msg = "Unsupported gene identifier type: {} (supported types: {})"
+        raise ValueError(msg.format(key_type, ", ".join(list(KEY_TYPES) + list(annot.columns))))
+
+    return field
@@ -0,0 +1,414 @@
+"""
+Snakes content-addressed result cache
+
+When enabled (see the "cache" section of conf/defaults.yml), the outputs of each dataset action
+rule are stored in a persistent cache, keyed by a hash of the contents of the rule's input
+files, and of any other files specified in its action parameters (e.g. gene set files; see
+get_param_files()), the code executed by the rule (which encodes the action, its normalized
+parameters, and any dataset settings it depends on), and the snakes version. If a rule with the same key has
+been run before, for example for a previous pipeline version, its outputs are linked into place
+from the cache instead of being recomputed.
+
+Cached files are hard-linked when the cache and output directories are on the same filesystem,
+and copied otherwise. The cache is limited to a maximum size; when it is exceeded, the least
+recently used entries are removed. Entries and input file hashes are tracked in a sqlite
+database in the cache directory.
+
+The cache can be inspected and pruned using "snakes cache" (see main()).
+"""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from contextlib import closing
+from . import __version__
+from .stats import sidecar_path
+from .util import parse_size
+
+# default cache location
+CACHE_DIR = os.path.join("~", ".cache", "snakes")
+
+# number of bytes read at a time when hashing files
+HASH_BLOCK_SIZE = 2 ** 20
+
+
+class ResultCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_size=None):
+        """
+        Creates a new ResultCache instance.
+
+        Arguments
+        ---------
+        cache_dir : str
+            Cache directory; created if it does not already exist.
+        max_size : str|int
+            Maximum total size of cached files (e.g. "50GB"), or None for no limit.
+        """
+        self.cache_dir = os.path.realpath(os.path.expanduser(cache_dir))
+        self.max_size = None if max_size is None else parse_size(max_size)
+
+        self._objects_dir = os.path.join(self.cache_dir, "objects")
+        os.makedirs(self._objects_dir, exist_ok=True)
+
+        self._db_path = os.path.join(self.cache_dir, "index.db")
+
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(key TEXT PRIMARY KEY, files TEXT, size INTEGER, created REAL, last_access REAL)"
+        )
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS file_hashes "
+            "(path TEXT PRIMARY KEY, signature TEXT, hash TEXT)"
+        )
+
+    def get_key(self, inputs, code, files=None):
+        """
+        Returns the cache key for a rule.
+
+        Arguments
+        ---------
+        inputs : list
+            Paths to the rule's input files.
+        code : str
+            String identifying the code executed by the rule (e.g. a hash of the rule body).
+        files : list
+            Paths to other files read by the rule, such as gene set or annotation files
+            specified in its action parameters (see get_param_files()).
+
+        Returns
+        -------
+        str
+            Cache key.
+        """
+        parts = [str(__version__), code, [self.hash_file(x) for x in inputs]]
+
+        if files:
+            parts.append([self.hash_file(x) for x in files])
+
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    def hash_file(self, path):
+        """
+        Returns a hash of the contents of a file.
+
+        Hashes are stored in the cache index along with the size and modification time of each
+        file, so that unchanged files are only read once.
+        """
+        path = os.path.realpath(path)
+
+        info = os.stat(path)
+        signature = "{}:{}".format(info.st_size, info.st_mtime_ns)
+
+        rows = self._execute(
+            "SELECT hash FROM file_hashes WHERE path = ? AND signature = ?", (path, signature)
+        )
+
+        if len(rows) > 0:
+            return rows[0][0]
+
+        file_hash = hashlib.sha256()
+
+        with open(path, "rb") as fp:
+            for block in iter(lambda: fp.read(HASH_BLOCK_SIZE), b""):
+                file_hash.update(block)
+
+        file_hash = file_hash.hexdigest()
+
+        self._execute(
+            "INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?)", (path, signature, file_hash)
+        )
+
+        return file_hash
+
+    def restore(self, key, outputs):
+        """
+        Links the cached outputs for a key into place.
+
+        Arguments
+        ---------
+        key : str
+            Cache key, as returned by get_key().
+        outputs : list
+            Paths to the rule's output files.
+
+        Returns
+        -------
+        bool
+            True if the outputs were restored from the cache, or False if no entry exists for
+            the key.
+        """
+        rows = self._execute("SELECT files FROM entries WHERE key = ?", (key,))
+
+        if len(rows) == 0:
+            return False
+
+        entry_dir = self._get_entry_dir(key)
+        targets = self._get_targets(outputs)
+
+        files = json.loads(rows[0][0])
+
+        # entries whose files have been removed outside of snakes are discarded
+        if not all(os.path.exists(os.path.join(entry_dir, x)) for x in files):
+            self.remove(key)
+            return False
+
+        for filename in files:
+            _link(os.path.join(entry_dir, filename), targets[filename])
+
+        self._execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+
+        return True
+
+    def store(self, key, outputs):
+        """
+        Adds the outputs of a rule to the cache, and evicts older entries if the maximum cache
+        size has been exceeded.
+
+        Arguments
+        ---------
+        key : str
+            Cache key, as returned by get_key().
+        outputs : list
+            Paths to the rule's output files; any statistics sidecars are stored as well.
+        """
+        targets = self._get_targets(outputs)
+        files = [x for x in targets if os.path.isfile(targets[x])]
+
+        # copy files to a temporary directory first, so that incomplete entries are never used
+        tmp_dir = tempfile.mkdtemp(dir=self._objects_dir)
+
+        for filename in files:
+            _link(targets[filename], os.path.join(tmp_dir, filename))
+
+        size = sum(os.path.getsize(os.path.join(tmp_dir, x)) for x in files)
+
+        entry_dir = self._get_entry_dir(key)
+
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir)
+
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        os.rename(tmp_dir, entry_dir)
+
+        now = time.time()
+
+        self._execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+            (key, json.dumps(files), size, now, now),
+        )
+
+        if self.max_size is not None:
+            self.prune(self.max_size)
+
+    def remove(self, key):
+        """Removes an entry from the cache"""
+        shutil.rmtree(self._get_entry_dir(key), ignore_errors=True)
+
+        self._execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def prune(self, max_size=None, max_age=None):
+        """
+        Removes the least recently used entries until the cache is within a specified size.
+
+        Arguments
+        ---------
+        max_size : str|int
+            Maximum total size of cached files (e.g. "10GB"), or None for no limit.
+        max_age : float
+            If specified, entries which have not been used within this many days are removed
+            as well.
+
+        Returns
+        -------
+        list
+            Keys of the removed entries.
+        """
+        max_size = None if max_size is None else parse_size(max_size)
+
+        total = self.size()
+        removed = []
+
+        for key, size, last_access in self._execute(
+            "SELECT key, size, last_access FROM entries ORDER BY last_access"
+        ):
+            too_large = max_size is not None and total > max_size
+            expired = max_age is not None and last_access < time.time() - max_age * 86400
+
+            if not too_large and not expired:
+                break
+
+            self.remove(key)
+
+            total -= size
+            removed.append(key)
+
+        return removed
+
+    def entries(self):
+        """
+        Returns a list of cache entries, ordered from most to least recently used.
+
+        Returns
+        -------
+        list
+            List of dicts with the key, size (bytes), created and last_access (timestamps), and
+            files of each entry.
+        """
+        res = []
+
+        for key, files, size, created, last_access in self._execute(
+            "SELECT * FROM entries ORDER BY last_access DESC"
+        ):
+            res.append({"key": key, "size": size, "created": created,
+                        "last_access": last_access, "files": json.loads(files)})
+
+        return res
+
+    def size(self):
+        """Returns the total size of cached files (bytes)"""
+        return self._execute("SELECT COALESCE(SUM(size), 0) FROM entries")[0][0]
+
+    def _execute(self, query, params=()):
+        """
+        Executes a query against the cache index and returns the resulting rows.
+
+        A new connection is used for each query, since snakemake executes rules in separate
+        threads or processes; concurrent writers wait for the database lock.
+        """
+        with closing(sqlite3.connect(self._db_path, timeout=60)) as db:
+            with db:
+                return db.execute(query, params).fetchall()
+
+    def _get_entry_dir(self, key):
+        """Returns the directory used to store the files for a cache entry"""
+        return os.path.join(self._objects_dir, key[:2], key)
+
+    def _get_targets(self, outputs):
+        """
+        Returns a mapping from the names used to store each output file (and its statistics
+        sidecar) in the cache to the corresponding output paths.
+        """
+        targets = {}
+
+        for i, output in enumerate(outputs):
+            targets[str(i)] = output
+            targets["{}.stats".format(i)] = sidecar_path(output)
+
+        return targets
+
+
+def get_param_files(params):
+    """
+    Returns the paths to the files read by an action which are not rule inputs, i.e. existing
+    files specified in its parameters (e.g. the "gmt" file used by aggregate_gene_sets), and the
+    bundled annotation table for its "mapping" parameter, if any.
+
+    Arguments
+    ---------
+    params : dict
+        Action parameters.
+
+    Returns
+    -------
+    list
+        Paths to the files, in parameter order.
+    """
+    from .annotations import get_annotation_path
+
+    res = []
+
+    for name, value in params.items():
+        values = value if isinstance(value, list) else [value]
+
+        for x in values:
+            if isinstance(x, str) and os.path.isfile(os.path.expanduser(x)):
+                res.append(os.path.expanduser(x))
+
+        if name == "mapping" and isinstance(value, str):
+            path = str(get_annotation_path(value))
+
+            if os.path.isfile(path):
+                res.append(path)
+
+    return res
+
+
+def _link(src, dest):
+    """Hard-links a file, falling back to a copy if the paths are on different filesystems"""
+    if os.path.lexists(dest):
+        os.remove(dest)
+
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+def main(args=None):
+    """
+    Command-line interface for inspecting and pruning the result cache ("snakes cache").
+
+    Arguments
+    ---------
+    args : list
+        Command-line arguments; defaults to sys.argv[2:].
+    """
+    parser = ArgumentParser(
+        prog="snakes cache", description="Inspects or prunes the snakes result cache."
+    )
+
+    parser.add_argument(
+        "-d", "--dir", default=CACHE_DIR, help="Cache directory (default: {})".format(CACHE_DIR)
+    )
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("info", help="Shows the number of cache entries and total size.")
+    subparsers.add_parser("list", help="Lists cache entries, most recently used first.")
+
+    prune = subparsers.add_parser("prune", help="Removes least recently used cache entries.")
+    prune.add_argument("--max-size", help="Size to reduce the cache to (e.g. 10GB).")
+    prune.add_argument("--max-age", type=float, help="Removes entries unused for this many days.")
+
+    subparsers.add_parser("clear", help="Removes all cache entries.")
+
+    args = parser.parse_args(sys.argv[2:] if args is None else args)
+
+    if args.command == "prune" and args.max_size is None and args.max_age is None:
+        parser.error("prune requires --max-size and/or --max-age")
+
+    result_cache = ResultCache(args.dir)
+
+    if args.command == "info":
+        print("Cache directory : {}".format(result_cache.cache_dir))
+        print("Entries         : {}".format(len(result_cache.entries())))
+        print("Total size      : {}".format(_format_size(result_cache.size())))
+    elif args.command == "list":
+        for entry in result_cache.entries():
+            size = _format_size(entry["size"])
+            last_access = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["last_access"]))
+
+            print("{}  {:>10}  {}".format(entry["key"][:16], size, last_access))
+    else:
+        if args.command == "clear":
+            removed = result_cache.prune(0)
+        else:
+            removed = result_cache.prune(args.max_size, args.max_age)
+
+        print("Removed {} cache entries ({} remaining)".format(
+            len(removed), _format_size(result_cache.size())))
+
+
+def _format_size(size):
+    """Returns a human-readable file size"""
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return "{:.1f}{}".format(size, unit)
+        size /= 1024
+
+    return "{:.1f}TB".format(size)
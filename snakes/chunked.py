@@ -0,0 +1,164 @@
+"""
+Snakes chunked execution backend
+
+Datasets which are too large to be loaded into memory may be processed using the "chunked"
+backend (see the "backend" section of conf/defaults.yml). With this backend, datasets are read
+one batch of rows at a time, each action is applied to each batch in turn, and the results are
+written to the output feather file incrementally.
+
+Only actions which operate on each row independently (e.g. row filters and per-row transforms),
+or whose results can be computed by combining the results for each batch (e.g. gene set sums),
+can be applied in this way; this is declared for each action using the "chunked" entry in
+conf/actions.yml. Integer columns are stored as floats, so that batches with and without missing
+values share a single schema, and categorical columns are stored as plain values, since Arrow IPC
+files only support a single dictionary per column.
+"""
+import pandas as pd
+from pandas.errors import EmptyDataError
+from .dtypes import ACCUMULATOR_DTYPE, apply_dtype_policy
+
+# default number of rows to process at a time
+BATCH_SIZE = 100000
+
+# functions which may be used to combine per-batch aggregation results
+COMBINE_FUNCS = ["sum", "min", "max"]
+
+
+def iter_batches(infile, batch_size=BATCH_SIZE):
+    """
+    Iterates over batches of rows in a feather file.
+
+    Arguments
+    ---------
+    infile : str
+        Path to a feather file, with the dataset index stored in the first column.
+    batch_size : int
+        Maximum number of rows in each batch.
+
+    Returns
+    -------
+    generator
+        Generator yielding a DataFrame for each batch of rows.
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(infile, format="feather")
+    index_name = dataset.schema.names[0]
+
+    for batch in dataset.to_batches(batch_size=batch_size):
+        yield batch.to_pandas().set_index(index_name)
+
+
+def apply_batches(infile, outfile, func, policy=None, combine=None, batch_size=BATCH_SIZE):
+    """
+    Applies a function to each batch of rows in a feather file and writes the results.
+
+    Arguments
+    ---------
+    infile : str
+        Path to input feather file.
+    outfile : str
+        Path to output feather file.
+    func : function
+        Function which takes a DataFrame containing a batch of rows and returns a new
+        DataFrame. The function may raise an EmptyDataError to indicate that no rows remain.
+    policy : dict
+        Storage dtype policy to apply to each result (see dtypes.py).
+    combine : str
+        If specified, the function is assumed to aggregate rows by index, and the per-batch
+        results are combined by applying the specified function ("sum", "min" or "max") to the
+        results for each index value. Otherwise, results for each batch are written as-is.
+    batch_size : int
+        Maximum number of rows in each batch.
+    """
+    results = _apply(func, iter_batches(infile, batch_size))
+
+    if combine is None:
+        write_batches(results, outfile, policy)
+        return
+
+    if combine not in COMBINE_FUNCS:
+        msg = "Invalid combine function specified: '{}' (expected one of: {})"
+        raise ValueError(msg.format(combine, ", ".join(COMBINE_FUNCS)))
+
+    partials = list(results)
+
+    if len(partials) == 0:
+        raise EmptyDataError("No data remaining after filter applied")
+
+    res = pd.concat(partials).groupby(level=0, sort=True).agg(combine)
+
+    write_batches([res], outfile, policy)
+
+
+def write_batches(batches, outfile, policy=None):
+    """
+    Writes batches of rows to a feather file, one batch at a time.
+
+    Arguments
+    ---------
+    batches : iterable
+        Iterable of DataFrames with matching columns.
+    outfile : str
+        Path to output feather file.
+    policy : dict
+        Storage dtype policy to apply to each batch (see dtypes.py).
+    """
+    import pyarrow as pa
+
+    writer = None
+    schema = None
+
+    try:
+        for dat in batches:
+            if policy is not None:
+                dat = apply_dtype_policy(dat, policy)
+
+            if dat.shape[0] == 0:
+                continue
+
+            tbl = pa.Table.from_pandas(dat.reset_index(), preserve_index=False)
+
+            if writer is None:
+                schema = _storage_schema(tbl.schema)
+                options = pa.ipc.IpcWriteOptions(compression="lz4")
+                writer = pa.ipc.new_file(outfile, schema, options=options)
+
+            writer.write_table(tbl.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+    # check to make sure data is non-empty
+    if writer is None:
+        raise EmptyDataError("No data remaining after filter applied")
+
+
+def _apply(func, batches):
+    """Applies a function to each batch, skipping batches with no remaining rows"""
+    for batch in batches:
+        try:
+            yield func(batch)
+        except EmptyDataError:
+            continue
+
+
+def _storage_schema(schema):
+    """
+    Returns the schema used to store batches: integer data columns are stored as floats, and
+    categorical columns are decoded, so that all batches share the same schema.
+    """
+    import pyarrow as pa
+
+    fields = []
+
+    # the first column contains the dataset index
+    for i, field in enumerate(schema):
+        if i > 0 and pa.types.is_integer(field.type):
+            field = field.with_type(pa.from_numpy_dtype(ACCUMULATOR_DTYPE))
+        elif pa.types.is_dictionary(field.type):
+            field = field.with_type(field.type.value_type)
+
+        fields.append(field)
+
+    return pa.schema(fields, metadata=schema.metadata)
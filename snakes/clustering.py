@@ -4,6 +4,7 @@ Snakes cluster aggregation functionality
 import numpy as np
 import pandas as pd
 from . import aggregation
+from .dtypes import restore_float_dtype
 
 
 def hclust(df, n_clusters):
@@ -57,9 +58,12 @@ def cluster_apply(df, clusters, func):
     func = aggregation.get_agg_func(func)
 
     # transpose dat and add cluster column
-    df = pd.concat(
+    dat = pd.concat(
         [pd.DataFrame({"cluster": clusters}), df.reset_index(drop=True)], axis=1
     )
 
     # apply function to elements in each cluster and revert to original orientation
-    return df.groupby("cluster").agg(func)
+    res = dat.groupby("cluster").agg(func)
+
+    # cast result back to storage dtype of input dataset
+    return restore_float_dtype(res, df)
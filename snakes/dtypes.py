@@ -0,0 +1,102 @@
+"""
+Snakes dtype policy functionality
+
+Datasets are stored using the float and index dtypes specified in the "dtypes" section of the
+snakes config (see conf/defaults.yml). Reduced-precision storage (e.g. float32) is only used for
+the data itself: statistics which accumulate over many values (sums, variances, correlations,
+etc.) are always computed using ACCUMULATOR_DTYPE, and cast back to the storage dtype afterwards.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_float_dtype, is_numeric_dtype
+
+# dtype used for sums, variances, correlations, and other accumulators
+ACCUMULATOR_DTYPE = np.float64
+
+
+def apply_dtype_policy(df, policy):
+    """
+    Casts a dataset to the storage dtypes specified by a dtype policy.
+
+    Arguments
+    ---------
+    df : pandas.DataFrame
+        Dataset to be cast.
+    policy : dict
+        Dictionary with a "float" entry, indicating the dtype to use for floating point columns,
+        and an "index" entry, indicating the dtype to use for non-numeric row indices (e.g.
+        "category" or "string[pyarrow]"). Either may be set to None to leave the dtype unchanged.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Dataset with floating point columns and index cast to the requested dtypes.
+    """
+    float_dtype = policy.get("float")
+    index_dtype = policy.get("index")
+
+    # floating point columns
+    if float_dtype is not None:
+        float_dtype = np.dtype(float_dtype)
+
+        # positions of columns which need to be cast
+        cols = [
+            i for i, dtype in enumerate(df.dtypes) if is_float_dtype(dtype) and dtype != float_dtype
+        ]
+
+        if len(cols) == df.shape[1] and len(cols) > 0:
+            df = df.astype(float_dtype)
+        elif len(cols) > 0:
+            df = df.copy()
+
+            for i in cols:
+                df.isetitem(i, df.iloc[:, i].astype(float_dtype))
+
+    # row index; numeric indices are left as-is
+    if (
+        index_dtype is not None
+        and not is_numeric_dtype(df.index.dtype)
+        and df.index.dtype != index_dtype
+    ):
+        df.index = df.index.astype(index_dtype)
+
+    return df
+
+
+def promote(x):
+    """
+    Returns a Series or DataFrame with any reduced-precision floating point values promoted to
+    the accumulator dtype; other values are returned unchanged.
+    """
+    if isinstance(x, pd.DataFrame):
+        if any(_is_reduced_precision(dtype) for dtype in x.dtypes):
+            return x.astype(
+                {col: ACCUMULATOR_DTYPE for col, dtype in x.dtypes.items() if _is_reduced_precision(dtype)}
+            )
+        return x
+
+    if _is_reduced_precision(x.dtype):
+        return x.astype(ACCUMULATOR_DTYPE)
+
+    return x
+
+
+def restore_float_dtype(df, reference):
+    """
+    Casts the floating point columns of a computed result back to the storage dtype of the
+    dataset it was derived from.
+
+    If the reference dataset does not use a single floating point dtype, the result is returned
+    unchanged.
+    """
+    float_dtypes = {dtype for dtype in reference.dtypes if is_float_dtype(dtype)}
+
+    if len(float_dtypes) != 1:
+        return df
+
+    return apply_dtype_policy(df, {"float": float_dtypes.pop(), "index": None})
+
+
+def _is_reduced_precision(dtype):
+    """Returns True if dtype is a floating point dtype with less than 64 bits of precision"""
+    return is_float_dtype(dtype) and np.dtype(dtype).itemsize < np.dtype(ACCUMULATOR_DTYPE).itemsize
@@ -0,0 +1,382 @@
+"""
+Snakes in-process pipeline executor
+
+SnakefileRenderer.execute() runs the dataset actions of a pipeline in the current process,
+without generating a Snakefile or starting snakemake, which avoids their overhead for small
+pipelines, and is convenient for interactive use and tests.
+
+Each rule runs the same code as it would in the Snakefile, rendered from the same templates (see
+rule_code.snakefile), but datasets are passed between rules in memory, as Arrow tables (see
+MemoryStore), and only the outputs requested are written to disk, producing the same files as
+snakemake. Rules run as soon as the rules they depend on have finished, using a pool of threads,
+so that independent datasets and branches are processed in parallel; as with inline rules run
+by snakemake, the BLAS/OpenMP thread limits of concurrent rules are best-effort (see
+resources.limit_threads).
+
+Load rules, inline actions and action groups are supported, along with sharded actions and
+actions using the chunked backend, which read and write their datasets from disk. Non-inline
+actions (e.g. actions implemented as R scripts), and the remaining parts of a pipeline (training
+sets, feature selection, data integration and reports), require snakemake.
+"""
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from . import worker
+
+
+class MemoryStore:
+    def __init__(self, write_paths):
+        """
+        Creates a new MemoryStore instance, used by rules to read and write datasets and their
+        statistics in memory.
+
+        Arguments
+        ---------
+        write_paths : set
+            Paths of the datasets (and statistics sidecars) to also write to disk.
+        """
+        self.write_paths = set(write_paths)
+
+        # datasets and statistics, by path
+        self._tables = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+        # datasets written to disk
+        self._written = set()
+
+    def load_data(self, path):
+        """Loads a dataset, from memory if available, or from disk otherwise"""
+        with self._lock:
+            table = self._tables.get(path)
+
+        if table is None:
+            return worker.load_data(path)
+
+        return worker.from_table(table)
+
+    def save_data(self, dat, path):
+        """Stores a dataset in memory, also writing it to disk if requested"""
+        table = worker.to_table(dat)
+
+        with self._lock:
+            self._tables[path] = table
+            self._written.discard(path)
+
+        if path in self.write_paths:
+            self.write(path)
+
+    def load_stats(self, path, dat=None):
+        """Returns the statistics of a dataset stored in memory, or loads its sidecar"""
+        from . import stats
+
+        with self._lock:
+            if path in self._stats:
+                return self._stats[path]
+
+        return stats.load_stats(path, dat)
+
+    def write_stats(self, dat, path):
+        """Computes the statistics of a dataset, also writing them to disk if requested"""
+        from . import stats
+
+        if path in self.write_paths:
+            stats.write_stats(dat, path)
+
+        res = stats.compute_stats(dat)
+
+        with self._lock:
+            self._stats[path] = res
+
+    def discard(self, path):
+        """Removes a dataset and its statistics from memory"""
+        with self._lock:
+            self._tables.pop(path, None)
+            self._stats.pop(path, None)
+
+    def write(self, path):
+        """Writes a dataset stored in memory to disk, if it has not already been written"""
+        from pyarrow import feather
+
+        with self._lock:
+            table = self._tables.get(path)
+
+            if table is None or path in self._written:
+                return
+
+            self._written.add(path)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        feather.write_feather(table, path, compression="lz4")
+
+
+class PipelineExecutor:
+    def __init__(self, wrangler, config, template, **kwargs):
+        """
+        Creates a new PipelineExecutor instance.
+
+        Arguments
+        ---------
+        wrangler : SnakeWrangler
+            Rules of the pipeline.
+        config : dict
+            Parsed pipeline config.
+        template : jinja2.Template
+            Rule code template (rule_code.snakefile).
+        kwargs
+            Additional variables used to render rule code (e.g. "script_dir").
+        """
+        self.config = config
+
+        self._template = template
+        self._kwargs = kwargs
+
+        # dataset rules, and the names of their datasets, in order
+        self._rules = {}
+        self._dataset_names = {}
+
+        for dataset_name, rules in wrangler.datasets.items():
+            for rule_id, rule in rules.items():
+                self._rules[rule_id] = rule
+                self._dataset_names[rule_id] = dataset_name
+
+        # inputs and outputs of each job, identified by rule id and shard number (sharded rules
+        # are run once for each shard; see SnakeWrangler.shard_actions)
+        self._jobs = {}
+
+        for rule_id, rule in self._rules.items():
+            for shard in range(rule.shards) if rule.shards else [None]:
+                self._jobs[(rule_id, shard)] = {
+                    "input": _as_list(rule.input, shard),
+                    "output": _as_list(rule.output, shard),
+                }
+
+        # jobs producing each output
+        self._producers = {}
+
+        for job, settings in self._jobs.items():
+            for path in settings["output"]:
+                self._producers[path] = job
+
+        # outputs used by other parts of the pipeline (e.g. data integration)
+        self._referenced = wrangler.get_referenced_outputs()
+
+        if (wrangler.reports or wrangler.training_set or wrangler.feature_selection
+                or wrangler.data_integration):
+            logging.warning("Reports, training sets, feature selection and data integration are "
+                            "not run in-process; use snakemake to run them.")
+
+    def run(self, targets=None, write="terminal", cores=None):
+        """
+        Runs the rules needed to produce the target datasets.
+
+        Arguments
+        ---------
+        targets : list
+            Ids of the rules whose datasets are returned; defaults to the final rule of each
+            dataset and dataset branch (i.e. rules whose output is not used by another rule).
+        write : str|list
+            Outputs to write to disk: "terminal" for the outputs of final rules, and outputs used
+            by other parts of the pipeline (e.g. reports); "all" for every output; or a list of
+            rule ids whose outputs are written in addition to the terminal outputs.
+        cores : int
+            Maximum number of rules to run at a time; defaults to the "cores" execution setting.
+
+        Returns
+        -------
+        dict
+            Target datasets (pandas.DataFrame), by rule id.
+        """
+        used = {rule_id for job in self._jobs for rule_id, _ in self._get_dependencies(job)}
+        terminal = [x for x in self._rules if x not in used]
+
+        if targets is None:
+            targets = terminal
+
+        requested = list(targets) + (list(write) if isinstance(write, list) else [])
+
+        for rule_id in requested:
+            if rule_id not in self._rules:
+                sys.exit("[ERROR] Unknown rule specified: {}".format(rule_id))
+
+        jobs = self._get_required_jobs(targets)
+
+        # outputs written to disk
+        if write == "all":
+            written = self._rules
+        elif write == "terminal":
+            written = terminal
+        else:
+            written = terminal + list(write)
+
+        write_paths = set(self._referenced)
+
+        for job, settings in self._jobs.items():
+            if job[0] in written:
+                write_paths.update(settings["output"])
+
+        store = MemoryStore(write_paths)
+
+        # outputs of target rules, which are kept in memory
+        target_outputs = {x for job in jobs if job[0] in targets for x in self._jobs[job]["output"]}
+
+        # render the code of each rule before running any of them
+        code = {}
+
+        for rule_id, _ in jobs:
+            if rule_id not in code:
+                code[rule_id] = self._render_code(rule_id)
+
+        # number of jobs which have yet to use each output
+        num_uses = {}
+
+        for job in jobs:
+            for path in self._jobs[job]["input"]:
+                num_uses[path] = num_uses.get(path, 0) + 1
+
+        # jobs waiting for the jobs they depend on
+        waiting = {job: set(self._get_dependencies(job)) for job in jobs}
+
+        if cores is None:
+            cores = self.config["execution"]["cores"]
+
+        cores = os.cpu_count() if cores in [None, "all"] else int(cores)
+
+        logging.info("Running %d jobs in-process (cores: %d)", len(jobs), cores)
+
+        with ThreadPoolExecutor(max_workers=cores) as pool:
+            running = {}
+
+            def submit_ready():
+                for job in [x for x, deps in waiting.items() if not deps]:
+                    del waiting[job]
+                    running[pool.submit(self._run_job, job, code[job[0]], store)] = job
+
+            submit_ready()
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    job = running.pop(future)
+
+                    if future.exception() is not None:
+                        for other in running:
+                            other.cancel()
+
+                        logging.error("Error in rule %s", _format_job(job))
+                        raise future.exception()
+
+                    for deps in waiting.values():
+                        deps.discard(job)
+
+                    # remove datasets which are no longer needed from memory
+                    for path in self._jobs[job]["input"]:
+                        num_uses[path] -= 1
+
+                        if num_uses[path] == 0 and path not in target_outputs:
+                            store.discard(path)
+
+                submit_ready()
+
+        res = {}
+
+        for rule_id in targets:
+            output = self._rules[rule_id].output
+
+            if isinstance(output, str) and not self._rules[rule_id].shards:
+                res[rule_id] = store.load_data(output)
+
+        return res
+
+    def _run_job(self, job, code, store):
+        """Runs the code of a rule, for a single shard if the rule is sharded"""
+        logging.info("Running rule %s", _format_job(job))
+
+        rule = self._rules[job[0]]
+        settings = self._jobs[job]
+
+        # sharded and chunked rules read and write their datasets directly
+        if _reads_files(rule):
+            for path in settings["input"]:
+                store.write(path)
+
+            for path in settings["output"]:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        request = {
+            "code": code,
+            "input": settings["input"],
+            "output": settings["output"],
+            "threads": rule.resources["threads"] if rule.resources else 1,
+            "params": None,
+            "name": "<{}>".format(_format_job(job)),
+        }
+
+        worker.execute(request, store)
+
+    def _render_code(self, rule_id):
+        """Renders the code of a rule"""
+        rule = self._rules[rule_id]
+
+        if not rule.groupped and not rule.inline and not _has_code_only(rule):
+            msg = ("[ERROR] Rule {} ({}) is not inline, and can only be run using snakemake; set "
+                   "\"inline: true\" for the action, if supported.")
+            sys.exit(msg.format(rule_id, rule.action_name))
+
+        dataset = self.config["datasets"][self._dataset_names[rule_id]]
+
+        return self._template.render(action=rule, dataset=dataset, config=self.config,
+                                     data_store=True, **self._kwargs)
+
+    def _get_dependencies(self, job):
+        """Returns the jobs producing the inputs of a job"""
+        deps = [self._producers.get(x) for x in self._jobs[job]["input"]]
+
+        return list(dict.fromkeys(x for x in deps if x is not None))
+
+    def _get_required_jobs(self, targets):
+        """Returns the jobs of the target rules and the jobs they depend on, in order"""
+        required = set()
+        stack = [job for job in self._jobs if job[0] in targets]
+
+        while stack:
+            job = stack.pop()
+
+            if job not in required:
+                required.add(job)
+                stack.extend(self._get_dependencies(job))
+
+        return [x for x in self._jobs if x in required]
+
+
+def _as_list(paths, shard=None):
+    """Returns the input or output paths of a rule as a list, for a single shard if specified"""
+    paths = [paths] if isinstance(paths, str) else list(paths)
+
+    if shard is not None:
+        paths = [x.replace("{shard}", str(shard)) for x in paths]
+
+    return paths
+
+
+def _format_job(job):
+    """Returns the rule id of a job, followed by its shard number, if any"""
+    rule_id, shard = job
+
+    return rule_id if shard is None else "{} (shard {})".format(rule_id, shard)
+
+
+def _has_code_only(rule):
+    """Returns True if only the code of a non-inline rule can be rendered"""
+    return rule.template.startswith(("actions/load/", "actions/shard/"))
+
+
+def _reads_files(rule):
+    """Returns True if the code of a rule reads and writes its datasets directly"""
+    if rule.chunked or rule.shards:
+        return True
+
+    return not rule.groupped and rule.template.startswith("actions/shard/")
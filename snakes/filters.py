@@ -1,21 +1,36 @@
 """
 Functions for filtering datasets by row, column, or group.
 """
+import logging
 import operator
+import warnings
 import numpy as np
+import pandas as pd
 from pandas.errors import EmptyDataError
+from . import annotations
+from .dtypes import promote
+from .stats import get_stat
+
+# functions which can be computed from dataset statistics sidecars (see stats.py)
+STAT_FUNCS = {np.sum: "sum", np.mean: "mean", np.var: "var", np.min: "min", np.max: "max"}
 
 #
 # Generalized filter function
 #
-def filter_data_by_func(df, func, axis=1, op=operator.gt, value=None, quantile=None):
+def filter_data_by_func(df, func, axis=1, op=operator.gt, value=None, quantile=None, stats=None):
     """Generalized function for filtering a dataset by rows or columns."""
-    # aply function along specified axis
-    vals = df.apply(func, axis=axis)
+    if stats is not None and func in STAT_FUNCS:
+        # use precomputed statistics, if available
+        labels = df.index if axis == 1 else df.columns
+        vals = pd.Series(get_stat(stats, STAT_FUNCS[func], axis=axis), index=labels)
+    else:
+        # aply function along specified axis; reduced-precision values are promoted so that
+        # statistics such as sums and variances are accumulated at full precision
+        vals = df.apply(lambda x: func(promote(x)), axis=axis)
 
     # if quantile specified, find associated value
     if quantile is not None:
-        value = vals.quantile(quantile, axis=axis)
+        value = vals.quantile(quantile)
 
     # apply operator
     mask = op(vals, value)
@@ -38,10 +53,10 @@ def filter_data_by_func(df, func, axis=1, op=operator.gt, value=None, quantile=N
 #
 # Row-wise filter functions
 #
-def filter_rows_by_func(df, func, op=operator.gt, value=None, quantile=None):
+def filter_rows_by_func(df, func, op=operator.gt, value=None, quantile=None, stats=None):
     """Filters rows from a dataset"""
     return filter_data_by_func(
-        df=df, func=func, axis=1, op=op, value=value, quantile=quantile
+        df=df, func=func, axis=1, op=op, value=value, quantile=quantile, stats=stats
     )
 
 
@@ -59,12 +74,17 @@ def filter_rows_by_col(df, col=None, op=operator.gt, value=None, quantile=None):
     return df
 
 
-def filter_rows_by_na(df, op=operator.le, value=None, quantile=None):
+def filter_rows_by_na(df, op=operator.le, value=None, quantile=None, stats=None):
     """Filters dataset rows based on the number of missing values"""
     if quantile is not None:
         value = df.quantile(quantile, axis=1)
 
-    df = df[op(df.isnull().sum(axis=1), value)]
+    if stats is not None:
+        num_na = get_stat(stats, "na")
+    else:
+        num_na = df.isnull().sum(axis=1)
+
+    df = df[op(num_na, value)]
 
     # check to make sure data is non-empty after filtering step
     if df.empty:
@@ -73,12 +93,18 @@ def filter_rows_by_na(df, op=operator.le, value=None, quantile=None):
     return df
 
 
-def filter_rows_by_nonzero(df, op=operator.gt, value=None, quantile=None):
+def filter_rows_by_nonzero(df, op=operator.gt, value=None, quantile=None, stats=None):
     """Filters dataset rows based on the number of 0's present"""
     if quantile is not None:
         value = df.quantile(quantile, axis=1)
 
-    df = df[op((df != 0).sum(axis=1), value)]
+    # note: missing values are counted as non-zero
+    if stats is not None:
+        num_nonzero = get_stat(stats, "nonzero") + get_stat(stats, "na")
+    else:
+        num_nonzero = (df != 0).sum(axis=1)
+
+    df = df[op(num_nonzero, value)]
 
     # check to make sure data is non-empty after filtering step
     if df.empty:
@@ -165,11 +191,209 @@ def filter_rows_by_group_func(
     return df
 
 
+def filter_rows_by_gene_biotype(df, gene_biotypes, key_type, mapping="grch38", exclude=False):
+    """
+    Filters a dataset indexed by genes based on their biotype (e.g. "protein_coding").
+
+    Python equivalent of filter/filter_rows_gene_biotype_in.R; gene biotypes are looked up in
+    the bundled annotables tables, rather than by querying biomaRt.
+
+    Arguments
+    ---------
+    df : pandas.DataFrame
+        DataFrame indexed by genes.
+    gene_biotypes : list
+        Gene biotypes to keep (or to remove, if "exclude" is true).
+    key_type : str
+        Gene identifier type of the index, as used in biomaRt (e.g. "ensembl_gene_id" or
+        "external_gene_name"), or an annotables field name (e.g. "ensgene").
+    mapping : str
+        Name of gene annotation table to use ("grch37" or "grch38").
+    exclude : bool
+        If true, genes with one of the specified biotypes are removed instead.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Filtered dataset.
+    """
+    annot = annotations.load_annotations(mapping)
+    key_field = annotations.get_key_field(annot, key_type)
+
+    genes = annot.loc[annot["biotype"].isin(gene_biotypes), key_field]
+
+    mask = df.index.astype(str).isin(genes)
+
+    df = df[~mask if exclude else mask]
+
+    # check to make sure data is non-empty after filtering step
+    if df.empty:
+        raise EmptyDataError(
+            "No genes remaining after filtering by biotype! "
+            "Are you sure you specified the correct key type?"
+        )
+
+    return df
+
+
+def filter_rows_by_max_correlation(df, cutoff=0.9, use="pairwise.complete.obs", exact=None,
+                                   verbose=False):
+    """
+    Filters a dataset to remove correlated rows: for each pair of rows with a correlation above
+    the cutoff, one of the rows is removed.
+
+    Python equivalent of filter/filter_rows_max_correlation.R, which uses caret's
+    findCorrelation function to choose the rows to remove (see find_correlation).
+
+    Arguments
+    ---------
+    df : pandas.DataFrame
+        Dataset to filter.
+    cutoff : float
+        Maximum absolute Pearson correlation allowed between rows.
+    use : str
+        How missing values are handled, as in R's cor function: "pairwise.complete.obs" to
+        correlate each pair of rows using the columns where both are present, or
+        "complete.obs" to only use columns with no missing values.
+    exact : bool
+        Whether to re-evaluate average correlations at each step (see find_correlation).
+    verbose : bool
+        Whether to log the number of rows removed.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Filtered dataset.
+    """
+    dat = promote(df)
+
+    if use == "complete.obs":
+        dat = dat.dropna(axis=1)
+    elif use != "pairwise.complete.obs":
+        raise ValueError(f"Unsupported missing value handling method: {use}")
+
+    cor_mat = dat.T.corr().to_numpy()
+
+    ind = find_correlation(cor_mat, cutoff=cutoff, exact=exact)
+
+    if verbose:
+        if len(ind) > 0:
+            msg = "Removing %d / %d features with a correlation above %0.2f."
+            logging.info(msg, len(ind), df.shape[0], cutoff)
+        else:
+            logging.info("No correlated features detected!")
+
+    return df[~np.isin(np.arange(df.shape[0]), ind)]
+
+
+def find_correlation(cor_mat, cutoff=0.9, exact=None):
+    """
+    Determines which variables to remove to reduce pairwise correlations, using the same
+    approach as caret's findCorrelation function: for each pair of variables with an absolute
+    correlation above the cutoff, the variable with the largest mean absolute correlation is
+    removed.
+
+    Arguments
+    ---------
+    cor_mat : numpy.ndarray
+        Symmetric correlation matrix.
+    cutoff : float
+        Maximum absolute correlation allowed between variables.
+    exact : bool
+        Whether to re-evaluate mean correlations as variables are removed. Defaults to true for
+        less than 100 variables, as in caret.
+
+    Returns
+    -------
+    numpy.ndarray
+        Indices of the variables to remove, in the order used by caret.
+    """
+    cor_mat = np.asarray(cor_mat, dtype=np.float64)
+
+    if exact is None:
+        exact = cor_mat.shape[1] < 100
+
+    if exact:
+        return _find_correlation_exact(cor_mat, cutoff)
+
+    return _find_correlation_fast(cor_mat, cutoff)
+
+
+def _find_correlation_exact(cor_mat, cutoff):
+    """Port of caret:::findCorrelation_exact"""
+    n = cor_mat.shape[0]
+
+    if not np.allclose(cor_mat, cor_mat.T, equal_nan=True):
+        raise ValueError("Correlation matrix is not symmetric")
+    if n == 1:
+        raise ValueError("Only one variable given")
+
+    # mean correlations of variables whose correlations are all missing are NaN, as in R
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+
+        x = np.abs(cor_mat)
+
+        # re-order variables by decreasing mean absolute correlation (R's order() is stable)
+        tmp = x.copy()
+        np.fill_diagonal(tmp, np.nan)
+
+        order = np.argsort(-np.nanmean(tmp, axis=0), kind="stable")
+
+        x = x[np.ix_(order, order)]
+
+        # x2 excludes the diagonal and removed variables from the mean correlations
+        x2 = x.copy()
+        np.fill_diagonal(x2, np.nan)
+
+        delete = np.zeros(n, dtype=bool)
+
+        for i in range(n - 1):
+            if not (x2[~np.isnan(x2)] > cutoff).any():
+                break
+
+            if delete[i]:
+                continue
+
+            for j in range(i + 1, n):
+                if not delete[i] and not delete[j] and x[i, j] > cutoff:
+                    # note: as in caret, the second mean is computed over all rows but "j"
+                    mn1 = np.nanmean(x2[i, :])
+                    mn2 = np.nanmean(np.delete(x2, j, axis=0))
+
+                    k = i if mn1 > mn2 else j
+
+                    delete[k] = True
+                    x2[k, :] = np.nan
+                    x2[:, k] = np.nan
+
+    return order[delete]
+
+
+def _find_correlation_fast(cor_mat, cutoff):
+    """Port of caret:::findCorrelation_fast"""
+    if np.isnan(cor_mat).any():
+        raise ValueError("The correlation matrix has some missing values.")
+
+    # ranks of the distinct mean absolute correlations
+    avg_cor = np.abs(cor_mat).mean(axis=0)
+    avg_rank = np.unique(avg_cor, return_inverse=True)[1]
+
+    # pairs above the cutoff in the upper triangle, in column-major order
+    cols, rows = np.nonzero(np.triu(np.abs(cor_mat) > cutoff, k=1).T)
+
+    discard_cols = avg_rank[cols] > avg_rank[rows]
+
+    delete = np.concatenate([cols[discard_cols], rows[~discard_cols]])
+
+    return pd.unique(delete)
+
+
 #
 # Column-wise filter functions
 #
-def filter_cols_by_func(df, func, op=operator.gt, value=None, quantile=None):
+def filter_cols_by_func(df, func, op=operator.gt, value=None, quantile=None, stats=None):
     """Filters columns from a dataset"""
     return filter_data_by_func(
-        df=df, func=func, axis=0, op=op, value=value, quantile=quantile
+        df=df, func=func, axis=0, op=op, value=value, quantile=quantile, stats=stats
     )
@@ -3,7 +3,8 @@ Snakes gene set aggregation functionality
 """
 import numpy as np
 import pandas as pd
-from . import aggregation
+from . import aggregation, annotations
+from .dtypes import promote, restore_float_dtype
 
 
 def gene_set_apply(df, gsets, func):
@@ -37,7 +38,8 @@ def gene_set_apply(df, gsets, func):
 
     # iterate over gene sets and apply function
     for gene_set, genes in sorted(gsets.items()):
-        df_subset = df.filter(genes, axis=0)
+        # subsets are promoted to full precision before aggregation
+        df_subset = promote(df.filter(genes, axis=0))
 
         # check to make sure some genes overlap before applying function
         if df_subset.shape[0] == 0:
@@ -47,4 +49,47 @@ def gene_set_apply(df, gsets, func):
         rows.append(tuple(df_subset.apply(func)))
         matched_ids.append(gene_set)
 
-    return pd.DataFrame(rows, index=matched_ids, columns=df.columns)
+    # cast result back to storage dtype of input dataset
+    res = pd.DataFrame(rows, index=matched_ids, columns=df.columns)
+
+    return restore_float_dtype(res, df)
+
+
+def map_gmt_ids(infile, outfile, from_key, to_key, mapping="grch37"):
+    """
+    Maps the gene identifiers of the gene sets in a GMT file to a different identifier type.
+
+    Python equivalent of annotations/prepare_gene_set.R: each identifier is mapped using the
+    first matching entry in a bundled annotables table with an identifier of the new type.
+    Identifiers which cannot be mapped are left out, rather than being written as "NA".
+
+    Arguments
+    ---------
+    infile : str
+        Path to input GMT file.
+    outfile : str
+        Path to write mapped GMT file to.
+    from_key : str
+        Gene identifier type used in the GMT file (e.g. "symbol" or "external_gene_name").
+    to_key : str
+        Gene identifier type to map to (e.g. "ensgene" or "ensembl_gene_id").
+    mapping : str
+        Name of gene annotation table to use ("grch37" or "grch38").
+    """
+    annot = annotations.load_annotations(mapping)
+
+    from_field = annotations.get_key_field(annot, from_key)
+    to_field = annotations.get_key_field(annot, to_key)
+
+    # mapping from gene ids to the first matching gene id of the new type
+    annot = annot[[from_field, to_field]].dropna().drop_duplicates(from_field)
+    gene_map = dict(zip(annot[from_field], annot[to_field]))
+
+    with open(infile) as ifp, open(outfile, "w") as ofp:
+        for line in ifp:
+            # gene set name, description, and genes
+            fields = line.rstrip("\n").split("\t")
+
+            genes = [gene_map[x] for x in fields[2:] if x in gene_map]
+
+            ofp.write("\t".join(fields[:2] + genes) + "\n")
@@ -0,0 +1,152 @@
+"""
+Snakes generic rule functionality
+
+When "generic_rules" is enabled (see conf/defaults.yml), the inline actions of each type are
+rendered as a single snakemake rule with "dataset" and "step" wildcards, instead of a separate
+rule for each action of each dataset (see SnakeWrangler.set_generic_rules). The input,
+parameters and resources of each job are stored in a job table (JSON) written alongside the
+Snakefile, so the size of the Snakefile stays roughly constant as datasets are added.
+
+Action code is rendered using placeholder parameters, which are rendered as "params['<name>']"
+expressions and looked up in the job table when the rule is run. Placeholder code is only used
+if substituting the actual parameter values into it reproduces the code rendered using the
+parameters themselves; otherwise (e.g. for templates which use parameters in conditionals or
+string literals), the parameter values are rendered into a separate "variant" of the rule
+code. Variants are also created for datasets with different settings (e.g. dtypes).
+"""
+import copy
+import json
+
+# suffix of the job table path, relative to the Snakefile
+JOB_TABLE_SUFFIX = ".jobs.json"
+
+
+class RuntimeExpr:
+    """Python expression rendered into generic rule code, in place of a literal value"""
+
+    def __init__(self, expr):
+        self.expr = expr
+
+    def __str__(self):
+        return self.expr
+
+    def __repr__(self):
+        return self.expr
+
+
+class RuntimeParam(RuntimeExpr):
+    """
+    Placeholder for an action parameter which is looked up when a generic rule is run.
+
+    Placeholders may only be rendered; templates which inspect parameter values (e.g. in
+    conditionals) raise a TypeError, and are rendered using the actual parameter values instead.
+    """
+
+    def __init__(self, name):
+        super().__init__("params[{!r}]".format(name))
+
+    def _unsupported(self, *args):
+        raise TypeError("Parameter placeholders cannot be inspected: " + self.expr)
+
+    __bool__ = __eq__ = __ne__ = __lt__ = __le__ = __gt__ = __ge__ = __len__ = _unsupported
+    __hash__ = object.__hash__
+
+
+class RuntimeParams:
+    """Placeholder for the parameters of an action (see RuntimeParam)"""
+
+    def __init__(self, params):
+        self._params = params
+
+    def __getitem__(self, name):
+        if name not in self._params:
+            raise KeyError(name)
+
+        return RuntimeParam(name)
+
+    def __contains__(self, name):
+        return name in self._params
+
+    def get(self, name, default=None):
+        return self[name] if name in self._params else default
+
+    def __str__(self):
+        raise TypeError("Parameter placeholders cannot be rendered as a whole")
+
+    __repr__ = __str__
+
+
+def render_generic_code(render, rule):
+    """
+    Renders the code for an action, using placeholder parameters where possible.
+
+    Arguments
+    ---------
+    render : function
+        Function which renders the run code of a rule.
+    rule : ActionRule or GroupedActionRule
+        Rule to render.
+
+    Returns
+    -------
+    tuple
+        Rendered code, and a dict of the parameters it looks up at runtime.
+    """
+    code = render(rule)
+
+    # parameters of grouped actions are always rendered into the code
+    if rule.groupped:
+        return code, {}
+
+    placeholder = copy.copy(rule)
+    placeholder.params = RuntimeParams(rule.params)
+
+    try:
+        generic_code = render(placeholder)
+
+        # parameters are looked up in the job table, after conversion to JSON
+        params = json.loads(json.dumps(rule.params))
+    except TypeError:
+        return code, {}
+
+    used = {k: v for k, v in params.items() if str(RuntimeParam(k)) in generic_code}
+
+    expected = generic_code
+
+    for name, value in used.items():
+        expected = expected.replace(str(RuntimeParam(name)), repr(value))
+
+    if expected != code:
+        return code, {}
+
+    return generic_code, used
+
+
+class JobTable:
+    """Inputs, parameters and resources of the jobs of each generic rule"""
+
+    def __init__(self, path):
+        with open(path) as fp:
+            self.jobs = json.load(fp)
+
+    def get(self, rule_name, wildcards):
+        """
+        Returns the settings for a generic rule job.
+
+        A KeyError is raised for outputs which match the rule's output pattern, but are produced
+        by another rule; snakemake then discards the job, and uses the other rule instead.
+
+        Arguments
+        ---------
+        rule_name : str
+            Generic rule name.
+        wildcards : Wildcards
+            Job "dataset" and "step" wildcards.
+
+        Returns
+        -------
+        dict
+            Job settings ("rule", "dataset", "input", "variant", "params", "threads", "mem_mb"
+            and "mem_scale").
+        """
+        return self.jobs[rule_name]["{}/{}".format(wildcards.dataset, wildcards.step)]
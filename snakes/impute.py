@@ -0,0 +1,88 @@
+"""
+Snakes missing value imputation functionality
+"""
+import warnings
+import numpy as np
+import pandas as pd
+from .dtypes import promote, restore_float_dtype
+
+# functions used to combine the values of the nearest neighbors
+AGG_FUNCS = {"median": np.median, "mean": np.mean}
+
+
+def impute_knn(df, k=5, agg_func="median", use_imputed_dist=True):
+    """
+    Imputes missing values using the values of the k-nearest rows.
+
+    Python equivalent of impute/impute_knn.R, which uses VIM's kNN function with its default
+    settings: rows are compared using the Gower distance (the mean absolute difference of the
+    values present in both rows, with each column scaled by its range), and each missing value
+    is replaced with the median of the values of the k-nearest rows for which it is present.
+
+    Columns are imputed one at a time, in order.
+
+    Arguments
+    ---------
+    df : pandas.DataFrame
+        Numeric dataset with missing values.
+    k : int
+        Number of nearest neighbors to use.
+    agg_func : str
+        Function used to combine the values of the nearest neighbors ("median" or "mean").
+    use_imputed_dist : bool
+        Whether values imputed for earlier columns are used when computing distances for later
+        columns (VIM's "useImputedDist").
+
+    Returns
+    -------
+    pandas.DataFrame
+        Dataset with missing values imputed.
+    """
+    func = AGG_FUNCS[agg_func]
+
+    orig = promote(df).to_numpy(dtype=np.float64)
+    missing = np.isnan(orig)
+
+    # imputed values
+    X = orig.copy()
+
+    # values scaled by the range of each column, used to compute distances
+    with warnings.catch_warnings():
+        # columns with no values present have an undefined range
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        ranges = np.nanmax(orig, axis=0) - np.nanmin(orig, axis=0)
+
+    ranges = np.where(np.isnan(ranges) | (ranges == 0), 1, ranges)
+
+    scaled = X / ranges
+
+    for j in np.flatnonzero(missing.any(axis=0)):
+        recipients = np.flatnonzero(missing[:, j])
+        donors = np.flatnonzero(~missing[:, j])
+
+        # columns with no values present cannot be imputed
+        if len(donors) == 0:
+            continue
+
+        dist_vals = scaled if use_imputed_dist else orig / ranges
+        dist_vals = np.delete(dist_vals, j, axis=1)
+
+        donor_vals = dist_vals[donors]
+
+        for i in recipients:
+            diffs = np.abs(donor_vals - dist_vals[i])
+
+            # rows with no values in common are treated as being infinitely far apart
+            num_shared = (~np.isnan(diffs)).sum(axis=1)
+            dists = np.where(num_shared > 0, np.nansum(diffs, axis=1) / np.maximum(num_shared, 1),
+                             np.inf)
+
+            nearest = donors[np.argsort(dists, kind="stable")[:k]]
+
+            X[i, j] = func(orig[nearest, j])
+
+        scaled[:, j] = X[:, j] / ranges[j]
+
+    res = pd.DataFrame(X, index=df.index, columns=df.columns)
+
+    return restore_float_dtype(res, df)
@@ -0,0 +1,424 @@
+"""
+Snakes data integration functionality
+"""
+import warnings
+import numpy as np
+import pandas as pd
+from .dtypes import promote
+
+
+def cross_cor(X, Y, axis=0, method="pearson"):
+    """
+    Computes correlations between the rows or columns of two datasets, using their shared
+    column or row indices.
+
+    Arguments
+    ---------
+    X : pandas.DataFrame
+        First dataset.
+    Y : pandas.DataFrame
+        Second dataset.
+    axis : int
+        0 to correlate the columns of the datasets (using shared row indices), or 1 to
+        correlate their rows (using shared column indices).
+    method : str
+        Correlation method ("pearson", "spearman" or "kendall").
+
+    Returns
+    -------
+    pandas.DataFrame
+        Correlation matrix, with one row or column for each row or column in X, and one
+        row or column for each in Y.
+    """
+    # get shared indices
+    shared_indices = sorted(list(set(X.axes[axis]).intersection(Y.axes[axis])))
+
+    # determine the length of the longest index to be correlated
+    max_dim = max(len(X.axes[axis]), len(Y.axes[axis]))
+
+    if len(shared_indices) == 0:
+        raise Exception("No matching indices found!")
+    elif len(shared_indices) < max_dim:
+        msg = ("Dataset indices are not identical:\n"
+               "Performing correlation using {} / {} shared indices.")
+        warnings.warn(msg.format(len(shared_indices), max_dim))
+
+    # limit dataframes to shared indices
+    if axis == 0:
+        # select shared rows
+        X = X.loc[shared_indices]
+        Y = Y.loc[shared_indices]
+    else:
+        # select shared columns
+        X = X[shared_indices]
+        Y = Y[shared_indices]
+
+    # correlations are computed at full precision
+    X = promote(X)
+    Y = promote(Y)
+
+    return X.apply(lambda x: Y.corrwith(x, axis=axis, method=method), axis=axis)
+
+
+def get_shared_rows(X, Y):
+    """
+    Limits two datasets to the rows (e.g. observations) they have in common.
+
+    Arguments
+    ---------
+    X : pandas.DataFrame
+        First dataset.
+    Y : pandas.DataFrame
+        Second dataset.
+
+    Returns
+    -------
+    tuple
+        X and Y, limited to their shared rows, in the order of the rows in Y.
+    """
+    shared_indices = Y.index[Y.index.isin(X.index)]
+
+    if len(shared_indices) == 0:
+        raise Exception("No matching indices found!")
+    elif len(shared_indices) < max(X.shape[0], Y.shape[0]):
+        msg = ("Dataset indices are not identical:\n"
+               "Performing integration using {} / {} shared indices.")
+        warnings.warn(msg.format(len(shared_indices), max(X.shape[0], Y.shape[0])))
+
+    return X.loc[shared_indices], Y.loc[shared_indices]
+
+
+def sparse_cca(X, Y, penaltyx=0.3, penaltyz=0.3, K=1, niter=15, standardize=True):
+    """
+    Performs sparse canonical correlation analysis (CCA) of two datasets with the same
+    observations, using the penalized matrix decomposition approach of Witten et al. (2009).
+
+    Python equivalent of the PMA package's CCA function, for "standard" (L1-penalized)
+    canonical vectors.
+
+    Arguments
+    ---------
+    X : pandas.DataFrame
+        First dataset (observations x features).
+    Y : pandas.DataFrame
+        Second dataset (observations x features), with the same observations as X.
+    penaltyx : float
+        L1 bound on the canonical vectors of X, as a fraction (0 - 1) of the square root of the
+        number of features; smaller values result in sparser vectors.
+    penaltyz : float
+        L1 bound on the canonical vectors of Y, as a fraction of the square root of the number
+        of features.
+    K : int
+        Number of pairs of canonical vectors to compute.
+    niter : int
+        Number of iterations used to compute each pair of canonical vectors.
+    standardize : bool
+        Whether to center and scale the features of each dataset before performing CCA.
+
+    Returns
+    -------
+    dict
+        "u" and "v": canonical vectors of X and Y (pandas.DataFrame, features x K),
+        "d": penalized canonical covariances (numpy.ndarray) and "cors": correlations between
+        the projections of X and Y onto each pair of canonical vectors (numpy.ndarray).
+    """
+    x = promote(X).to_numpy(dtype=np.float64)
+    z = promote(Y).to_numpy(dtype=np.float64)
+
+    if standardize:
+        x = _scale(x)
+        z = _scale(z)
+
+    v_init = _init_v(x, z, K)
+
+    u = np.zeros((x.shape[1], K))
+    v = np.zeros((z.shape[1], K))
+    d = np.zeros(K)
+    cors = np.zeros(K)
+
+    xres, zres = x, z
+
+    for k in range(K):
+        u[:, k], v[:, k], d[k] = _sparse_cca_vectors(xres, zres, v_init[:, k], penaltyx,
+                                                     penaltyz, niter)
+
+        # deflate, so that xres.T @ zres = x.T @ z - sum(d * u * v.T)
+        if k < K - 1:
+            xres = np.vstack([xres, np.sqrt(d[k]) * u[:, k]])
+            zres = np.vstack([zres, -np.sqrt(d[k]) * v[:, k]])
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cors[k] = np.corrcoef(x @ u[:, k], z @ v[:, k])[0, 1]
+
+    columns = ["cv{}".format(i + 1) for i in range(K)]
+
+    return {
+        "u": pd.DataFrame(u, index=X.columns, columns=columns),
+        "v": pd.DataFrame(v, index=Y.columns, columns=columns),
+        "d": d,
+        "cors": cors,
+    }
+
+
+def cca_permute(X, Y, penaltyxs=None, penaltyzs=None, nperms=25, niter=3, standardize=True,
+                random_seed=1, processes=1):
+    """
+    Selects the penalties to use for sparse CCA using permutation tests, as in the PMA
+    package's CCA.permute function.
+
+    For each pair of penalties, sparse CCA is performed once using the original datasets, and
+    once for each random permutation of the observations, and the correlation between the
+    projections of X and Y onto the first pair of canonical vectors is compared to those of
+    the permuted datasets. Permutations are run by a pool of worker processes, which read the
+    datasets from shared memory.
+
+    Arguments
+    ---------
+    X : pandas.DataFrame
+        First dataset (observations x features).
+    Y : pandas.DataFrame
+        Second dataset (observations x features), with the same observations as X.
+    penaltyxs : list
+        Penalties to test for X (see sparse_cca); defaults to 10 values from 0.1 to 0.7.
+    penaltyzs : list
+        Penalties to test for Y, one for each penalty for X; defaults to 10 values from 0.1 to
+        0.7.
+    nperms : int
+        Number of permutations.
+    niter : int
+        Number of iterations used to compute each pair of canonical vectors.
+    standardize : bool
+        Whether to center and scale the features of each dataset before performing CCA.
+    random_seed : int
+        Seed used to generate the permutations.
+    processes : int
+        Number of worker processes to use.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Permutation test results, with one row for each pair of penalties, including the
+        correlation between the projections of X and Y ("cor"), its z-statistic relative to
+        the permutations ("zstat"), its permutation p-value ("pval"), and the number of
+        non-zero entries in the canonical vectors ("nnonzero_u" and "nnonzero_v"). The
+        penalties with the highest z-statistic are the best choice.
+    """
+    penaltyxs, penaltyzs = _get_penalty_grid(penaltyxs, penaltyzs)
+
+    x = promote(X).to_numpy(dtype=np.float64)
+    z = promote(Y).to_numpy(dtype=np.float64)
+
+    if standardize:
+        x = _scale(x)
+        z = _scale(z)
+
+    # the same initial canonical vector is used for the original and permuted datasets
+    v_init = _init_v(x, z, 1)[:, 0]
+
+    grid = (penaltyxs, penaltyzs, v_init, niter)
+
+    # permuting the observations of both datasets, as in PMA, is equivalent to permuting the
+    # observations of Y relative to those of X
+    rng = np.random.default_rng(random_seed)
+    perms = [rng.permutation(z.shape[0]) for _ in range(nperms)]
+
+    observed = _cca_grid(x, z, *grid)
+
+    if processes > 1 and nperms > 1:
+        permuted = _run_permutations(x, z, perms, grid, processes)
+    else:
+        permuted = [_cca_grid(x, z[perm], *grid) for perm in perms]
+
+    permuted = np.array(permuted).reshape(nperms, len(penaltyxs), 3)
+
+    cors = observed[:, 0]
+    perm_cors = permuted[:, :, 0].T
+
+    # Fisher-transformed correlations
+    with np.errstate(divide="ignore"):
+        ft_cors = np.arctanh(cors)
+        ft_perm_cors = np.arctanh(perm_cors)
+
+    zstats = ((ft_cors - ft_perm_cors.mean(axis=1)) /
+              (ft_perm_cors.std(axis=1, ddof=1) + 0.05))
+
+    return pd.DataFrame({
+        "penaltyx": penaltyxs,
+        "penaltyz": penaltyzs,
+        "cor": cors,
+        "zstat": zstats,
+        "pval": (perm_cors >= cors[:, np.newaxis]).mean(axis=1),
+        "nnonzero_u": observed[:, 1].astype(int),
+        "nnonzero_v": observed[:, 2].astype(int),
+        "nnonzero_u_perm": permuted[:, :, 1].mean(axis=0),
+        "nnonzero_v_perm": permuted[:, :, 2].mean(axis=0),
+    })
+
+
+def _get_penalty_grid(penaltyxs, penaltyzs):
+    """Returns the pairs of penalties tested by cca_permute"""
+    penaltyxs = np.linspace(0.1, 0.7, 10) if penaltyxs is None else np.atleast_1d(penaltyxs)
+    penaltyzs = np.linspace(0.1, 0.7, 10) if penaltyzs is None else np.atleast_1d(penaltyzs)
+
+    # a single penalty is used along with each of the penalties for the other dataset
+    if len(penaltyxs) == 1:
+        penaltyxs = np.repeat(penaltyxs, len(penaltyzs))
+    if len(penaltyzs) == 1:
+        penaltyzs = np.repeat(penaltyzs, len(penaltyxs))
+
+    if len(penaltyxs) != len(penaltyzs):
+        raise ValueError("penaltyxs and penaltyzs must be of the same length")
+
+    return penaltyxs.astype(np.float64), penaltyzs.astype(np.float64)
+
+
+def _cca_grid(x, z, penaltyxs, penaltyzs, v_init, niter):
+    """
+    Computes the first pair of sparse canonical vectors for each pair of penalties, and returns
+    the correlation between the projections of x and z, and the number of non-zero entries in
+    each vector.
+    """
+    res = np.zeros((len(penaltyxs), 3))
+
+    for i, (penaltyx, penaltyz) in enumerate(zip(penaltyxs, penaltyzs)):
+        u, v, _ = _sparse_cca_vectors(x, z, v_init, penaltyx, penaltyz, niter)
+
+        if (u != 0).any() and (v != 0).any():
+            res[i, 0] = np.corrcoef(x @ u, z @ v)[0, 1]
+
+        res[i, 1:] = (u != 0).sum(), (v != 0).sum()
+
+    return res
+
+
+# datasets shared with the current permutation worker process (see _init_worker)
+_shared = {}
+
+
+def _run_permutations(x, z, perms, grid, processes):
+    """Runs CCA for each permutation, using a pool of worker processes"""
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+
+    blocks = []
+
+    try:
+        # copy datasets to shared memory blocks, which are attached to by each worker
+        specs = []
+
+        for arr in [x, z]:
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            blocks.append(shm)
+
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+            specs.append((shm.name, arr.shape, arr.dtype.str))
+
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(specs,)) as pool:
+            futures = [pool.submit(_run_permutation, perm, grid) for perm in perms]
+
+            return [future.result() for future in futures]
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+
+def _init_worker(specs):
+    """Attaches a permutation worker process to the shared datasets"""
+    from multiprocessing import shared_memory
+    from .resources import limit_threads
+
+    # each worker runs a single permutation at a time
+    limit_threads(1)
+
+    arrays = []
+
+    for name, shape, dtype in specs:
+        shm = shared_memory.SharedMemory(name=name)
+        _shared.setdefault("blocks", []).append(shm)
+
+        arrays.append(np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+    _shared["x"], _shared["z"] = arrays
+
+
+def _run_permutation(perm, grid):
+    """Runs CCA for a single permutation of the shared datasets"""
+    return _cca_grid(_shared["x"], _shared["z"][perm], *grid)
+
+
+def _init_v(x, z, K):
+    """Returns the initial canonical vectors of z: the leading right singular vectors of x'z"""
+    return np.linalg.svd(x.T @ z, full_matrices=False)[2][:K].T
+
+
+def _sparse_cca_vectors(x, z, v, penaltyx, penaltyz, niter):
+    """Computes a single pair of sparse canonical vectors (PMA:::SparseCCA)"""
+    u = np.zeros(x.shape[1])
+    v_old = np.full_like(v, np.inf)
+
+    for _ in range(niter):
+        if np.isnan(u).any() or np.isnan(v).any():
+            v = np.zeros_like(v)
+            v_old = v
+
+        if np.abs(v_old - v).sum() <= 1e-6:
+            continue
+
+        # update u
+        arg_u = (z @ v) @ x
+        su = _soft(arg_u, _binary_search(arg_u, penaltyx * np.sqrt(x.shape[1])))
+        u = su / _l2n(su)
+
+        # update v
+        v_old = v
+        arg_v = (x @ u) @ z
+        sv = _soft(arg_v, _binary_search(arg_v, penaltyz * np.sqrt(z.shape[1])))
+        v = sv / _l2n(sv)
+
+    d = np.sum((x @ u) * (z @ v))
+
+    if np.isnan(u).any() or np.isnan(v).any():
+        return np.zeros(x.shape[1]), np.zeros(z.shape[1]), 0
+
+    return u, v, d
+
+
+def _binary_search(arg, sumabs):
+    """Finds the soft-thresholding parameter yielding a unit vector with the L1 norm "sumabs" """
+    if _l2n(arg) == 0 or np.abs(arg / _l2n(arg)).sum() <= sumabs:
+        return 0
+
+    lam1 = 0
+    lam2 = np.abs(arg).max() - 1e-5
+
+    for _ in range(149):
+        su = _soft(arg, (lam1 + lam2) / 2)
+
+        if np.abs(su / _l2n(su)).sum() < sumabs:
+            lam2 = (lam1 + lam2) / 2
+        else:
+            lam1 = (lam1 + lam2) / 2
+
+        if lam2 - lam1 < 1e-6:
+            break
+
+    return (lam1 + lam2) / 2
+
+
+def _soft(x, d):
+    """Soft-thresholding operator"""
+    return np.sign(x) * np.maximum(0, np.abs(x) - d)
+
+
+def _l2n(x):
+    """L2 norm of a vector; zero vectors are given a norm of 0.05, as in PMA"""
+    norm = np.sqrt(np.sum(x ** 2))
+
+    return norm if norm != 0 else 0.05
+
+
+def _scale(x):
+    """Centers and scales the columns of a matrix (as R's scale())"""
+    return (x - x.mean(axis=0)) / x.std(axis=0, ddof=1)
@@ -0,0 +1,360 @@
+"""
+Snakes data loading functionality
+
+Leading column and row filter actions for a dataset may be "pushed down" into the step which
+reads the dataset from disk (see SnakeWrangler.add_actions): column filters become a projection,
+so that only the needed columns are read, and row filters become predicates which are evaluated
+while reading, so that non-matching rows are never materialized.
+
+For feather files, projections and predicates are passed to Arrow; CSV files are read in chunks
+of rows, restricted to the needed columns.
+
+Pandas and pyarrow are imported by the functions which use them, so that the action names below
+may be used when generating Snakefiles, without loading either library.
+"""
+# actions which select columns based on their names
+PROJECTIONS = [
+    "filter_cols_name_in",
+    "filter_cols_name_not_in",
+    "filter_cols_name_startswith",
+    "filter_cols_name_endswith",
+]
+
+# actions which select rows based on the values in a single column
+PREDICATES = ["filter_rows_col_in", "filter_rows_col_not_in", "filter_rows_col_not_na"]
+
+PUSHDOWN_ACTIONS = PROJECTIONS + PREDICATES
+
+# default number of rows to read at a time when filtering CSV files, or reading datasets in
+# batches
+BATCH_SIZE = 100000
+
+
+def read_feather(infile, ops=None):
+    """
+    Loads a dataset from a feather file, with its first column as the index.
+
+    Arguments
+    ---------
+    infile : str
+        Path to a feather file.
+    ops : list
+        List of (action name, action params) tuples for column and row filter actions to apply
+        while reading the data (see PUSHDOWN_ACTIONS).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Loaded dataset.
+    """
+    import pandas as pd
+
+    if not ops:
+        dat = pd.read_feather(infile)
+        return dat.set_index(dat.columns[0])
+
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(infile, format="feather")
+    index_name = dataset.schema.names[0]
+
+    cols, predicates = _plan(dataset.schema.names[1:], index_name, ops)
+    expr, deferred = _arrow_filter(dataset.schema, predicates)
+
+    tbl = dataset.to_table(columns=[index_name] + _needed_columns(cols, predicates), filter=expr)
+
+    dat = tbl.to_pandas().set_index(index_name)
+
+    for name, params in deferred:
+        dat = _apply_predicate(dat, name, params)
+
+    return _finalize(dat, cols, predicates)
+
+
+def iter_feather(infile, ops=None, batch_size=None):
+    """
+    Iterates over batches of rows in a feather file, with its first column as the index.
+
+    See read_feather() for a description of the arguments; batch_size indicates the maximum
+    number of rows in each batch.
+
+    Returns
+    -------
+    generator
+        Generator yielding a DataFrame for each batch of rows.
+    """
+    import pyarrow.dataset as ds
+    from pandas.errors import EmptyDataError
+
+    dataset = ds.dataset(infile, format="feather")
+    index_name = dataset.schema.names[0]
+
+    cols, predicates = _plan(dataset.schema.names[1:], index_name, ops or [])
+    expr, deferred = _arrow_filter(dataset.schema, predicates)
+
+    batches = dataset.to_batches(columns=[index_name] + _needed_columns(cols, predicates),
+                                 filter=expr, batch_size=batch_size or BATCH_SIZE)
+
+    num_rows = 0
+
+    for batch in batches:
+        dat = batch.to_pandas().set_index(index_name)
+
+        for name, params in deferred:
+            dat = _apply_predicate(dat, name, params)
+
+        num_rows += dat.shape[0]
+
+        yield dat[cols]
+
+    # check to make sure data is non-empty after filtering step
+    if len(predicates) > 0 and num_rows == 0:
+        raise EmptyDataError("No data remaining after filter applied")
+
+
+def read_csv(infile, sep=",", index_col=0, encoding="utf-8", ops=None):
+    """
+    Loads a dataset from a delimited text file.
+
+    Arguments
+    ---------
+    infile : str
+        Path to a CSV/TSV file.
+    sep : str
+        Field delimiter.
+    index_col : int|str
+        Position or name of the column to use as the index.
+    encoding : str
+        File encoding.
+    ops : list
+        List of (action name, action params) tuples for column and row filter actions to apply
+        while reading the data (see PUSHDOWN_ACTIONS).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Loaded dataset.
+    """
+    import pandas as pd
+
+    if not ops:
+        return pd.read_csv(infile, sep=sep, index_col=index_col, encoding=encoding)
+
+    chunks = list(iter_csv(infile, sep, index_col, encoding, ops))
+
+    if len(chunks) > 0:
+        dat = pd.concat(chunks)
+    else:
+        dat = pd.read_csv(infile, sep=sep, index_col=index_col, encoding=encoding, nrows=0)
+        dat = _finalize(dat, *_plan(dat.columns, dat.index.name, ops))
+
+    return dat
+
+
+def iter_csv(infile, sep=",", index_col=0, encoding="utf-8", ops=None, batch_size=None):
+    """
+    Iterates over batches of rows in a delimited text file, restricted to the columns needed.
+
+    See read_csv() for a description of the arguments; batch_size indicates the maximum number
+    of rows in each batch.
+
+    Returns
+    -------
+    generator
+        Generator yielding a DataFrame for each batch of rows.
+    """
+    import pandas as pd
+    from pandas.errors import EmptyDataError
+
+    # determine column names from header
+    header = list(pd.read_csv(infile, sep=sep, encoding=encoding, nrows=0).columns)
+
+    index_name = header[index_col] if isinstance(index_col, int) else index_col
+
+    cols, predicates = _plan([x for x in header if x != index_name], index_name, ops or [])
+
+    usecols = [index_name] + _needed_columns(cols, predicates)
+
+    reader = pd.read_csv(infile, sep=sep, index_col=index_name, usecols=usecols,
+                         encoding=encoding, chunksize=batch_size or BATCH_SIZE)
+
+    num_rows = 0
+
+    for chunk in reader:
+        for name, params in predicates:
+            chunk = _apply_predicate(chunk, name, params)
+
+        num_rows += chunk.shape[0]
+
+        yield chunk[cols]
+
+    # check to make sure data is non-empty after filtering step
+    if len(predicates) > 0 and num_rows == 0:
+        raise EmptyDataError("No data remaining after filter applied")
+
+
+def _plan(columns, index_name, ops):
+    """
+    Determines the columns remaining after a sequence of column filter actions has been applied,
+    and the row predicates to evaluate.
+
+    Arguments
+    ---------
+    columns : list
+        Names of the non-index columns in the dataset.
+    index_name : str
+        Name of the index column.
+    ops : list
+        List of (action name, action params) tuples.
+
+    Returns
+    -------
+    tuple
+        List of columns to return, in order, and list of (action name, action params) tuples for
+        row predicates.
+    """
+    cols = list(columns)
+    predicates = []
+
+    for name, params in ops:
+        if name == "filter_cols_name_in":
+            # if index column specified, ignore it
+            keep = [x for x in params["names"] if x != index_name]
+
+            _check_columns(keep, cols)
+
+            cols = keep
+        elif name == "filter_cols_name_not_in":
+            if params.get("errors", "ignore") == "raise":
+                _check_columns(params["names"], cols)
+
+            cols = [x for x in cols if x not in params["names"]]
+        elif name == "filter_cols_name_startswith":
+            cols = [x for x in cols if x.startswith(params["prefix"]) != params["drop"]]
+        elif name == "filter_cols_name_endswith":
+            cols = [x for x in cols if x.endswith(params["suffix"]) != params["drop"]]
+        elif name in PREDICATES:
+            _check_columns([params["col"]], cols)
+
+            predicates.append((name, params))
+        else:
+            raise ValueError("Action '{}' cannot be applied while loading data".format(name))
+
+    return cols, predicates
+
+
+def _check_columns(names, cols):
+    """Raises a KeyError if any of the specified column names are not present"""
+    missing = [x for x in names if x not in cols]
+
+    if len(missing) > 0:
+        raise KeyError("Columns not found in dataset: {}".format(missing))
+
+
+def _needed_columns(cols, predicates):
+    """Returns the unique columns needed to evaluate predicates and construct the result"""
+    needed = list(dict.fromkeys(cols))
+
+    for _, params in predicates:
+        if params["col"] not in needed:
+            needed.append(params["col"])
+
+    return needed
+
+
+def _arrow_filter(schema, predicates):
+    """
+    Combines row predicates into a single arrow filter expression; predicates which cannot be
+    expressed in arrow with the same semantics are returned separately, to be applied after
+    loading.
+    """
+    expr = None
+    deferred = []
+
+    for name, params in predicates:
+        pred = _arrow_predicate(schema.field(params["col"]), name, params)
+
+        if pred is None:
+            deferred.append((name, params))
+        elif expr is None:
+            expr = pred
+        else:
+            expr = expr & pred
+
+    return expr, deferred
+
+
+def _arrow_predicate(field, name, params):
+    """
+    Creates an arrow filter expression for a row predicate, or returns None if the predicate
+    cannot be evaluated by arrow with the same semantics as in pandas.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    col = pc.field(params["col"])
+
+    if name == "filter_rows_col_not_na":
+        expr = col.is_valid()
+
+        if pa.types.is_floating(field.type):
+            expr = expr & ~pc.is_nan(col)
+
+        return expr
+
+    # only use arrow for value sets of a compatible type; pandas compares values of mismatched
+    # types (e.g. strings and integers) as unequal, rather than casting them
+    try:
+        value_set = pa.array(params["values"])
+    except (pa.ArrowException, TypeError):
+        return None
+
+    numeric = [pa.types.is_integer, pa.types.is_floating]
+    strings = [pa.types.is_string, pa.types.is_large_string]
+
+    compatible = any(
+        any(check(field.type) for check in group) and any(check(value_set.type) for check in group)
+        for group in [numeric, strings]
+    )
+
+    if not compatible:
+        return None
+
+    # values which cannot be represented exactly in the column type (e.g. 1.5 for an integer
+    # column) are also handled by pandas
+    try:
+        value_set = value_set.cast(field.type)
+    except pa.ArrowException:
+        return None
+
+    expr = col.isin(value_set)
+
+    if name == "filter_rows_col_not_in":
+        expr = ~expr
+
+    return expr
+
+
+def _apply_predicate(df, name, params):
+    """Applies a row predicate to a loaded dataset"""
+    col = df[params["col"]]
+
+    if name == "filter_rows_col_in":
+        mask = col.isin(params["values"])
+    elif name == "filter_rows_col_not_in":
+        mask = ~col.isin(params["values"])
+    else:
+        mask = col.notnull()
+
+    return df[mask]
+
+
+def _finalize(dat, cols, predicates):
+    """Selects the final columns of a dataset loaded with pushed-down filters"""
+    from pandas.errors import EmptyDataError
+
+    # check to make sure data is non-empty after filtering step
+    if len(predicates) > 0 and dat.shape[0] == 0:
+        raise EmptyDataError("No data remaining after filter applied")
+
+    return dat[cols]
@@ -0,0 +1,219 @@
+"""
+Snakes metadata profiling functionality
+
+When generating a Snakefile, the row and column metadata files of each dataset are used to choose
+default plot styles (fields with more than one distinct value; see
+SnakefileRenderer._check_styles). Rather than loading each metadata file for every dataset it
+is used by, on every render, a profile of each file (the number of distinct values in each
+field) is computed once, and cached by file path, size and modification time (see the
+"metadata_profiles" section of conf/defaults.yml).
+
+Files up to "exact_max_size" are loaded in full, and their distinct values counted exactly.
+Larger files are read in a single pass, one batch of rows at a time, and the number of distinct
+values in each field is estimated using a k-minimum values (KMV) sketch: each value is hashed to
+a 64-bit integer, and only the K smallest distinct hashes are kept. Fields with fewer than K
+distinct values are counted exactly (barring hash collisions); for others, the count is
+estimated from the K-th smallest hash, with a relative standard error of about 1 / sqrt(K).
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+from snakes.util import load_data, parse_size
+
+# number of hashes kept for each field by the KMV sketch
+SKETCH_SIZE = 1024
+
+# number of rows read at a time when profiling large files
+BATCH_SIZE = 100000
+
+# bumped when the format or computation of profiles changes, to invalidate cached profiles
+PROFILE_VERSION = 1
+
+
+class MetadataProfiles:
+    def __init__(self, cache_dir=None, exact_max_size="100MB"):
+        """
+        Creates a new MetadataProfiles instance.
+
+        Arguments
+        ---------
+        cache_dir : str
+            Directory to cache profiles in, or None to only cache profiles in memory.
+        exact_max_size : str|int
+            Maximum size of files whose distinct values are counted exactly (e.g. "100MB").
+        """
+        self.cache_dir = None if cache_dir is None else os.path.expanduser(cache_dir)
+        self.exact_max_size = parse_size(exact_max_size)
+
+        # profiles already loaded or computed, keyed by path and file signature
+        self._profiles = {}
+
+    def get_cardinalities(self, path):
+        """
+        Returns the number of distinct non-missing values in each field of a metadata file.
+
+        Arguments
+        ---------
+        path : str
+            Path to a metadata file (csv, tsv, feather or parquet), with row or column ids in
+            the first field.
+
+        Returns
+        -------
+        dict
+            Number of distinct values, keyed by field name, in the order of the fields.
+        """
+        if not os.path.exists(path):
+            sys.exit("[ERROR] Unable to find metadata file: {}".format(path))
+
+        path = os.path.realpath(path)
+        info = os.stat(path)
+
+        key = (path, info.st_size, info.st_mtime_ns)
+
+        if key not in self._profiles:
+            self._profiles[key] = self._load_profile(path, info)
+
+        return self._profiles[key]["cardinalities"]
+
+    def _load_profile(self, path, info):
+        """Loads the cached profile for a file, computing it if needed"""
+        signature = {
+            "version": PROFILE_VERSION,
+            "path": path,
+            "size": info.st_size,
+            "mtime_ns": info.st_mtime_ns,
+        }
+
+        cache_file = None
+
+        if self.cache_dir is not None:
+            cache_file = os.path.join(
+                self.cache_dir, hashlib.sha256(path.encode()).hexdigest() + ".json"
+            )
+
+            if os.path.exists(cache_file):
+                with open(cache_file) as fp:
+                    profile = json.load(fp)
+
+                if profile["signature"] == signature:
+                    return profile
+
+        logging.info("Profiling metadata: %s", path)
+
+        if info.st_size <= self.exact_max_size:
+            cardinalities = count_distinct(path)
+        else:
+            cardinalities = estimate_distinct(path)
+
+        profile = {
+            "signature": signature,
+            "exact": info.st_size <= self.exact_max_size,
+            "cardinalities": cardinalities,
+        }
+
+        if cache_file is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            # write atomically, in case multiple renders profile the same file
+            tmp_file = "{}.{}.tmp".format(cache_file, os.getpid())
+
+            with open(tmp_file, "w") as fp:
+                json.dump(profile, fp)
+
+            os.replace(tmp_file, cache_file)
+
+        return profile
+
+
+def count_distinct(path):
+    """Returns the exact number of distinct values in each field of a metadata file"""
+    mdat = load_data(path)
+
+    return {str(k): int(v) for k, v in mdat.nunique().items()}
+
+
+def estimate_distinct(path, sketch_size=SKETCH_SIZE, batch_size=BATCH_SIZE):
+    """
+    Estimates the number of distinct values in each field of a metadata file, in a single pass
+    over the file, using a KMV sketch for each field.
+
+    Arguments
+    ---------
+    path : str
+        Path to a metadata file (csv, tsv, feather or parquet).
+    sketch_size : int
+        Number of hashes kept for each field.
+    batch_size : int
+        Number of rows to read at a time.
+
+    Returns
+    -------
+    dict
+        Estimated number of distinct values, keyed by field name.
+    """
+    import numpy as np
+    import pandas as pd
+
+    sketches = {}
+
+    for batch in _iter_batches(path, batch_size):
+        for col in batch.columns:
+            vals = batch[col].dropna()
+
+            hashes = pd.util.hash_pandas_object(vals, index=False).to_numpy()
+
+            sketch = sketches.get(str(col), np.empty(0, dtype=np.uint64))
+
+            # once the sketch is full, only smaller hashes can be added to it
+            if len(sketch) == sketch_size:
+                hashes = hashes[hashes < sketch[-1]]
+
+            sketches[str(col)] = np.unique(np.concatenate([sketch, hashes]))[:sketch_size]
+
+    res = {}
+
+    for col, sketch in sketches.items():
+        if len(sketch) < sketch_size:
+            res[col] = len(sketch)
+        else:
+            # the k-th smallest of n uniformly distributed hashes is expected to be ~k / n of
+            # the way through the hash range
+            res[col] = int(round((sketch_size - 1) * 2.0 ** 64 / (float(sketch[-1]) + 1)))
+
+    return res
+
+
+def _iter_batches(path, batch_size):
+    """Iterates over batches of rows in a metadata file, excluding the first (id) field"""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow import csv
+
+    if path.endswith(".feather") or path.endswith(".parquet"):
+        dataset = ds.dataset(path, format="feather" if path.endswith(".feather") else "parquet")
+        columns = dataset.schema.names[1:]
+
+        for batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+            yield batch.to_pandas()
+    else:
+        parse_options = csv.ParseOptions(delimiter="\t" if path.endswith(".tsv") else ",")
+
+        # determine field names from header
+        with csv.open_csv(path, parse_options=parse_options) as reader:
+            columns = reader.schema.names[1:]
+
+        # values are read as strings, so that each value is hashed the same way in every batch,
+        # regardless of the types that would be inferred for the batch
+        convert_options = csv.ConvertOptions(
+            column_types={x: pa.string() for x in columns},
+            include_columns=columns,
+            strings_can_be_null=True,
+        )
+
+        with csv.open_csv(path, parse_options=parse_options,
+                          convert_options=convert_options) as reader:
+            for batch in reader:
+                yield batch.to_pandas()
@@ -0,0 +1,313 @@
+"""
+Snakes pivot functionality
+
+Memory-efficient long-to-wide pivoting: index and column keys are first encoded as integer codes,
+after which values are scattered into a pre-allocated matrix, one batch of rows at a time. This
+avoids the large temporary structures created by pandas.DataFrame.pivot, and allows long-format
+feather files to be pivoted without loading them into memory.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_float_dtype
+from .dtypes import ACCUMULATOR_DTYPE
+
+# default number of input rows to process at a time
+BATCH_SIZE = 1000000
+
+# functions which may be used to combine values for duplicate index/column key pairs
+REDUCERS = ["sum", "mean", "min", "max", "first", "last"]
+
+
+def pivot_wide(df, columns, values, index=None, reducer=None, sparse=False, batch_size=BATCH_SIZE):
+    """
+    Converts a long-format dataset to wide format.
+
+    Arguments
+    ---------
+    df : pandas.DataFrame
+        Long-format dataset.
+    columns : str
+        Name of the column whose values should be used as the new column names.
+    values : str
+        Name of the column containing the values to be placed in the new matrix.
+    index : str
+        Name of the column whose values should be used as the new row names. If None, the
+        index of the input dataset is used.
+    reducer : str
+        Function used to combine values for duplicate index/column pairs (one of "sum", "mean",
+        "min", "max", "first", or "last"). If None, an exception is raised when duplicates are
+        encountered.
+    sparse : bool
+        If True, a sparse DataFrame is returned, with missing entries treated as zeros.
+    batch_size : int
+        Number of input rows to scatter at a time.
+
+    Returns
+    -------
+    pandas.DataFrame
+        A wide-format DataFrame with sorted row and column names.
+    """
+    index_keys = df.index if index is None else df[index]
+    index_name = df.index.name if index is None else index
+
+    # encode index and column keys as integer codes
+    row_codes, row_labels = pd.factorize(index_keys, sort=True)
+    col_codes, col_labels = pd.factorize(df[columns], sort=True)
+
+    vals = df[values].to_numpy()
+
+    mat = _PivotMatrix(row_labels, col_labels, vals.dtype, reducer, sparse)
+
+    for start in range(0, df.shape[0], batch_size):
+        end = start + batch_size
+        mat.scatter(row_codes[start:end], col_codes[start:end], vals[start:end])
+
+    return mat.to_frame(index_name, columns)
+
+
+def pivot_wide_feather(infile, columns, values, index=None, reducer=None, sparse=False,
+                       batch_size=BATCH_SIZE):
+    """
+    Converts a long-format feather file to wide format, streaming the input in batches.
+
+    The input is read twice: once to determine the set of index and column keys, reading only
+    the key columns, and once to scatter the values into the result matrix. At no point is the
+    full long-format table loaded into memory.
+
+    Arguments
+    ---------
+    infile : str
+        Path to a long-format feather file.
+    index : str
+        Name of the column whose values should be used as the new row names. If None, the first
+        column in the file (i.e. the stored dataset index) is used.
+
+    See pivot_wide() for a description of the remaining arguments.
+
+    Returns
+    -------
+    pandas.DataFrame
+        A wide-format DataFrame with sorted row and column names.
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(infile, format="feather")
+
+    if index is None:
+        index = dataset.schema.names[0]
+
+    # first pass: determine sorted index and column keys
+    row_keys = []
+    col_keys = []
+
+    for batch in dataset.to_batches(columns=[index, columns], batch_size=batch_size):
+        row_keys.append(pd.unique(batch.column(0).to_pandas()))
+        col_keys.append(pd.unique(batch.column(1).to_pandas()))
+
+    row_labels = _sorted_keys(row_keys)
+    col_labels = _sorted_keys(col_keys)
+
+    # second pass: scatter values into result matrix
+    mat = None
+
+    for batch in dataset.to_batches(columns=[index, columns, values], batch_size=batch_size):
+        vals = batch.column(2).to_numpy(zero_copy_only=False)
+
+        if mat is None:
+            mat = _PivotMatrix(row_labels, col_labels, vals.dtype, reducer, sparse)
+
+        mat.scatter(row_labels.get_indexer(batch.column(0).to_pandas()),
+                    col_labels.get_indexer(batch.column(1).to_pandas()),
+                    vals)
+
+    if mat is None:
+        dtype = dataset.schema.field(values).type.to_pandas_dtype()
+        mat = _PivotMatrix(row_labels, col_labels, np.dtype(dtype), reducer, sparse)
+
+    return mat.to_frame(index, columns)
+
+
+def _sorted_keys(keys):
+    """Combines lists of batch-level unique keys into a single sorted Index"""
+    if len(keys) == 0:
+        return pd.Index([])
+
+    uniques = pd.unique(np.concatenate(keys))
+
+    # missing keys are excluded, as with pd.factorize
+    return pd.Index(uniques).dropna().sort_values()
+
+
+class _PivotMatrix:
+    """Pre-allocated wide-format matrix which values are scattered into"""
+
+    def __init__(self, row_labels, col_labels, dtype, reducer=None, sparse=False):
+        if reducer is not None and reducer not in REDUCERS:
+            msg = "Invalid pivot reducer specified: '{}' (expected one of: {})"
+            raise ValueError(msg.format(reducer, ", ".join(REDUCERS)))
+
+        self.row_labels = row_labels
+        self.col_labels = col_labels
+        self.shape = (len(row_labels), len(col_labels))
+        self.reducer = reducer
+        self.sparse = sparse
+
+        # floating point values keep their dtype; other values are stored as floats so that
+        # missing entries can be represented
+        self.dtype = dtype if is_float_dtype(dtype) else np.dtype(ACCUMULATOR_DTYPE)
+
+        if sparse:
+            # for sparse matrices, (row, column, value) triplets are collected and combined at
+            # the end
+            self._rows = []
+            self._cols = []
+            self._vals = []
+            return
+
+        # sums and means are accumulated at full precision
+        if reducer in ["sum", "mean"]:
+            acc_dtype = ACCUMULATOR_DTYPE
+        else:
+            acc_dtype = self.dtype
+
+        fill_values = {"sum": 0, "mean": 0, "min": np.inf, "max": -np.inf}
+
+        self._values = np.full(self.shape, fill_values.get(reducer, np.nan), dtype=acc_dtype)
+        self._seen = np.zeros(self.shape, dtype=bool)
+
+        if reducer == "mean":
+            self._counts = np.zeros(self.shape, dtype=np.uint32)
+
+    def scatter(self, rows, cols, vals):
+        """Scatters a batch of values into the matrix"""
+        # exclude entries with missing keys
+        mask = (rows >= 0) & (cols >= 0)
+
+        # reducers ignore missing values
+        if self.reducer is not None:
+            mask &= ~pd.isna(vals)
+
+        rows = rows[mask]
+        cols = cols[mask]
+        vals = vals[mask]
+
+        if self.sparse:
+            self._rows.append(rows.astype(np.int64))
+            self._cols.append(cols.astype(np.int64))
+            self._vals.append(vals)
+            return
+
+        if self.reducer is None:
+            lin = self._linear_index(rows, cols)
+            uniq, counts = np.unique(lin, return_counts=True)
+
+            if (counts > 1).any():
+                self._raise_duplicate(uniq[counts > 1][0])
+
+            seen = self._seen[rows, cols]
+
+            if seen.any():
+                self._raise_duplicate(lin[seen][0])
+
+            self._values[rows, cols] = vals
+        elif self.reducer == "first":
+            # first occurrence within the batch, for entries not previously seen
+            _, ind = np.unique(self._linear_index(rows, cols), return_index=True)
+            ind = ind[~self._seen[rows[ind], cols[ind]]]
+
+            self._values[rows[ind], cols[ind]] = vals[ind]
+        elif self.reducer == "last":
+            # last occurrence within the batch
+            _, ind = np.unique(self._linear_index(rows, cols)[::-1], return_index=True)
+            ind = len(rows) - 1 - ind
+
+            self._values[rows[ind], cols[ind]] = vals[ind]
+        elif self.reducer in ["sum", "mean"]:
+            np.add.at(self._values, (rows, cols), vals)
+
+            if self.reducer == "mean":
+                np.add.at(self._counts, (rows, cols), 1)
+        elif self.reducer == "min":
+            np.minimum.at(self._values, (rows, cols), vals)
+        elif self.reducer == "max":
+            np.maximum.at(self._values, (rows, cols), vals)
+
+        self._seen[rows, cols] = True
+
+    def to_frame(self, index_name=None, columns_name=None):
+        """Returns the matrix as a DataFrame"""
+        if self.sparse:
+            res = self._sparse_frame()
+        else:
+            values = self._values
+
+            if self.reducer == "mean":
+                np.divide(values, self._counts, out=values, where=self._counts > 0)
+
+            if self.reducer in ["sum", "mean", "min", "max"]:
+                values[~self._seen] = np.nan
+
+            res = pd.DataFrame(values.astype(self.dtype, copy=False),
+                               index=self.row_labels, columns=self.col_labels)
+
+        res.index.name = index_name
+        res.columns.name = columns_name
+
+        return res
+
+    def _sparse_frame(self):
+        """Combines collected triplets into a sparse DataFrame"""
+        from scipy.sparse import coo_matrix
+
+        lin = self._linear_index(np.concatenate(self._rows), np.concatenate(self._cols))
+        vals = np.concatenate(self._vals).astype(ACCUMULATOR_DTYPE)
+
+        # group entries by position
+        order = np.argsort(lin, kind="stable")
+        lin = lin[order]
+        vals = vals[order]
+
+        if len(lin) > 0:
+            starts = np.flatnonzero(np.r_[True, lin[1:] != lin[:-1]])
+        else:
+            starts = np.array([], dtype=np.int64)
+
+        ends = np.r_[starts[1:], len(lin)]
+
+        if self.reducer is None and len(starts) < len(lin):
+            self._raise_duplicate(lin[ends[ends - starts > 1][0] - 1])
+
+        if self.reducer in ["sum", "mean"] and len(vals) > 0:
+            vals = np.add.reduceat(vals, starts)
+
+            if self.reducer == "mean":
+                vals = vals / (ends - starts)
+        elif self.reducer == "min" and len(vals) > 0:
+            vals = np.minimum.reduceat(vals, starts)
+        elif self.reducer == "max" and len(vals) > 0:
+            vals = np.maximum.reduceat(vals, starts)
+        elif self.reducer == "last":
+            vals = vals[ends - 1]
+        else:
+            vals = vals[starts]
+
+        lin = lin[starts]
+
+        mat = coo_matrix((vals.astype(self.dtype), (lin // self.shape[1], lin % self.shape[1])),
+                         shape=self.shape)
+
+        return pd.DataFrame.sparse.from_spmatrix(mat.tocsc(), index=self.row_labels,
+                                                 columns=self.col_labels)
+
+    def _linear_index(self, rows, cols):
+        """Converts row and column codes to positions in the flattened matrix"""
+        return rows.astype(np.int64) * self.shape[1] + cols
+
+    def _raise_duplicate(self, pos):
+        """Raises an exception describing a duplicate index/column key pair"""
+        row, col = divmod(int(pos), self.shape[1])
+
+        msg = ("Duplicate entries found for index '{}' and column '{}'; specify a 'reducer' "
+               "(one of: {}) to combine duplicate values.")
+
+        raise ValueError(msg.format(self.row_labels[row], self.col_labels[col], ", ".join(REDUCERS)))
@@ -0,0 +1,317 @@
+"""
+Snakes pipeline profiling
+
+When enabled (see the "profiling" section of conf/defaults.yml), each dataset rule is
+instrumented in two ways:
+
+1. A snakemake "benchmark" file is written for every rule, recording its wall time, CPU time,
+   peak memory usage (RSS), and bytes read and written.
+2. Rules executed in Python append a record to a JSON-lines log with their wall time, CPU time,
+   and the size and shape (rows x columns) of each input and output dataset.
+
+Both are stored in the "profile" directory of each pipeline version's output directory. Note
+that snakemake executes "run" blocks within its own process when running locally, so memory
+and I/O measurements for concurrently running rules include each other's usage.
+
+The "snakes profile" command (see main()) combines the benchmarks and records for one or more
+pipeline versions, and summarizes them by action type, dataset, or rule.
+"""
+import glob
+import json
+import os
+import sys
+import time
+from argparse import ArgumentParser
+import pandas as pd
+
+# JSON-lines log of rule records, and directory containing snakemake benchmark files, relative to
+# the output directory for a pipeline version
+PROFILE_LOG = os.path.join("profile", "rules.jsonl")
+BENCHMARK_DIR = os.path.join("profile", "benchmarks")
+
+# benchmark fields included in profiles, and the names they are stored under
+BENCHMARK_FIELDS = {
+    "s": "wall_time",
+    "cpu_time": "cpu_time",
+    "max_rss": "max_rss_mb",
+    "io_in": "read_mb",
+    "io_out": "write_mb",
+}
+
+# profile fields which are summed or maximized when summarizing multiple rules
+SUM_FIELDS = ["wall_time", "cpu_time", "read_mb", "write_mb"]
+MAX_FIELDS = ["max_rss_mb", "input_rows", "input_cols", "output_rows", "output_cols"]
+
+
+def start():
+    """
+    Returns the starting wall and CPU times for a rule, to be passed to record().
+
+    Returns
+    -------
+    tuple
+        Wall time and thread CPU time (seconds).
+    """
+    return time.perf_counter(), time.thread_time()
+
+
+def record(log_file, rule_id, dataset_name, action_name, input, output, start_times,
+           wildcards=None):
+    """
+    Appends a record describing a completed rule to the profile log.
+
+    Arguments
+    ---------
+    log_file : str
+        Path to the JSON-lines profile log.
+    rule_id : str
+        Rule id.
+    dataset_name : str
+        Name of the dataset the rule belongs to.
+    action_name : str
+        Type of action performed by the rule.
+    input : list
+        Paths to the rule's input files.
+    output : list
+        Paths to the rule's output files.
+    start_times : tuple
+        Starting wall and CPU times, as returned by start().
+    wildcards : Wildcards
+        Rule wildcards (e.g. shard number), if any.
+    """
+    wall_time = time.perf_counter() - start_times[0]
+
+    # CPU time spent by other threads (e.g. BLAS) is included in the benchmark cpu_time only
+    cpu_time = time.thread_time() - start_times[1]
+
+    entry = {
+        "rule": rule_id,
+        "dataset": dataset_name,
+        "action": action_name,
+        "wildcards": dict(wildcards.items()) if wildcards else {},
+        "timestamp": time.time(),
+        "wall_time": round(wall_time, 4),
+        "cpu_time": round(cpu_time, 4),
+        "input": [describe_file(x) for x in input],
+        "output": [describe_file(x) for x in output],
+    }
+
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+
+    # single writes to files opened in append mode are not interleaved by concurrent rules
+    with open(log_file, "a") as fp:
+        fp.write(json.dumps(entry) + "\n")
+
+
+def describe_file(path):
+    """
+    Returns the path, size, and dimensions of a dataset file.
+
+    Arguments
+    ---------
+    path : str
+        Path to a dataset file.
+
+    Returns
+    -------
+    dict
+        Dict with "path", "bytes", "rows" and "cols" entries; dimensions are only determined for
+        feather files, excluding the index column.
+    """
+    res = {"path": str(path), "bytes": None, "rows": None, "cols": None}
+
+    if not os.path.isfile(path):
+        return res
+
+    res["bytes"] = os.path.getsize(path)
+
+    if str(path).endswith(".feather"):
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(str(path), format="feather")
+
+        res["rows"] = dataset.count_rows()
+        res["cols"] = len(dataset.schema.names) - 1
+
+    return res
+
+
+def load_profile(output_dir):
+    """
+    Loads the profile for a pipeline version.
+
+    Benchmarks are matched to rule records by rule id and wildcards; if a rule has been run more
+    than once, the most recent record is used.
+
+    Arguments
+    ---------
+    output_dir : str
+        Output directory for a pipeline version (e.g. "output/1.0").
+
+    Returns
+    -------
+    pd.DataFrame
+        Profile with one row per rule (and shard), and "rule", "dataset", "action", "shard",
+        timing, memory, I/O and data shape columns.
+    """
+    records = {}
+
+    log_file = os.path.join(output_dir, PROFILE_LOG)
+
+    if os.path.exists(log_file):
+        with open(log_file) as fp:
+            for line in fp:
+                entry = json.loads(line)
+                shard = entry["wildcards"].get("shard")
+
+                records[(entry["rule"], shard)] = {
+                    "rule": entry["rule"],
+                    "dataset": entry["dataset"],
+                    "action": entry["action"],
+                    "shard": shard,
+                    "wall_time": entry["wall_time"],
+                    "cpu_time": entry["cpu_time"],
+                    "input_rows": _sum_dims(entry["input"], "rows"),
+                    "input_cols": _sum_dims(entry["input"], "cols"),
+                    "output_rows": _sum_dims(entry["output"], "rows"),
+                    "output_cols": _sum_dims(entry["output"], "cols"),
+                }
+
+    # benchmarks are stored as <dataset>/<action>/<rule id>[.<shard>].tsv
+    pattern = os.path.join(output_dir, BENCHMARK_DIR, "*", "*", "*.tsv")
+
+    for infile in glob.glob(pattern):
+        dataset_name, action_name, filename = infile.split(os.sep)[-3:]
+
+        rule_id, _, shard = filename[:-len(".tsv")].partition(".")
+        shard = shard or None
+
+        benchmark = pd.read_csv(infile, sep="\t").iloc[-1]
+
+        entry = records.setdefault((rule_id, shard), {
+            "rule": rule_id, "dataset": dataset_name, "action": action_name, "shard": shard
+        })
+
+        # benchmarks include time spent by all threads, and by non-python rules
+        for field, name in BENCHMARK_FIELDS.items():
+            if field in benchmark and pd.notnull(benchmark[field]):
+                entry[name] = benchmark[field]
+
+    columns = ["rule", "dataset", "action", "shard"] + SUM_FIELDS + MAX_FIELDS
+
+    return pd.DataFrame(list(records.values()), columns=columns)
+
+
+def _sum_dims(files, dim):
+    """Returns the total number of rows or columns across a list of described files"""
+    values = [x[dim] for x in files if x[dim] is not None]
+
+    return sum(values) if values else None
+
+
+def summarize(profile, by="action"):
+    """
+    Summarizes a profile by action type, dataset, or rule.
+
+    Arguments
+    ---------
+    profile : pd.DataFrame
+        Profile, as returned by load_profile().
+    by : str
+        Column to summarize by ("action", "dataset", or "rule").
+
+    Returns
+    -------
+    pd.DataFrame
+        Summary with the number of jobs, total time and I/O, and the largest memory usage and
+        data dimensions for each group, sorted by total wall time.
+    """
+    aggs = {"jobs": ("rule", "size")}
+    aggs.update({x: (x, "sum") for x in SUM_FIELDS})
+    aggs.update({x: (x, "max") for x in MAX_FIELDS})
+
+    res = profile.groupby(by).agg(**aggs)
+
+    return res.sort_values("wall_time", ascending=False)
+
+
+def compare(profiles, by="action", field="wall_time"):
+    """
+    Compares a profile field across pipeline versions.
+
+    Arguments
+    ---------
+    profiles : dict
+        Mapping from version names to profiles, as returned by load_profile().
+    by : str
+        Column to summarize by ("action", "dataset", or "rule").
+    field : str
+        Summary field to compare (e.g. "wall_time" or "max_rss_mb").
+
+    Returns
+    -------
+    pd.DataFrame
+        Table with one column per version, and the ratio of the last version to the first.
+    """
+    res = pd.DataFrame({
+        version: summarize(profile, by)[field] for version, profile in profiles.items()
+    })
+
+    versions = list(profiles)
+
+    if len(versions) > 1:
+        res["ratio"] = res[versions[-1]] / res[versions[0]]
+
+    return res.sort_values(versions[-1], ascending=False)
+
+
+def main(args=None):
+    """
+    Command-line interface for summarizing pipeline profiles ("snakes profile").
+
+    Arguments
+    ---------
+    args : list
+        Command-line arguments; defaults to sys.argv[2:].
+    """
+    parser = ArgumentParser(
+        prog="snakes profile",
+        description="Summarizes rule runtimes, memory usage and data shapes for one or more "
+                    "pipeline versions.",
+    )
+
+    parser.add_argument(
+        "output_dirs",
+        nargs="+",
+        help="Output directories of the pipeline versions to summarize (e.g. output/1.0).",
+    )
+    parser.add_argument(
+        "--by",
+        choices=["action", "dataset", "rule"],
+        default="action",
+        help="Summarize by action type, dataset or rule (default: action).",
+    )
+    parser.add_argument(
+        "--field",
+        default="wall_time",
+        choices=SUM_FIELDS + MAX_FIELDS,
+        help="Field to compare when multiple versions are specified (default: wall_time).",
+    )
+
+    args = parser.parse_args(sys.argv[2:] if args is None else args)
+
+    profiles = {}
+
+    for output_dir in args.output_dirs:
+        profile = load_profile(output_dir)
+
+        if profile.empty:
+            sys.exit("[ERROR] No profile found in {}".format(output_dir))
+
+        profiles[os.path.basename(os.path.normpath(output_dir))] = profile
+
+    with pd.option_context("display.max_rows", None, "display.width", 120):
+        if len(profiles) == 1:
+            print(summarize(list(profiles.values())[0], args.by).round(2).to_string())
+        else:
+            print(compare(profiles, args.by, args.field).round(2).to_string())
@@ -2,21 +2,66 @@
 snakes template renderer
 """
 import datetime
+import hashlib
+import itertools
+import json
 import logging
 import pprint
 import os
 import re
 import pathlib
+import subprocess
 import sys
 import yaml
-import pandas as pd
 from argparse import ArgumentParser
-from jinja2 import Environment, ChoiceLoader, PackageLoader
-from pkg_resources import resource_filename
-from snakes.util import load_data, recursive_update
+from importlib.resources import files
+from snakes import worker
+from snakes.generic import JOB_TABLE_SUFFIX, RuntimeExpr, render_generic_code
+from snakes.metadata import MetadataProfiles
+from snakes.util import recursive_update
 from snakes.wrangler import SnakeWrangler
 
 
+def _get_resource_path(name):
+    """Returns the absolute path to a directory included in the snakes package"""
+    return os.path.abspath(str(files("snakes").joinpath(name)))
+
+
+def _format_output(output, temp=False):
+    """Formats the output of a rule, marking temporary outputs using snakemake's temp()"""
+    return "temp({!r})".format(output) if temp else repr(output)
+
+
+def _get_param_files(action):
+    """
+    Returns the paths to the files read by an action rule which are not rule inputs, for any of
+    its actions if the rule is a group (see cache.get_param_files())
+    """
+    from snakes.cache import get_param_files
+
+    actions = action.actions.values() if action.groupped else [action]
+
+    return [x for rule in actions for x in get_param_files(rule.params)]
+
+
+def _format_worker_call(code, name, generic=False):
+    """
+    Formats a call running the code of an inline action rule using the worker service (see
+    worker.py); the code is passed as a string literal, keeping its indentation.
+    """
+    code = code.rstrip()
+
+    # raw triple-quoted strings keep the code as it is, unless it contains triple quotes
+    if '"""' not in code:
+        literal = 'r"""\n{}\n"""'.format(code)
+    else:
+        literal = repr(code)
+
+    args = "input, output, threads, params=params" if generic else "input, output, threads"
+
+    return "        worker_client.run({}, {}, name={!r})".format(literal, args, str(name))
+
+
 class SnakefileRenderer:
     """Base SnakefileRenderer class"""
 
@@ -26,8 +71,8 @@ class SnakefileRenderer:
 
         self._setup_logger()
 
-        self._conf_dir = os.path.abspath(resource_filename(__name__, "conf"))
-        self._template_dir = os.path.abspath(resource_filename(__name__, "templates"))
+        self._conf_dir = _get_resource_path("conf")
+        self._template_dir = _get_resource_path("templates")
 
         # load action required / default parameters
         with open(os.path.join(self._conf_dir, "actions.yml")) as fp:
@@ -38,7 +83,7 @@ class SnakefileRenderer:
             self._report_cfgs = yaml.load(fp, Loader=yaml.FullLoader)
 
             # root snakes report directory
-            report_dir = os.path.abspath(resource_filename(__name__, "reports"))
+            report_dir = _get_resource_path("reports")
 
             # add report path prefixed
             for report in self._report_cfgs:
@@ -83,7 +128,7 @@ class SnakefileRenderer:
 
         logging.info("Initializing snakes")
 
-    def _load_config(self, config_filepath, **kwargs):
+    def _load_config(self, config_file, **kwargs):
         """Parses command-line arguments and loads snakes configuration."""
         # check to make sure config filepath is valid
         if not os.path.isfile(config_file):
@@ -111,7 +156,21 @@ class SnakefileRenderer:
             )
 
         # overide any settings specified via the command-line
-        self.config.update(cmdline_args)
+        args = dict(self._args)
+
+        for key in ["resources", "group_components"]:
+            if key in args:
+                args[key] = self._parse_key_value_args(key, args[key])
+
+        # execution settings which are only passed on to snakemake
+        snakemake_keys = ["cores", "resources", "profile", "keep_going", "rerun_incomplete",
+                          "group_components"]
+
+        for key in snakemake_keys:
+            if key in args:
+                self.config["execution"][key] = args.pop(key)
+
+        self.config.update(args)
 
         # overide any settings specified via the SnakefileRenderer constructor
         self.config.update(kwargs)
@@ -119,6 +178,14 @@ class SnakefileRenderer:
         # Store filepath of config file used
         self.config["config_file"] = os.path.abspath(config_file)
 
+        # config state, prior to parsing; used to detect changes affecting the Snakefile
+        state = {k: v for k, v in self.config.items() if k not in ["config", "force", "run"]}
+        state["execution"] = {
+            k: v for k, v in self.config["execution"].items() if k not in snakemake_keys
+        }
+
+        self._config_state = json.dumps(state, sort_keys=True, default=str)
+
         # update logging level if 'verbose' option is enabled
         if self.config["verbose"]:
             logging.getLogger().setLevel(logging.DEBUG)
@@ -133,6 +200,9 @@ class SnakefileRenderer:
 
         self._wrangler = SnakeWrangler(output_dir, self._report_cfgs)
 
+        # cached metadata file profiles, used to choose default plot styles
+        self._metadata_profiles = MetadataProfiles(**self.config["metadata_profiles"])
+
         # load dataset-specific configurations; each should be specified either as a filepath to a
         # dataset-specific yaml file, or as a dict instance
         datasets = {}
@@ -193,6 +263,27 @@ class SnakefileRenderer:
         # expand paths for any dataset parameters
         self._wrangler.expand_dataset_paths()
 
+        # compute work shared by multiple datasets or branches only once
+        if self.config["merge_shared_rules"]:
+            self._wrangler.merge_shared_rules(self.config["datasets"])
+
+        # split row-independent actions into parallel per-shard rules
+        for dataset_name, dataset in self.config["datasets"].items():
+            self._wrangler.shard_actions(dataset_name, dataset["sharding"], self._supported_actions)
+
+        # mark intermediate outputs which are not retained as temporary
+        scratch_dir = self.config["retention"]["scratch_dir"]
+
+        if scratch_dir is not None:
+            scratch_dir = os.path.join(os.path.expanduser(scratch_dir), self.config["name"],
+                                       self.config["version"])
+
+        self._wrangler.set_retention(self.config["retention"]["keep"], scratch_dir)
+
+        # render the inline actions of each type as a single rule with wildcards
+        if self.config["generic_rules"]["enabled"]:
+            self._wrangler.set_generic_rules()
+
     def _parse_dataset_config(self, user_cfg):
         """Loads a dataset config file and overides any global settings with any dataset-specific ones."""
 
@@ -210,6 +301,12 @@ class SnakefileRenderer:
             "sheet": 0,
             "config_file": "",
             "index_col": 0,
+            "dtypes": dict(self.config["dtypes"]),
+            "stats": self.config["stats"],
+            "pushdown": self.config["pushdown"],
+            "backend": dict(self.config["backend"]),
+            "sharding": dict(self.config["sharding"]),
+            "resources": dict(self.config["resources"]),
             "metadata": {
                 "columns": "",
                 "rows": ""
@@ -290,6 +387,12 @@ class SnakefileRenderer:
         # add actions to SnakeWrangler instance
         self._wrangler.add_actions(dataset["name"], dataset_actions, **dataset)
 
+        # determine which rules should be executed in batches
+        self._wrangler.set_backend(dataset["name"], dataset["backend"], self._supported_actions)
+
+        # determine threads and memory requirements for each rule
+        self._wrangler.set_resources(dataset["name"], dataset["resources"], self._supported_actions)
+
         # store parsed dataset config
         return dataset
 
@@ -311,23 +414,19 @@ class SnakefileRenderer:
         # check column styles
         if dataset['styles']['columns']['color'] ==  []:
             if dataset['metadata']['columns'] != '':
-                # load metadata
-                mdat = load_data(dataset['metadata']['columns'])
+                # number of distinct values in each metadata field
+                counts = self._metadata_profiles.get_cardinalities(dataset['metadata']['columns'])
 
-                # exclude known uninformative columns
-                cols_to_drop = [x for x in exclude_cols if x in mdat.columns]
-
-                if len(cols_to_drop) > 0:
-                    mdat = mdat.drop(cols_to_drop, axis=1)
-
-                # set default columns to use for plotting
-                dataset['styles']['columns']['color'] = mdat.columns[mdat.nunique() > 1].tolist()
+                # set default columns to use for plotting, excluding known uninformative columns
+                dataset['styles']['columns']['color'] = [
+                    k for k, v in counts.items() if v > 1 and k not in exclude_cols
+                ]
 
         # check row styles
         if dataset['styles']['rows']['color'] ==  []:
             if dataset['metadata']['rows'] != '':
-                mdat = load_data(dataset['metadata']['rows'])
-                dataset['styles']['rows']['color'] = mdat.columns[mdat.nunique() > 1].tolist()
+                counts = self._metadata_profiles.get_cardinalities(dataset['metadata']['rows'])
+                dataset['styles']['rows']['color'] = [k for k, v in counts.items() if v > 1]
 
     def _detect_unknown_settings(self, supported_cfg, user_cfg):
         """
@@ -414,6 +513,10 @@ class SnakefileRenderer:
         # overide with any user-specified config values
         cfg.update(action_params)
 
+        # actions implemented as R scripts are always rendered as separate rules
+        if cfg.get("engine") == "r":
+            cfg["inline"] = False
+
         return cfg
 
     def _parse_feature_selection_config(self, fsel_cfg):
@@ -462,6 +565,13 @@ class SnakefileRenderer:
         # overide with any user-specified config values
         cfg.update(data_int_params)
 
+        # check for supported method implementation
+        engines = self._supported_data_int_types.get(data_int_type, {}).get("engines")
+
+        if engines is not None and cfg.get("engine") not in engines:
+            msg = "[ERROR] Unsupported engine '{}' for {} (supported engines: {})"
+            sys.exit(msg.format(cfg.get("engine"), data_int_type, ", ".join(engines)))
+
         return cfg
 
     def _validate_main_config(self):
@@ -505,7 +615,7 @@ class SnakefileRenderer:
             dataset_cfg["actions"], os.path.basename(dataset_cfg["config_file"])
         )
 
-    def _validate_actions_config(self, actions_config, config_file):
+    def _validate_actions_config(self, actions_config, config_file, grouped=False):
         """
         Checks for existence of necessary template and required config parameters for a dataset
         config file subsection.
@@ -516,6 +626,8 @@ class SnakefileRenderer:
             List of dicts representing a single section in a config file
         config_file: str
             Filename of configuration file being processed
+        grouped: bool
+            Whether the actions are part of an action group
         """
         # base template directory
         base_dir = os.path.join(self._template_dir, "actions")
@@ -529,7 +641,7 @@ class SnakefileRenderer:
                 continue
             elif entry["action_name"] == "group":
                 # group
-                self._validate_actions_config(entry["actions"], config_file)
+                self._validate_actions_config(entry["actions"], config_file, grouped=True)
                 continue
             elif entry["action_name"] == "input":
                 # skip validation for "input" meta-action, if present
@@ -544,6 +656,17 @@ class SnakefileRenderer:
                 msg = "[ERROR] Unknown action entry '{}'".format(entry["action_name"])
                 sys.exit(msg)
 
+            # check for supported action implementation
+            engines = self._supported_actions.get(entry["action_name"], {}).get("engines")
+
+            if engines is not None and entry.get("engine") not in engines:
+                msg = "[ERROR] Unsupported engine '{}' for {} (supported engines: {})"
+                sys.exit(msg.format(entry.get("engine"), entry["action_name"], ", ".join(engines)))
+
+            if grouped and entry.get("engine") == "r":
+                msg = "[ERROR] Actions using the R engine cannot be part of a group: {}"
+                sys.exit(msg.format(entry["action_name"]))
+
             # add action-specific defaults
             if (
                 entry["action_name"] in self._supported_actions
@@ -586,10 +709,8 @@ class SnakefileRenderer:
             self.config["training_sets"]["response"]
         ]
 
-        rule_ids = self._wrangler.get_all_rule_ids()
-
         for target_id in target_ids:
-            if target_id not in rule_ids:
+            if not self._wrangler.has_rule(target_id):
                 msg = "[ERROR] Unknown target action id specified: '{}'"
                 sys.exit(msg.format(target_id))
 
@@ -612,12 +733,67 @@ class SnakefileRenderer:
         parser.add_argument(
             "-r",
             "--run",
+            action="store_true",
             default=False,
             help=(
                 "Runs pipeline, in addition to generating Snakefile."
             ),
         )
 
+        parser.add_argument(
+            "-f",
+            "--force",
+            action="store_true",
+            default=False,
+            help=(
+                "Regenerates the Snakefile, even if nothing affecting it has changed."
+            ),
+        )
+
+        # snakemake execution options (used with --run; override "execution" config settings)
+        parser.add_argument(
+            "-j",
+            "--cores",
+            help="Number of cores to use when running the pipeline, or 'all'.",
+        )
+
+        parser.add_argument(
+            "--resources",
+            nargs="+",
+            metavar="NAME=INT",
+            help="Resource limits to use when running the pipeline (e.g. mem_mb=16000).",
+        )
+
+        parser.add_argument(
+            "--profile",
+            help="Snakemake profile to use when running the pipeline (e.g. for cluster execution).",
+        )
+
+        parser.add_argument(
+            "-k",
+            "--keep-going",
+            action="store_true",
+            default=None,
+            help="Continue running independent jobs if a job fails.",
+        )
+
+        parser.add_argument(
+            "--rerun-incomplete",
+            action="store_true",
+            default=None,
+            help="Re-run jobs whose outputs are incomplete.",
+        )
+
+        parser.add_argument(
+            "--group-components",
+            nargs="+",
+            metavar="GROUP=INT",
+            help=(
+                "Number of connected components of each group to combine into a single job "
+                "(e.g. rna=10); see the \"group_datasets\" execution setting."
+            ),
+        )
+
         # convert command-line args to a dict and return
         args = parser.parse_args()
 
@@ -627,52 +803,57 @@ class SnakefileRenderer:
 
         return args
 
+    @staticmethod
+    def _parse_key_value_args(name, values):
+        """Parses a list of command-line NAME=INT arguments into a dict"""
+        res = {}
+
+        for value in values:
+            key, _, num = value.partition("=")
+
+            if not key or not num.isdigit():
+                msg = "[ERROR] Invalid --{} value specified: '{}' (expected NAME=INT)"
+                sys.exit(msg.format(name.replace("_", "-"), value))
+
+            res[key] = int(num)
+
+        return res
+
     def render(self):
         """Renders snakefile"""
-        logging.info("Generating Snakefile...")
+        fingerprint = self._get_fingerprint()
 
-        # template search paths;
-        # paths to inherited templates must be included here
-        loaders = [
-            PackageLoader("snakes", "templates"),
-            PackageLoader("snakes", "templates/annotations"),
-            PackageLoader("snakes", "templates/actions"),
-            PackageLoader("snakes", "templates/feature_selection"),
-            PackageLoader("snakes", "templates/gene_sets"),
-            PackageLoader("snakes", "templates/training_set"),
-            PackageLoader("snakes", "templates/actions/aggregate"),
-            PackageLoader("snakes", "templates/actions/cluster"),
-            PackageLoader("snakes", "templates/actions/filter"),
-            PackageLoader("snakes", "templates/actions/integrate"),
-            PackageLoader("snakes", "templates/actions/impute"),
-            PackageLoader("snakes", "templates/actions/load"),
-            PackageLoader("snakes", "templates/actions/map"),
-            PackageLoader("snakes", "templates/actions/project"),
-            PackageLoader("snakes", "templates/actions/transform"),
-        ]
+        # skip rendering if nothing affecting the Snakefile has changed since it was generated
+        if self._is_up_to_date(fingerprint):
+            logging.info("Snakefile is up to date: %s (use --force to regenerate)",
+                         self.output_file)
+        else:
+            self._write_snakefile(fingerprint)
 
-        # get jinaj2 environment
-        env = Environment(
-            loader=ChoiceLoader(loaders),
-            trim_blocks=True,
-            lstrip_blocks=True,
-            extensions=["jinja2.ext.do"],
-        )
+        # run pipeline, if requested
+        if self._args["run"]:
+            self.run()
 
-        #
-        # define custom jinja2 filters
-        #
-        env.filters["basename"] = os.path.basename
-        env.filters["expanduser"] = os.path.expanduser
+    def _write_snakefile(self, fingerprint):
+        """Renders the Snakefile and writes it to disk"""
+        logging.info("Generating Snakefile...")
+
+        env = self._get_template_env()
 
         # get snakefile jinja2 template
         template = env.get_template("Snakefile")
 
         # root snakes script directory
-        script_dir = os.path.abspath(resource_filename(__name__, "src"))
+        script_dir = _get_resource_path("src")
 
         # root data directory
-        data_dir = os.path.abspath(resource_filename(__name__, "data"))
+        data_dir = _get_resource_path("data")
+
+        # render generic rule code and write job table
+        job_table = self.output_file + JOB_TABLE_SUFFIX
+
+        generic_rules = self._render_generic_rules(env, job_table, script_dir=script_dir,
+                                                   data_dir=data_dir)
 
         # render template
         snakefile = template.render(
@@ -680,7 +861,10 @@ class SnakefileRenderer:
             wrangler=self._wrangler,
             date_str=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             script_dir=script_dir,
-            data_dir=data_dir
+            data_dir=data_dir,
+            fingerprint=fingerprint,
+            generic_rules=generic_rules,
+            job_table=os.path.basename(job_table)
         )
 
         # otherwise, write Snakefile to disk
@@ -689,10 +873,290 @@ class SnakefileRenderer:
         with open(self.output_file, "w") as file_handle:
             file_handle.write(snakefile)
 
-        # save rendered snakefile to disk
-        if self._args['run']:
-            import snakemake
+    def _get_template_env(self):
+        """Returns the jinja2 environment used to render the Snakefile and rule code"""
+        # jinja2 is only imported if templates need to be rendered
+        from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 
-            # TODO: add support for specifying profile, number of cores
-            snakemake.snakemake(self.output_file)
+        # template search paths;
+        # paths to inherited templates must be included here
+        template_dirs = [
+            "",
+            "annotations",
+            "actions",
+            "feature_selection",
+            "gene_sets",
+            "training_set",
+            "actions/aggregate",
+            "actions/cluster",
+            "actions/filter",
+            "actions/integrate",
+            "actions/impute",
+            "actions/load",
+            "actions/map",
+            "actions/project",
+            "actions/transform",
+        ]
+
+        loader = FileSystemLoader([os.path.join(self._template_dir, x) for x in template_dirs])
+
+        # cache compiled templates between runs
+        bytecode_cache = None
+
+        if self.config["rendering"]["bytecode_cache"] is not None:
+            cache_dir = os.path.expanduser(self.config["rendering"]["bytecode_cache"])
+
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(cache_dir)
+            except OSError:
+                logging.warning("Unable to create template cache directory: %s", cache_dir)
+
+        # get jinaj2 environment
+        env = Environment(
+            loader=loader,
+            bytecode_cache=bytecode_cache,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            extensions=["jinja2.ext.do"],
+        )
+
+        #
+        # define custom jinja2 filters
+        #
+        env.filters["basename"] = os.path.basename
+        env.filters["expanduser"] = os.path.expanduser
+        env.filters["sha256"] = lambda x: hashlib.sha256(x.encode()).hexdigest()
+        env.filters["rule_output"] = _format_output
+        env.filters["worker_call"] = _format_worker_call
+        env.filters["param_files"] = _get_param_files
+
+        return env
+
+    def _get_fingerprint(self):
+        """
+        Returns a fingerprint of everything affecting the rendered Snakefile: the config
+        (including any command-line overrides), dataset config files, the sizes of dataset input
+        files (used to choose backends and numbers of shards), metadata files, and the snakes
+        code, templates and default settings.
+        """
+        digest = hashlib.sha256(self._config_state.encode())
+        digest.update(self.output_file.encode())
+
+        for dataset in self.config["datasets"].values():
+            if dataset["config_file"]:
+                with open(dataset["config_file"], "rb") as fp:
+                    digest.update(fp.read())
+
+            if os.path.exists(dataset["path"]):
+                digest.update(str(os.path.getsize(dataset["path"])).encode())
+
+            # metadata files (used to choose default plot styles)
+            for path in dataset["metadata"].values():
+                if path and os.path.exists(path):
+                    info = os.stat(path)
+                    digest.update("{}:{}:{}".format(path, info.st_size, info.st_mtime_ns).encode())
+
+        # snakes package, excluding data files, which are only referenced by path
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+
+        for root, dirs, files in os.walk(package_dir):
+            dirs[:] = sorted(x for x in dirs if x not in ["__pycache__", "data"])
+
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+
+                digest.update(os.path.relpath(path, package_dir).encode())
+
+                with open(path, "rb") as fp:
+                    digest.update(fp.read())
+
+        return digest.hexdigest()
+
+    def _is_up_to_date(self, fingerprint):
+        """Returns True if the existing Snakefile was generated with the same fingerprint"""
+        if not self.config["rendering"]["skip_unchanged"] or self._args["force"]:
+            return False
+
+        if not os.path.isfile(self.output_file):
+            return False
+
+        # generic rules also require the job table
+        job_table = self.output_file + JOB_TABLE_SUFFIX
+
+        if len(self._wrangler.generic_rules) > 0 and not os.path.isfile(job_table):
+            return False
+
+        # fingerprint is stored in the Snakefile header
+        with open(self.output_file) as fp:
+            for line in itertools.islice(fp, 50):
+                if line.rstrip() == "#  Fingerprint: " + fingerprint:
+                    return True
+
+        return False
+
+
+    def _render_generic_rules(self, env, job_table, **kwargs):
+        """
+        Renders the code variants of each generic rule, and writes the job table containing the
+        inputs, parameters and resources of their jobs (see snakes/generic.py).
+
+        Returns a list of dicts describing each generic rule, used to render the Snakefile.
+        """
+        template = env.get_template("rule_code.snakefile")
+
+        generic_rules = []
+        jobs = {}
+
+        for name, rules in self._wrangler.generic_rules.items():
+            action = rules[0][1]
+
+            variants = {}
+            jobs[name] = {}
+
+            for dataset_name, rule in rules:
+                dataset = self.config["datasets"][dataset_name]
+
+                def render_code(action):
+                    return template.render(action=action, dataset=dataset, config=self.config,
+                                           data_store=self.config["worker"]["enabled"], **kwargs)
+
+                code, params = render_generic_code(render_code, rule)
+
+                # jobs are identified by the "dataset" and "step" wildcards of their output
+                output = pathlib.Path(rule.output)
+                key = "{}/{}".format(output.parent.name, output.stem)
+
+                jobs[name][key] = {
+                    "rule": rule.rule_id,
+                    "dataset": dataset_name,
+                    "input": rule.input,
+                    "variant": variants.setdefault(code, len(variants)),
+                    "params": params,
+                    "threads": rule.resources["threads"],
+                    "mem_mb": rule.resources["mem_mb"],
+                    "mem_scale": rule.resources["mem_scale"],
+                }
+
+            # outputs are stored in the same data directory, under the output or scratch directory
+            data_dir = pathlib.Path(action.output).parent.parent
+
+            generic_rules.append({
+                "name": name,
+                "action": action,
+                "output": str(data_dir / "{dataset}" / "{step}.feather"),
+                "temp": action.temp,
+                "step_pattern": self._wrangler.get_generic_step_pattern(action),
+                "variants": list(variants),
+                "rule_id": RuntimeExpr("job['rule']"),
+                "dataset_name": RuntimeExpr("job['dataset']"),
+            })
+
+        if len(jobs) > 0:
+            logging.info("Saving generic rule job table to %s", job_table)
+
+            with open(job_table, "w") as fp:
+                json.dump(jobs, fp)
+
+        return generic_rules
+
+    def execute(self, targets=None, write="terminal", cores=None):
+        """
+        Runs the dataset actions of the pipeline in the current process, without generating a
+        Snakefile or running snakemake (see executor.py).
+
+        Arguments
+        ---------
+        targets : list
+            Ids of the rules whose datasets are returned; defaults to the final rule of each
+            dataset and dataset branch.
+        write : str|list
+            Outputs to write to disk: "terminal" (default), "all", or a list of rule ids whose
+            outputs are written in addition to the terminal outputs.
+        cores : int
+            Maximum number of rules to run at a time; defaults to the "cores" execution setting,
+            or the number of CPUs.
+
+        Returns
+        -------
+        dict
+            Target datasets (pandas.DataFrame), by rule id.
+        """
+        from snakes.executor import PipelineExecutor
+
+        template = self._get_template_env().get_template("rule_code.snakefile")
+
+        executor = PipelineExecutor(self._wrangler, self.config, template,
+                                    script_dir=_get_resource_path("src"),
+                                    data_dir=_get_resource_path("data"))
+
+        return executor.run(targets, write, cores)
+
+    def run(self):
+        """
+        Runs the pipeline using snakemake, with the cores, resource limits, profile and other
+        settings in the "execution" config section.
+
+        Snakemake is run as a separate process so that profiles (e.g. for cluster execution)
+        are handled the same way as when snakemake is called directly.
+        """
+        cmd = [sys.executable, "-m", "snakemake"] + self._get_snakemake_args()
+
+        # start the worker service used by inline action rules, unless one is already running
+        worker_proc = None
+
+        if self.config["worker"]["enabled"]:
+            worker_proc = self._start_worker()
+
+        logging.info("Running pipeline: %s", " ".join(cmd))
+
+        try:
+            ret = subprocess.run(cmd).returncode
+        finally:
+            if worker_proc is not None:
+                worker.WorkerClient(self.config["worker"]["address"]).stop()
+                worker_proc.wait()
+
+        if ret != 0:
+            sys.exit("[ERROR] Pipeline execution failed (exit status {})".format(ret))
+
+    def _start_worker(self):
+        """Starts the worker service (see worker.py), returning None if one is already running"""
+        settings = self.config["worker"]
+
+        if worker.WorkerClient(settings["address"]).status() is not None:
+            logging.info("Using running worker at %s", settings["address"])
+            return None
+
+        logging.info("Starting worker at %s", settings["address"])
+
+        return worker.start(settings["address"], settings["cache_size"])
+
+    def _get_snakemake_args(self):
+        """Returns the snakemake command-line arguments for the execution settings"""
+        execution = self.config["execution"]
+
+        args = ["--snakefile", self.output_file]
+
+        if execution["cores"] is not None:
+            args += ["--cores", str(execution["cores"])]
+
+        if execution["resources"]:
+            args += ["--resources"]
+            args += ["{}={}".format(k, v) for k, v in execution["resources"].items()]
+
+        if execution["profile"] is not None:
+            args += ["--profile", execution["profile"]]
+
+        if execution["keep_going"]:
+            args += ["--keep-going"]
+
+        if execution["rerun_incomplete"]:
+            args += ["--rerun-incomplete"]
+
+        if execution["group_components"]:
+            args += ["--group-components"]
+            args += ["{}={}".format(k, v) for k, v in execution["group_components"].items()]
+
+        return args
 
@@ -0,0 +1,110 @@
+"""
+Snakes rule resource functionality
+
+Each dataset rule declares the number of threads it uses and an estimate of the memory it
+requires (see the "resources" entries in conf/defaults.yml and conf/actions.yml), so that
+snakemake can schedule jobs without oversubscribing the available cores or memory.
+
+Memory requirements are estimated when a job is scheduled, based on the size of its input data:
+a base amount, plus a multiple of the in-memory size of the input matrices. For feather files,
+the in-memory size is estimated from the number of rows and columns; for other files, the file
+size is used.
+
+Within each rule, the number of threads used by BLAS and OpenMP libraries is limited to the
+number of threads allocated to the rule by snakemake. These limits apply to a whole process, so
+they are only best-effort for rules running concurrently in the same process (see
+limit_threads()).
+"""
+import os
+
+# environment variables controlling the number of threads used by BLAS/OpenMP libraries
+THREAD_ENV_VARS = [
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+]
+
+# assumed size of each value in memory (bytes)
+VALUE_SIZE = 8
+
+
+def estimate_mem_mb(input, mem_mb, mem_scale):
+    """
+    Estimates the memory required by a rule.
+
+    Arguments
+    ---------
+    input : list
+        Paths to the rule's input files.
+    mem_mb : int
+        Base memory requirement (MB).
+    mem_scale : float
+        Additional memory required, as a multiple of the in-memory size of the input data.
+
+    Returns
+    -------
+    int
+        Estimated memory requirement (MB).
+    """
+    input_size = sum(get_data_size(x) for x in input)
+
+    return int(mem_mb + mem_scale * input_size / 2 ** 20)
+
+
+def get_data_size(path):
+    """
+    Returns the approximate in-memory size of a dataset (bytes), or 0 if it does not exist.
+
+    Arguments
+    ---------
+    path : str
+        Path to a dataset.
+
+    Returns
+    -------
+    int
+        Approximate size of the dataset when loaded (bytes).
+    """
+    if not os.path.isfile(path):
+        return 0
+
+    if not path.endswith(".feather"):
+        return os.path.getsize(path)
+
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format="feather")
+
+    return dataset.count_rows() * len(dataset.schema.names) * VALUE_SIZE
+
+
+def limit_threads(threads):
+    """
+    Limits the number of threads used by BLAS and OpenMP libraries.
+
+    Thread pools which have already been initialized are limited using threadpoolctl, if
+    available; environment variables are also set, so that the limits apply to any libraries
+    loaded later, and to subprocesses.
+
+    Both are process-wide, so the limits are only per-job caps for jobs running in their own
+    process (e.g. rules with separate scripts). Jobs running concurrently in the same process,
+    such as inline rules (snakemake "run:" blocks, which run in the snakemake process), requests
+    handled by the worker service, and jobs of the in-process executor, share a single limit:
+    the one set by the most recently started job. For those, limits are best-effort.
+
+    Arguments
+    ---------
+    threads : int
+        Maximum number of threads.
+    """
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+
+    threadpool_limits(limits=threads)
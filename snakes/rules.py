@@ -1,5 +1,6 @@
 """SnakemakeRule and SnakemakeRuleGroup class definitions"""
 import os
+import pathlib
 from collections import OrderedDict
 
 
@@ -57,6 +58,28 @@ class ActionRule(SnakemakeRule):
         self.inline = inline
         self.groupped = False
 
+        # chunked execution settings (see SnakeWrangler.set_backend)
+        self.chunked = None
+
+        # number of row shards the rule is applied to (see SnakeWrangler.shard_actions)
+        self.shards = None
+
+        # threads and memory requirements (see SnakeWrangler.set_resources)
+        self.resources = None
+
+        # name of the generic rule the action is rendered as, if any (see
+        # SnakeWrangler.set_generic_rules)
+        self.generic = None
+
+        # whether the rule's output is removed once it is no longer needed (see
+        # SnakeWrangler.set_retention)
+        self.temp = False
+
+    @property
+    def action_name(self):
+        """Type of action performed by the rule (e.g. "filter_rows_var_gt")"""
+        return pathlib.Path(self.template).stem
+
     def __repr__(self):
         """Prints a string representation of SnakemakeRule instance"""
 
@@ -123,21 +146,25 @@ class GroupedActionRule:
         self.params = kwargs
 
         self.groupped = True
+        self.chunked = None
+        self.shards = None
+        self.resources = None
+        self.generic = None
+        self.temp = False
 
         # load sub-actions
         self.actions = OrderedDict()
 
-        for action in group_actions:
-            # get action name
-            action_name = action["action_name"]
-            del action["action_name"]
-
+        for action_name, action in _fuse_transforms(group_actions):
             # determine template filepath
             action_type = action_name.split("_")[0]
             template = "actions/{}/{}.snakefile".format(action_type, action_name)
 
+            # actions within a group are always executed inline
+            action["inline"] = True
+
             # create new SnakemakeRule instance
-            self.actions[action_name] = ActionRule(
+            self.actions[self._get_action_key(action_name)] = ActionRule(
                 rule_id=None,
                 parent_id=None,
                 input=None,
@@ -146,6 +173,75 @@ class GroupedActionRule:
                 **action
             )
 
+    @property
+    def action_name(self):
+        """Type of action performed by the rule"""
+        return "group"
+
+    def _get_action_key(self, action_name):
+        """Returns a unique key for a sub-action"""
+        key = action_name
+        i = 2
+
+        while key in self.actions:
+            key = "{}_{}".format(action_name, i)
+            i += 1
+
+        return key
+
+
+# actions which can be fused into a single pass over the data (see transforms.py)
+FUSABLE_TRANSFORMS = ["transform_cpm", "transform_log2", "transform_log2p", "transform_zscore"]
+
+
+def _fuse_transforms(group_actions):
+    """
+    Combines consecutive vectorized transforms within an action group into a single
+    "transform_chain" action, so that the data is only traversed once.
+
+    Arguments
+    ---------
+    group_actions : list
+        List of sub-action dicts, in the order they are to be applied.
+
+    Returns
+    -------
+    list
+        List of (action name, action params) tuples.
+    """
+    res = []
+    chain = []
+
+    def add_chain():
+        if len(chain) == 1:
+            res.append(chain[0])
+        elif len(chain) > 1:
+            steps = [(name[len("transform_"):], params) for name, params in chain]
+            res.append(("transform_chain", {"steps": steps}))
+        chain.clear()
+
+    for action in group_actions:
+        # get action name
+        action = dict(action)
+        action_name = action.pop("action_name")
+
+        if action_name in FUSABLE_TRANSFORMS:
+            # keep only the transform-specific parameters
+            params = {
+                k: v
+                for k, v in action.items()
+                if k not in ["filename", "inline", "local", "reports"]
+            }
+            chain.append((action_name, params))
+        else:
+            add_chain()
+            res.append((action_name, action))
+
+    add_chain()
+
+    return res
+
+
 class DataIntegrationRule:
     def __init__(self, rule_id, inputs, output, local=False, template=None, **kwargs):
         """Creates a new DataIntegrationRule instance from a dict representation"""
@@ -0,0 +1,171 @@
+"""
+Snakes row-sharded execution
+
+Datasets may be split into row "shards" after they are loaded (see the "sharding" section of
+conf/defaults.yml), so that sequences of actions which operate on each row independently are
+executed as separate, parallel snakemake jobs for each shard.
+
+Whether an action is row-independent is declared using the same "chunked" entry in
+conf/actions.yml that is used by the chunked backend (see chunked.py); actions whose per-batch
+results must be combined (e.g. gene set sums) are not sharded.
+
+For each such sequence of actions, SnakeWrangler.shard_actions() adds a "scatter" rule, which
+splits the input into shards containing contiguous ranges of rows, and a "gather" rule, which
+concatenates the results in order before the first action that requires the entire dataset.
+Shards from which all rows have been filtered out are written as empty files and skipped when the
+results are gathered.
+"""
+import numpy as np
+import pandas as pd
+from pandas.errors import EmptyDataError
+from . import chunked
+from .dtypes import apply_dtype_policy
+from .loaders import read_feather
+from .stats import load_stats, write_stats
+
+
+def scatter(infile, outfiles, batch_size=None):
+    """
+    Splits a feather file into shards containing contiguous ranges of rows.
+
+    Rows are read and written one batch at a time, so the dataset is never loaded into memory
+    in its entirety.
+
+    Arguments
+    ---------
+    infile : str
+        Path to input feather file.
+    outfiles : list
+        Paths to output feather files, one per shard.
+    batch_size : int
+        Maximum number of rows read at a time.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(infile, format="feather")
+
+    # row ranges for each shard
+    bounds = np.linspace(0, dataset.count_rows(), len(outfiles) + 1).astype(int)
+
+    options = pa.ipc.IpcWriteOptions(compression="lz4")
+    writers = [pa.ipc.new_file(x, dataset.schema, options=options) for x in outfiles]
+
+    try:
+        offset = 0
+
+        for batch in dataset.to_batches(batch_size=batch_size or chunked.BATCH_SIZE):
+            for i, writer in enumerate(writers):
+                # portion of the batch belonging to the shard
+                start = max(bounds[i], offset)
+                end = min(bounds[i + 1], offset + batch.num_rows)
+
+                if end > start:
+                    writer.write_batch(batch.slice(start - offset, end - start))
+
+            offset += batch.num_rows
+    finally:
+        for writer in writers:
+            writer.close()
+
+
+def apply_shard(infile, outfile, func, policy=None, stats=False, batch_size=None):
+    """
+    Applies a function to a single shard of a dataset and writes the result.
+
+    Arguments
+    ---------
+    infile : str
+        Path to input feather file for the shard.
+    outfile : str
+        Path to output feather file for the shard.
+    func : function
+        Function which takes a DataFrame and the statistics for it, if available, and returns
+        a new DataFrame. The function may raise an EmptyDataError to indicate that no rows
+        remain.
+    policy : dict
+        Storage dtype policy to apply to the result (see dtypes.py).
+    stats : bool
+        Whether to use and write summary statistics sidecars (see stats.py).
+    batch_size : int
+        If specified, the shard is processed one batch of rows at a time, as with the chunked
+        backend.
+    """
+    try:
+        if batch_size is not None:
+            chunked.apply_batches(infile, outfile, func, policy=policy, batch_size=batch_size)
+            return
+
+        dat = read_feather(infile)
+
+        # rows may have been filtered out of the shard by a previous action
+        if dat.shape[0] == 0:
+            raise EmptyDataError("No data remaining after filter applied")
+
+        dat = func(dat, load_stats(infile, dat) if stats else None)
+    except EmptyDataError:
+        _write_empty(infile, outfile, stats)
+        return
+
+    if policy is not None:
+        dat = apply_dtype_policy(dat, policy)
+
+    dat.reset_index().to_feather(outfile, compression="lz4")
+
+    if stats:
+        write_stats(dat, outfile)
+
+
+def gather(infiles, outfile, policy=None, stats=False, batch_size=None):
+    """
+    Concatenates the shards of a dataset, in order, and writes the result.
+
+    Arguments
+    ---------
+    infiles : list
+        Paths to the feather files for each shard.
+    outfile : str
+        Path to output feather file.
+    policy : dict
+        Storage dtype policy to apply to the result (see dtypes.py).
+    stats : bool
+        Whether to write a summary statistics sidecar for the result (see stats.py).
+    batch_size : int
+        If specified, shards are copied one batch of rows at a time, as with the chunked
+        backend, rather than being loaded into memory.
+    """
+    if batch_size is not None:
+        batches = (x for infile in infiles for x in chunked.iter_batches(infile, batch_size))
+        chunked.write_batches(batches, outfile, policy)
+        return
+
+    shards = [x for x in map(read_feather, infiles) if x.shape[0] > 0]
+
+    # check to make sure data is non-empty
+    if len(shards) == 0:
+        raise EmptyDataError("No data remaining after filter applied")
+
+    dat = pd.concat(shards)
+
+    # categorical indices with differing categories are combined as plain values
+    if policy is not None:
+        dat = apply_dtype_policy(dat, policy)
+
+    dat.reset_index().to_feather(outfile, compression="lz4")
+
+    if stats:
+        write_stats(dat, outfile)
+
+
+def _write_empty(infile, outfile, stats):
+    """Writes a shard with no remaining rows, with the same columns as its input"""
+    import pyarrow.dataset as ds
+
+    dat = ds.dataset(infile, format="feather").schema.empty_table().to_pandas()
+    dat = dat.set_index(dat.columns[0])
+
+    dat.reset_index().to_feather(outfile, compression="lz4")
+
+    # removes any sidecar left over from a previous run
+    if stats:
+        write_stats(dat, outfile)
@@ -0,0 +1,305 @@
+"""
+Snakes dataset statistics functionality
+
+Each rule which writes a dataset also writes a small "sidecar" file alongside it, containing
+per-row and per-column summary statistics: the number of non-missing values (count), number of
+missing values (na), number of non-zero values (nonzero), sum, sum of squares (sumsq), minimum
+and maximum. The sum of squared deviations from the mean (m2) is stored as well, so that
+variances can be derived without loss of precision.
+
+Filters which depend only on these statistics (e.g. filter_rows_var_gt) use the sidecar of their
+input to compute a mask without rescanning the data.
+
+Sidecars are stored as feather files at "<dataset path>.stats", and record the size and
+modification time of the dataset they describe, so that stale sidecars are never used. Rows and
+columns are identified by position.
+"""
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+from .dtypes import ACCUMULATOR_DTYPE
+
+# statistics stored for each row and column
+STATS = ["count", "na", "nonzero", "sum", "sumsq", "min", "max", "m2"]
+
+# approximate size of each block of rows processed at a time (bytes)
+BLOCK_BYTES = 2 ** 25
+
+# size of the blocks read when computing the signature of a dataset file (bytes)
+SIGNATURE_BLOCK_SIZE = 2 ** 20
+
+
+def compute_stats(df, block_size=None):
+    """
+    Computes per-row and per-column summary statistics for a dataset.
+
+    Arguments
+    ---------
+    df : pandas.DataFrame
+        Dataset to compute statistics for.
+    block_size : int
+        Number of rows to process at a time. If None, a block size is chosen based on the number
+        of columns in the dataset.
+
+    Returns
+    -------
+    dict
+        Dictionary with "rows" and "cols" entries, each a DataFrame with one row per dataset
+        row/column and one column per statistic, or None if the dataset is empty or contains
+        non-numeric columns.
+    """
+    if 0 in df.shape or not all(is_numeric_dtype(dtype) for dtype in df.dtypes):
+        return None
+
+    values = df.to_numpy()
+
+    if block_size is None:
+        block_size = max(1, BLOCK_BYTES // (values.shape[1] * 8))
+
+    rows = {stat: [] for stat in STATS}
+
+    cols = {stat: np.zeros(values.shape[1], dtype=ACCUMULATOR_DTYPE) for stat in STATS}
+    cols["min"][:] = np.nan
+    cols["max"][:] = np.nan
+    cols["mean"] = np.zeros(values.shape[1], dtype=ACCUMULATOR_DTYPE)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for start in range(0, values.shape[0], block_size):
+            # statistics are computed at full precision
+            block = values[start:start + block_size].astype(ACCUMULATOR_DTYPE)
+
+            block_rows = _block_stats(block, axis=1)
+
+            for stat in STATS:
+                rows[stat].append(block_rows[stat])
+
+            _merge_col_stats(cols, _block_stats(block, axis=0))
+
+    del cols["mean"]
+
+    return {
+        "rows": _stats_frame({stat: np.concatenate(vals) for stat, vals in rows.items()}),
+        "cols": _stats_frame(cols),
+    }
+
+
+def get_stat(stats, name, axis=1, ddof=0):
+    """
+    Returns a statistic for each row (axis=1) or column (axis=0) of a dataset.
+
+    In addition to the stored statistics, "mean" and "var" may be requested.
+
+    Arguments
+    ---------
+    stats : dict
+        Dataset statistics, as returned by compute_stats() or load_stats().
+    name : str
+        Name of the statistic to return.
+    axis : int
+        Whether to return statistics for each row (1) or column (0).
+    ddof : int
+        Delta degrees of freedom used when computing variances.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of statistic values.
+    """
+    stats = stats["rows"] if axis == 1 else stats["cols"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if name == "mean":
+            return (stats["sum"] / stats["count"]).to_numpy()
+        elif name == "var":
+            res = (stats["m2"] / (stats["count"] - ddof)).to_numpy()
+
+            # rows/columns with a single distinct value have a variance of exactly zero
+            res[(stats["min"] == stats["max"]).to_numpy()] = 0
+            res[(stats["count"] - ddof <= 0).to_numpy()] = np.nan
+
+            return res
+
+    return stats[name].to_numpy()
+
+
+def sidecar_path(path):
+    """Returns the path to the statistics sidecar for a dataset"""
+    return path + ".stats"
+
+
+def remove_orphaned_sidecars(data_dirs):
+    """
+    Removes the statistics sidecars of datasets which no longer exist, such as temporary
+    outputs removed by snakemake (see SnakeWrangler.set_retention).
+
+    Arguments
+    ---------
+    data_dirs : list
+        Directories to search for sidecars, including subdirectories.
+
+    Returns
+    -------
+    list
+        Paths to the removed sidecars.
+    """
+    import glob
+
+    removed = []
+
+    for data_dir in data_dirs:
+        for path in glob.glob(os.path.join(data_dir, "**", sidecar_path("*")), recursive=True):
+            if not os.path.exists(path[:-len(sidecar_path(""))]):
+                os.remove(path)
+                removed.append(path)
+
+    return removed
+
+
+def write_stats(df, path):
+    """
+    Computes statistics for a dataset which has been written to disk, and saves them in a
+    sidecar file.
+
+    Arguments
+    ---------
+    df : pandas.DataFrame
+        Dataset, as written to disk (without the index column).
+    path : str
+        Path to the dataset file.
+    """
+    import pyarrow as pa
+    from pyarrow import feather
+
+    outfile = sidecar_path(path)
+
+    # remove any existing sidecar from a previous run; sidecars are never overwritten in place,
+    # since they may be hard-linked to the result cache (see cache.py)
+    if os.path.exists(outfile):
+        os.remove(outfile)
+
+    stats = compute_stats(df)
+
+    if stats is None:
+        return
+
+    tbl = pd.concat([stats["rows"].assign(axis=1), stats["cols"].assign(axis=0)])
+    tbl = pa.Table.from_pandas(tbl, preserve_index=False)
+
+    # record the dataset file the statistics describe
+    tbl = tbl.replace_schema_metadata({"dataset": _file_signature(path)})
+
+    feather.write_feather(tbl, outfile, compression="lz4")
+
+
+def load_stats(path, df=None):
+    """
+    Loads the statistics sidecar for a dataset.
+
+    Arguments
+    ---------
+    path : str
+        Path to the dataset file.
+    df : pandas.DataFrame
+        Dataset loaded from the file (optional). If specified, the dimensions of the dataset are
+        checked against the statistics.
+
+    Returns
+    -------
+    dict
+        Dataset statistics, or None if no up-to-date sidecar exists for the dataset.
+    """
+    from pyarrow import feather
+
+    infile = sidecar_path(path)
+
+    if not os.path.exists(infile) or not os.path.exists(path):
+        return None
+
+    tbl = feather.read_table(infile)
+
+    # ignore sidecars written for a different version of the dataset
+    metadata = tbl.schema.metadata or {}
+
+    if metadata.get(b"dataset", b"").decode() != _file_signature(path):
+        return None
+
+    tbl = tbl.to_pandas()
+
+    stats = {
+        "rows": tbl[tbl["axis"] == 1][STATS].reset_index(drop=True),
+        "cols": tbl[tbl["axis"] == 0][STATS].reset_index(drop=True),
+    }
+
+    if df is not None and (len(stats["rows"]), len(stats["cols"])) != df.shape:
+        return None
+
+    return stats
+
+
+def _block_stats(block, axis):
+    """Computes summary statistics along an axis of a block of rows"""
+    isna = np.isnan(block)
+    count = block.shape[axis] - isna.sum(axis=axis)
+
+    mean = np.nansum(block, axis=axis) / count
+
+    return {
+        "count": count,
+        "na": block.shape[axis] - count,
+        "nonzero": ((block != 0) & ~isna).sum(axis=axis),
+        "sum": np.nansum(block, axis=axis),
+        "sumsq": np.nansum(block ** 2, axis=axis),
+        "min": np.fmin.reduce(block, axis=axis),
+        "max": np.fmax.reduce(block, axis=axis),
+        "mean": mean,
+        "m2": np.nansum((block - np.expand_dims(mean, axis)) ** 2, axis=axis),
+    }
+
+
+def _merge_col_stats(cols, block):
+    """Combines column statistics for a block of rows with those for previous blocks"""
+    # means and sums of squared deviations are combined using the pairwise update of Chan et al.
+    total = cols["count"] + block["count"]
+    has_values = block["count"] > 0
+
+    delta = np.where(has_values, block["mean"] - cols["mean"], 0)
+    weight = np.where(has_values, block["count"] / np.maximum(total, 1), 0)
+
+    cols["m2"] += np.where(has_values, block["m2"], 0) + delta ** 2 * cols["count"] * weight
+    cols["mean"] += delta * weight
+
+    for stat in ["count", "na", "nonzero", "sum", "sumsq"]:
+        cols[stat] += block[stat]
+
+    cols["min"] = np.fmin(cols["min"], block["min"])
+    cols["max"] = np.fmax(cols["max"], block["max"])
+
+
+def _stats_frame(stats):
+    """Creates a DataFrame of row or column statistics"""
+    res = pd.DataFrame({stat: stats[stat] for stat in STATS})
+
+    for stat in ["count", "na", "nonzero"]:
+        res[stat] = res[stat].astype(np.int64)
+
+    return res
+
+
+def _file_signature(path):
+    """
+    Returns a string identifying the current version of a file: its size and a digest of its
+    contents.
+
+    Modification times are not used, since snakemake updates those of rule outputs once each job
+    has finished, and inodes are not used, since the result cache may restore outputs by copying
+    them.
+    """
+    digest = hashlib.blake2b()
+
+    with open(path, "rb") as fp:
+        for block in iter(lambda: fp.read(SIGNATURE_BLOCK_SIZE), b""):
+            digest.update(block)
+
+    return "{}:{}".format(os.path.getsize(path), digest.hexdigest())
@@ -0,0 +1,431 @@
+"""
+Snakes synthetic data generator
+
+Generates datasets with the same layout as the example data (RNA-Seq counts, copy number,
+variant counts, drug AC-50 matrices and dose-response curves, gene set collections, and sample
+and drug metadata) at arbitrary sizes, along with dataset and pipeline configs modeled on
+example/config.example.yml, so that whole pipelines can be rendered and run at increasing scale.
+
+Values are random, but structured:
+
+- genes belong to co-expressed modules; the "correlation" setting controls the fraction of
+  each gene's variance explained by its module, and copy number is correlated with expression
+- gene sets are drawn partly from a single module, so that gene set aggregation summarizes
+  correlated genes
+- "sparsity", "missingness" and "duplicates" control the fraction of zero counts, missing
+  values and duplicated gene ids, respectively
+
+Actions in the example configs which require network access or R (biomaRt gene biotype
+filtering, mygene.info identifier mapping, R Markdown reports and CCA) are omitted from the
+generated configs.
+
+Use "snakes generate" to generate datasets from the command-line (see main()).
+"""
+import math
+import os
+import sys
+from argparse import ArgumentParser
+import numpy as np
+import pandas as pd
+import yaml
+
+# dataset sizes at scale 1; the number of genes, drugs and gene sets grow linearly with scale,
+# and the number of samples with its square root
+BASE_SIZES = {"genes": 500, "samples": 10, "drugs": 10, "gene_sets": 20}
+
+# number of genes in each co-expression module
+MODULE_SIZE = 50
+
+# sample ancestries used for sample metadata
+ANCESTRIES = ["Africa", "Americas", "East Asia", "Europe", "South Asia"]
+
+
+def get_sizes(scale=1, **kwargs):
+    """
+    Returns the dataset sizes for a given scale.
+
+    Arguments
+    ---------
+    scale : float
+        Scale factor, relative to BASE_SIZES.
+    kwargs : int
+        Sizes to use instead of the scaled defaults (genes, samples, drugs, gene_sets).
+
+    Returns
+    -------
+    dict
+        Number of genes, samples, drugs, and gene sets.
+    """
+    sizes = {
+        "genes": int(BASE_SIZES["genes"] * scale),
+        "samples": int(math.ceil(BASE_SIZES["samples"] * math.sqrt(scale))),
+        "drugs": int(BASE_SIZES["drugs"] * scale),
+        "gene_sets": int(BASE_SIZES["gene_sets"] * scale),
+    }
+
+    sizes.update({k: v for k, v in kwargs.items() if v is not None})
+
+    return sizes
+
+
+def generate(output_dir, scale=1, genes=None, samples=None, drugs=None, gene_sets=None,
+             sparsity=0.1, missingness=0.02, duplicates=0.0, correlation=0.5, seed=1):
+    """
+    Generates synthetic datasets, and the dataset and pipeline configs used to process them.
+
+    Datasets are written to <output_dir>/data, dataset configs to <output_dir>/yml, and the
+    pipeline config to <output_dir>/config.yml; configs refer to the datasets using paths
+    relative to the current working directory.
+
+    Arguments
+    ---------
+    output_dir : str
+        Directory to write datasets and configs to.
+    scale : float
+        Scale factor for the dataset sizes (see get_sizes()).
+    genes, samples, drugs, gene_sets : int
+        Sizes to use instead of the scaled defaults.
+    sparsity : float
+        Fraction of RNA-Seq counts which are zero.
+    missingness : float
+        Fraction of copy number and drug response values which are missing.
+    duplicates : float
+        Fraction of RNA-Seq and copy number rows whose gene id duplicates that of another row.
+    correlation : float
+        Fraction of the variance of each gene explained by its co-expression module (0-1).
+    seed : int
+        Random seed.
+
+    Returns
+    -------
+    str
+        Path to the generated pipeline config.
+    """
+    rng = np.random.default_rng(seed)
+
+    sizes = get_sizes(scale, genes=genes, samples=samples, drugs=drugs, gene_sets=gene_sets)
+
+    gene_ids = np.array(["ENSG{:011d}".format(i + 1) for i in range(sizes["genes"])])
+    sample_ids = ["CL{:05d}".format(i + 1) for i in range(sizes["samples"])]
+    drug_ids = ["NCGC{:08d}-01".format(i + 1) for i in range(sizes["drugs"])]
+
+    paths = {}
+
+    for subdir in ["features", "response", "gene_sets", "metadata"]:
+        os.makedirs(os.path.join(output_dir, "data", subdir), exist_ok=True)
+
+    def data_path(subdir, filename):
+        paths[filename] = os.path.join(output_dir, "data", subdir, filename)
+        return paths[filename]
+
+    # latent gene expression, with genes grouped into co-expression modules
+    modules = np.arange(sizes["genes"]) // MODULE_SIZE
+    factors = rng.normal(size=(modules.max() + 1, sizes["samples"]))
+
+    latent = (math.sqrt(correlation) * factors[modules] +
+              math.sqrt(1 - correlation) * rng.normal(size=(sizes["genes"], sizes["samples"])))
+
+    # RNA-Seq counts
+    mean_counts = rng.lognormal(mean=5, sigma=2, size=(sizes["genes"], 1))
+    rnaseq = rng.poisson(mean_counts * np.exp(0.5 * latent))
+    rnaseq[rng.random(rnaseq.shape) < sparsity] = 0
+
+    # ~2% of genes are not expressed at all (zero variance)
+    rnaseq[rng.random(sizes["genes"]) < 0.02] = 0
+
+    rnaseq = pd.DataFrame(rnaseq, index=_duplicate_ids(rng, gene_ids, duplicates),
+                          columns=sample_ids)
+    rnaseq.rename_axis("ensgene").to_csv(data_path("features", "rnaseq.csv"))
+
+    # copy number, for ~80% of genes, correlated with expression
+    cnv_mask = rng.random(sizes["genes"]) < 0.8
+
+    cnv = 0.5 * latent[cnv_mask] + rng.normal(scale=0.3, size=(cnv_mask.sum(), sizes["samples"]))
+    cnv[rng.random(cnv.shape) < missingness] = np.nan
+
+    cnv = pd.DataFrame(cnv.round(4), index=_duplicate_ids(rng, gene_ids[cnv_mask], duplicates),
+                       columns=sample_ids)
+    cnv.rename_axis("ensgene").to_csv(data_path("features", "cnv.csv"))
+
+    # variant counts, for ~30% of genes
+    variant_mask = rng.random(sizes["genes"]) < 0.3
+
+    variants = rng.poisson(5, size=(variant_mask.sum(), sizes["samples"])) + 1
+    variants[rng.random(variants.shape) < 0.5] = 0
+
+    variants = pd.DataFrame(variants, index=gene_ids[variant_mask], columns=sample_ids)
+    variants.rename_axis("ensgene").to_csv(data_path("features", "variants.csv"))
+
+    # drug AC-50 values, with sensitivity depending on the first co-expression module
+    sensitivity = rng.normal(size=(sizes["drugs"], 1)) * factors[0]
+    ac50 = np.exp(rng.normal(loc=1, scale=1, size=(sizes["drugs"], 1)) + 0.5 * sensitivity +
+                  rng.normal(scale=0.5, size=(sizes["drugs"], sizes["samples"])))
+    ac50[rng.random(ac50.shape) < missingness] = np.nan
+
+    ac50 = pd.DataFrame(ac50.round(4), index=drug_ids, columns=sample_ids)
+    ac50.rename_axis("ncgc_id").to_csv(data_path("response", "drug_ac50.csv"))
+
+    # drug dose-response curves (long format)
+    curves = ac50.rename_axis("drug_id").reset_index().melt(
+        id_vars="drug_id", var_name="cell_line", value_name="ac50")
+
+    num_curves = curves.shape[0]
+
+    curves = curves.assign(
+        drug_name=curves["drug_id"].str.replace("NCGC", "drug_"),
+        plate_id=np.nan,
+        lac50=np.log10(curves["ac50"] * 1e-6),
+        curve_slope=rng.normal(loc=1.5, scale=1, size=num_curves),
+        curve_lower_lim=rng.uniform(0, 20, size=num_curves),
+        curve_upper_lim=rng.uniform(80, 180, size=num_curves),
+        curve_class=rng.choice([-1.1, -1.2, -2.1, -2.2, -3, 4], size=num_curves),
+    )
+
+    columns = ["cell_line", "drug_id", "drug_name", "plate_id", "ac50", "lac50", "curve_slope",
+               "curve_lower_lim", "curve_upper_lim", "curve_class"]
+
+    for i in range(10):
+        columns.append("DATA{}".format(i))
+        curves[columns[-1]] = rng.uniform(0, 150, size=num_curves)
+
+    curves = curves[columns]
+    curves.to_csv(data_path("response", "drug_curves.csv"), index=False)
+
+    # gene sets, each drawn partly from a single module
+    with open(data_path("gene_sets", "gene_sets.gmt"), "w") as fp:
+        for i in range(sizes["gene_sets"]):
+            size = min(int(rng.integers(15, 200)), sizes["genes"])
+            module = rng.integers(modules.max() + 1)
+
+            module_genes = gene_ids[modules == module]
+            genes = set(rng.choice(module_genes, min(size // 2, len(module_genes)), replace=False))
+            genes.update(rng.choice(gene_ids, size - len(genes), replace=False))
+
+            fields = ["GENE_SET_{}".format(i + 1), "synthetic gene set {}".format(i + 1)]
+            fp.write("\t".join(fields + sorted(genes)) + "\n")
+
+    # sample and drug metadata
+    pd.DataFrame({
+        "cell_line": sample_ids, "ancestry": rng.choice(ANCESTRIES, sizes["samples"])
+    }).to_csv(data_path("metadata", "sample_metadata.csv"), index=False)
+
+    pd.DataFrame({
+        "ncgc_id": drug_ids,
+        "name": [x.replace("NCGC", "drug_") for x in drug_ids],
+        "target": rng.choice(["AR", "EGFR", "HDAC", "MTOR", "TOP2A"], sizes["drugs"]),
+        "phase": rng.choice(["Approved", "Phase 1", "Phase 2", "Phase 3", "Preclinical"],
+                            sizes["drugs"]),
+    }).to_csv(data_path("metadata", "drug_metadata.csv"), index=False)
+
+    return write_configs(output_dir, paths, sizes, missingness, duplicates)
+
+
+def _duplicate_ids(rng, ids, duplicates):
+    """Replaces a fraction of ids with copies of other ids"""
+    ids = ids.copy()
+
+    num_duplicates = int(len(ids) * duplicates)
+
+    if num_duplicates > 0:
+        targets = rng.choice(len(ids), num_duplicates, replace=False)
+        ids[targets] = rng.choice(ids, num_duplicates)
+
+    return ids
+
+
+def write_configs(output_dir, paths, sizes, missingness, duplicates=0):
+    """
+    Writes dataset and pipeline configs for a set of generated datasets, modeled on the
+    example configs.
+
+    Arguments
+    ---------
+    output_dir : str
+        Directory containing the generated datasets.
+    paths : dict
+        Mapping from dataset filenames to their paths.
+    sizes : dict
+        Dataset sizes, as returned by get_sizes().
+    missingness : float
+        Fraction of missing values; used to choose filter cutoffs which keep most rows.
+    duplicates : float
+        Fraction of duplicated gene ids; if non-zero, rows with the same gene id are
+        aggregated before any other actions.
+
+    Returns
+    -------
+    str
+        Path to the pipeline config.
+    """
+    yml_dir = os.path.join(output_dir, "yml")
+    os.makedirs(yml_dir, exist_ok=True)
+
+    # sample excluded from each dataset, as in the example configs
+    excluded = ["CL00001"]
+
+    # allow up to twice the expected number of missing values per row
+    max_na = int(math.ceil(2 * missingness * sizes["samples"]))
+
+    dataset_cfgs = {
+        "rnaseq": {
+            "name": "rnaseq",
+            "xid": "ensembl_gene_id",
+            "yid": "sample_id",
+            "path": paths["rnaseq.csv"],
+            "metadata": {"columns": paths["sample_metadata.csv"]},
+            "actions": [
+                {"filter_cols_name_not_in": {"names": excluded}},
+                {"filter_rows_var_gt": {"id": "exclude_zero_variance", "value": 0}},
+                {"filter_rows_sum_gt": {"id": "filter_min_reads", "value": 20}},
+                {"group": {"id": "log2cpm", "actions": ["transform_cpm", "transform_log2p"]}},
+                {"transform_zscore": {"axis": 1}},
+                {"branch": [{"cluster_hclust": {"num_clusters": 4}}]},
+                {"branch": [
+                    {"aggregate_gene_sets": {
+                        "id": "rnaseq_go_sum", "gmt": paths["gene_sets.gmt"],
+                        "data_key": "ensembl.gene", "gmt_key": "ensembl.gene",
+                        "min_size": 10, "func": "sum"
+                    }},
+                    {"transpose_data": {"id": "rnaseq_go_terms_sum_final"}},
+                ]},
+                {"transpose_data": {"id": "rnaseq_final"}},
+            ],
+        },
+        "cnv": {
+            "name": "cnv",
+            "xid": "ensembl_gene_id",
+            "yid": "sample_id",
+            "path": paths["cnv.csv"],
+            "actions": [
+                {"filter_cols_name_not_in": {"names": excluded}},
+                {"filter_rows_max_na": {"id": "remove_missing_data", "value": max_na}},
+                {"transpose_data": {"id": "cnv_final"}},
+            ],
+        },
+        "variants": {
+            "name": "variants",
+            "xid": "ensembl_gene_id",
+            "yid": "sample_id",
+            "path": paths["variants.csv"],
+            "actions": [
+                {"filter_cols_name_not_in": {"names": excluded}},
+                {"filter_rows_min_nonzero": {"value": 2}},
+                {"transpose_data": {"id": "variants_final"}},
+            ],
+        },
+        "drug_screen": {
+            "name": "ac50",
+            "index_col": "cell_line",
+            "xid": "sample_id",
+            "path": paths["drug_curves.csv"],
+            "actions": [
+                {"filter_cols_name_in": {"names": ["drug_id", "ac50", "curve_slope"]}},
+                {"filter_rows_name_not_in": {"names": excluded}},
+                {"filter_rows_col_not_na": {"id": "filter_missing_ac50", "col": "ac50"}},
+                {"filter_rows_col_gt": {
+                    "id": "filter_curve_slope", "col": "curve_slope", "value": 0
+                }},
+                {"filter_rows_group_size_ge": {
+                    "id": "filter_min_curves_remaining", "group": "drug_id", "size": 3
+                }},
+                {"filter_cols_name_not_in": {"names": ["curve_slope"]}},
+                {"filter_rows_group_func_ge": {
+                    "id": "filter_min_variability", "group": "drug_id", "col": "ac50",
+                    "func": "mad", "quantile": 0.5
+                }},
+                {"pivot_wide": {
+                    "id": "ac50_final", "index": None, "columns": "drug_id", "values": "ac50"
+                }},
+            ],
+        },
+    }
+
+    # combine rows with duplicated gene ids
+    if duplicates > 0:
+        for name, func in [("rnaseq", "sum"), ("cnv", "mean")]:
+            dataset_cfgs[name]["actions"].insert(0, {"aggregate_duplicate_rows": {"func": func}})
+
+    dataset_paths = []
+
+    for name, cfg in dataset_cfgs.items():
+        dataset_paths.append(os.path.join(yml_dir, name + ".yml"))
+
+        with open(dataset_paths[-1], "w") as fp:
+            yaml.safe_dump(cfg, fp, sort_keys=False)
+
+    config = {
+        "name": "synthetic pipeline",
+        "version": "1.0",
+        "output_dir": os.path.join(output_dir, "output"),
+        "random_seed": 1,
+        "datasets": dataset_paths,
+        "training_sets": {
+            "features": ["rnaseq_final", "rnaseq_go_terms_sum_final", "cnv_final",
+                         "variants_final"],
+            "response": "ac50_final",
+            "options": {"allow_mismatched_indices": True, "include_column_prefix": True},
+        },
+        "feature_selection": [{"min_variance": {"quantile": 0.5}}],
+    }
+
+    config_file = os.path.join(output_dir, "config.yml")
+
+    with open(config_file, "w") as fp:
+        fp.write("# synthetic data ({genes} genes, {samples} samples, {drugs} drugs, {gene_sets} "
+                 "gene sets)\n".format(**sizes))
+        yaml.safe_dump(config, fp, sort_keys=False)
+
+    return config_file
+
+
+def main(args=None):
+    """
+    Command-line interface for generating synthetic datasets ("snakes generate").
+
+    Arguments
+    ---------
+    args : list
+        Command-line arguments; defaults to sys.argv[2:].
+    """
+    parser = ArgumentParser(
+        prog="snakes generate",
+        description="Generates synthetic datasets and configs with the same layout as the "
+                    "example data, at arbitrary sizes.",
+    )
+
+    parser.add_argument("-o", "--output-dir", default="synthetic",
+                        help="Directory to write datasets and configs to (default: synthetic).")
+    parser.add_argument("-s", "--scale", type=float, default=1,
+                        help="Scale factor for dataset sizes (default: 1; {} genes, {} samples, "
+                             "{} drugs and {} gene sets).".format(*BASE_SIZES.values()))
+    parser.add_argument("--genes", type=int, help="Number of genes.")
+    parser.add_argument("--samples", type=int, help="Number of samples.")
+    parser.add_argument("--drugs", type=int, help="Number of drugs.")
+    parser.add_argument("--gene-sets", type=int, help="Number of gene sets.")
+    parser.add_argument("--sparsity", type=float, default=0.1,
+                        help="Fraction of RNA-Seq counts which are zero (default: 0.1).")
+    parser.add_argument("--missingness", type=float, default=0.02,
+                        help="Fraction of copy number and drug response values which are "
+                             "missing (default: 0.02).")
+    parser.add_argument("--duplicates", type=float, default=0.0,
+                        help="Fraction of rows with duplicated gene ids (default: 0).")
+    parser.add_argument("--correlation", type=float, default=0.5,
+                        help="Fraction of gene variance explained by co-expression modules "
+                             "(default: 0.5).")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (default: 1).")
+
+    args = parser.parse_args(sys.argv[2:] if args is None else args)
+
+    for name in ["sparsity", "missingness", "duplicates", "correlation"]:
+        if not 0 <= getattr(args, name) <= 1:
+            parser.error("--{} must be between 0 and 1".format(name))
+
+    config_file = generate(
+        args.output_dir, scale=args.scale, genes=args.genes, samples=args.samples,
+        drugs=args.drugs, gene_sets=args.gene_sets, sparsity=args.sparsity,
+        missingness=args.missingness, duplicates=args.duplicates,
+        correlation=args.correlation, seed=args.seed
+    )
+
+    print("Synthetic datasets written to {}".format(os.path.join(args.output_dir, "data")))
+    print("Pipeline config: {}".format(config_file))
@@ -0,0 +1,104 @@
+"""
+Snakes training set construction functionality
+"""
+import pathlib
+import pandas as pd
+from pandas.errors import EmptyDataError
+
+
+def load_features(infiles, allow_mismatched_indices=False, include_column_prefix=False):
+    """
+    Loads and combines one or more feature datasets.
+
+    Arguments
+    ---------
+    infiles : list
+        Paths to feather-formatted feature datasets, with shared row indices.
+    allow_mismatched_indices : bool
+        Whether to allow datasets whose row indices differ; if so, the rows of the first
+        dataset are kept, with missing values for rows not present in other datasets (rows
+        only present in other datasets are dropped).
+    include_column_prefix : bool
+        Whether to prefix the column names of each dataset with its filename.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Combined feature data.
+    """
+    feature_dat = None
+
+    for filepath in infiles:
+        dat = pd.read_feather(filepath)
+        dat = dat.set_index(dat.columns[0]).sort_index()
+
+        # update column names (optional)
+        if include_column_prefix:
+            prefix = pathlib.Path(filepath).stem + "_"
+            dat.columns = prefix + dat.columns
+
+        if feature_dat is None:
+            feature_dat = dat
+            continue
+
+        # check to make sure there are no overlapping columns
+        shared_columns = set(feature_dat.columns).intersection(dat.columns)
+
+        if len(shared_columns) > 0:
+            msg = f"Column names in {filepath} overlap with others in feature data."
+            raise ValueError(msg)
+
+        # check for index mismatches
+        if not allow_mismatched_indices and not dat.index.equals(feature_dat.index):
+            msg = f"Row names for {filepath} do not match other feature data indices."
+            raise ValueError(msg)
+
+        # merge feature data
+        feature_dat = feature_dat.join(dat)
+
+        # check to make sure dataset is not empty
+        if feature_dat.empty:
+            msg = (f"Training set empty after merging {filepath}! Check to make "
+                   "sure datasets have row names in common")
+            raise EmptyDataError(msg)
+
+    return feature_dat
+
+
+def create_training_sets(feature_dat, response_dat, allow_mismatched_indices=False):
+    """
+    Creates one training set for each column in a response dataset.
+
+    Arguments
+    ---------
+    feature_dat : pandas.DataFrame
+        Feature data, as returned by load_features().
+    response_dat : pandas.DataFrame
+        Response data, with one column per response variable; rows are sorted to match the
+        feature data.
+    allow_mismatched_indices : bool
+        Whether to allow response data whose row indices differ from those of the feature data.
+
+    Returns
+    -------
+    generator
+        (response column name, training set) tuples; each training set contains the feature
+        data, along with a "response" column.
+    """
+    # check for index mismatches
+    if not allow_mismatched_indices and not response_dat.index.equals(feature_dat.index):
+        msg = "Row names for response data do not match feature data indices."
+        raise ValueError(msg)
+
+    # check to make sure at least some shared indices exist
+    if len(set(feature_dat.index).intersection(response_dat.index)) == 0:
+        raise EmptyDataError("Feature and response data have no shared row names!")
+
+    # iterate over columns in response data and create training sets
+    for col in response_dat.columns:
+        # get response column as a Series and rename to "response"
+        dat = response_dat[col]
+        dat.name = "response"
+
+        # add response data column to end of feature data
+        yield col, feature_dat.join(dat)
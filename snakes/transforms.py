@@ -0,0 +1,249 @@
+"""
+Snakes transform functionality
+
+Vectorized data transformations which operate directly on the underlying array of a dataset,
+one block of rows at a time, and without allocating additional copies of the data.
+
+A chain of transforms (e.g. cpm -> log2p -> zscore) can be applied in a single fused pass using
+apply_transforms(): statistics needed by transforms which depend on entire columns (e.g. column
+sums for cpm) are first accumulated block by block, after which each block of rows is passed
+through all of the transforms in turn while it is still in cache.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_float_dtype, is_numeric_dtype
+from .dtypes import ACCUMULATOR_DTYPE
+
+# approximate size of each block of rows processed at a time (bytes)
+BLOCK_BYTES = 2 ** 25
+
+
+def apply_transforms(df, transforms, inplace=False, block_size=None):
+    """
+    Applies a sequence of transforms to a dataset in a single pass.
+
+    Arguments
+    ---------
+    df : pandas.DataFrame
+        Numeric dataset to be transformed.
+    transforms : list
+        List of transforms to apply, in order. Each entry may either be a transform name (e.g.
+        "log2p"), or a tuple of a transform name and a dict of parameters (e.g. ("zscore",
+        {"axis": 1})).
+    inplace : bool
+        If True, the memory of the input dataset is re-used for the result, where possible.
+    block_size : int
+        Number of rows to process at a time. If None, a block size is chosen based on the number
+        of columns in the dataset.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Transformed dataset.
+    """
+    steps = [_get_transform(entry) for entry in transforms]
+
+    values = _get_values(df, inplace)
+
+    if block_size is None:
+        block_size = max(1, BLOCK_BYTES // max(1, values.shape[1] * values.itemsize))
+
+    blocks = [slice(i, i + block_size) for i in range(0, values.shape[0], block_size)]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # accumulate column statistics for any transforms that require them; preceding transforms
+        # are applied to a temporary copy of each block
+        for i, step in enumerate(steps):
+            if not step.column_stats:
+                continue
+
+            for blk in blocks:
+                block = values[blk]
+
+                if i > 0:
+                    block = block.copy()
+
+                    for prev_step in steps[:i]:
+                        prev_step.transform(block)
+
+                step.partial_fit(block)
+
+        # apply transforms to each block of rows, in place
+        for blk in blocks:
+            block = values[blk]
+
+            for step in steps:
+                step.transform(block)
+
+    return pd.DataFrame(values, index=df.index, columns=df.columns, copy=False)
+
+
+def cpm(df, inplace=False, block_size=None):
+    """Counts-per-million (CPM) column normalization"""
+    return apply_transforms(df, ["cpm"], inplace=inplace, block_size=block_size)
+
+
+def log2(df, inplace=False, block_size=None):
+    """Log2 transformation"""
+    return apply_transforms(df, ["log2"], inplace=inplace, block_size=block_size)
+
+
+def log2p(df, inplace=False, block_size=None):
+    """Log2(x + 1) transformation"""
+    return apply_transforms(df, ["log2p"], inplace=inplace, block_size=block_size)
+
+
+def zscore(df, axis=0, inplace=False, block_size=None):
+    """Z-score transformation of each column (axis=0) or row (axis=1)"""
+    return apply_transforms(df, [("zscore", {"axis": axis})], inplace=inplace,
+                            block_size=block_size)
+
+
+def _get_values(df, inplace):
+    """Returns a writeable array of dataset values to be transformed"""
+    if not all(is_numeric_dtype(dtype) for dtype in df.dtypes):
+        raise ValueError("Transforms can only be applied to numeric data")
+
+    # floating point data keeps its dtype; integer data is converted to floats
+    dtype = np.result_type(*df.dtypes) if df.shape[1] > 0 else ACCUMULATOR_DTYPE
+
+    if not is_float_dtype(dtype):
+        dtype = ACCUMULATOR_DTYPE
+
+    values = df.to_numpy(dtype=dtype, copy=not inplace)
+
+    if not values.flags.writeable:
+        values = values.copy()
+
+    return values
+
+
+def _get_transform(entry):
+    """Creates a transform instance from a transform name or (name, params) tuple"""
+    if isinstance(entry, str):
+        name, params = entry, {}
+    else:
+        name, params = entry
+
+    if name not in TRANSFORMS:
+        msg = "Unknown transform specified: '{}' (expected one of: {})"
+        raise ValueError(msg.format(name, ", ".join(TRANSFORMS)))
+
+    return TRANSFORMS[name](**params)
+
+
+class Transform:
+    """Base transform class"""
+
+    # whether the transform requires statistics computed over entire columns
+    column_stats = False
+
+    def partial_fit(self, block):
+        """Accumulates column statistics for a block of rows"""
+        pass
+
+    def transform(self, block):
+        """Transforms a block of rows in place"""
+        raise NotImplementedError
+
+
+class CPMTransform(Transform):
+    """Counts-per-million (CPM) column normalization"""
+
+    column_stats = True
+
+    def __init__(self):
+        self.sums = 0
+
+    def partial_fit(self, block):
+        self.sums = self.sums + np.nansum(block, axis=0, dtype=ACCUMULATOR_DTYPE)
+
+    def transform(self, block):
+        block /= self.sums
+        block *= 1e6
+
+
+class Log2Transform(Transform):
+    """Log2 transformation"""
+
+    def transform(self, block):
+        np.log2(block, out=block)
+
+
+class Log2pTransform(Transform):
+    """Log2(x + 1) transformation"""
+
+    def transform(self, block):
+        block += 1
+        np.log2(block, out=block)
+
+
+class ZScoreTransform(Transform):
+    """
+    Z-score transformation
+
+    For column-wise z-scores (axis=0), column means and variances are accumulated across blocks
+    using the pairwise update of Chan et al., so that only a single read-only pass over the data
+    is required. Missing values are ignored, and the population standard deviation is used.
+    """
+
+    def __init__(self, axis=0):
+        if axis not in [0, 1]:
+            raise ValueError("Invalid z-score axis specified: {}".format(axis))
+
+        self.axis = axis
+        self.column_stats = axis == 0
+
+        self.count = 0
+        self.mean = 0
+        self.m2 = 0
+
+    def partial_fit(self, block):
+        count, mean, m2 = _moments(block, axis=0)
+
+        # combine block statistics with those from previous blocks
+        total = self.count + count
+        has_values = count > 0
+
+        delta = np.where(has_values, mean - self.mean, 0)
+        weight = np.where(has_values, count / np.maximum(total, 1), 0)
+
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + np.where(has_values, m2, 0) + delta ** 2 * self.count * weight
+        self.count = total
+
+    def transform(self, block):
+        if self.axis == 0:
+            mean = self.mean
+            std = np.sqrt(self.m2 / self.count)
+        else:
+            count, mean, m2 = _moments(block, axis=1)
+
+            mean = mean[:, np.newaxis]
+            std = np.sqrt(m2 / count)[:, np.newaxis]
+
+        block -= mean
+        block /= std
+
+
+def _moments(block, axis):
+    """
+    Computes the number of non-missing values, mean, and sum of squared deviations from the mean
+    along an axis of a block, at full precision.
+    """
+    count = (~np.isnan(block)).sum(axis=axis)
+    mean = np.nansum(block, axis=axis, dtype=ACCUMULATOR_DTYPE) / count
+
+    deviations = block - np.expand_dims(mean, axis)
+    m2 = np.nansum(deviations ** 2, axis=axis)
+
+    return count, mean, m2
+
+
+# supported transforms
+TRANSFORMS = {
+    "cpm": CPMTransform,
+    "log2": Log2Transform,
+    "log2p": Log2pTransform,
+    "zscore": ZScoreTransform,
+}
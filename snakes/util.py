@@ -1,11 +1,13 @@
 import os
+import re
 import sys
 import logging
-import pandas as pd
 from collections.abc import Mapping
 
 def load_data(infile):
     """Attempts to detect filetype and load a specified dataset"""
+    import pandas as pd
+
     # check to make sure file exists
     if not os.path.exists(infile):
         logging.error(
@@ -42,3 +44,22 @@ def recursive_update(d, u):
         else:
             d[k] = v
     return d
+
+def parse_size(size):
+    """
+    Converts a human-readable size (e.g. "500MB" or "2 GB") to a number of bytes.
+
+    size: str|int
+        Size string, or number of bytes
+    """
+    if isinstance(size, (int, float)):
+        return int(size)
+
+    units = {"B": 1, "KB": 2 ** 10, "MB": 2 ** 20, "GB": 2 ** 30, "TB": 2 ** 40}
+
+    match = re.match(r"^\s*([\d.]+)\s*([KMGT]?B)\s*$", size.upper())
+
+    if match is None:
+        raise ValueError("Invalid size specified: {}".format(size))
+
+    return int(float(match.group(1)) * units[match.group(2)])
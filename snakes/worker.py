@@ -0,0 +1,615 @@
+"""
+Snakes worker service
+
+By default, the code of each dataset action rule is run by snakemake, and each rule reads its
+input dataset from disk, and writes its output dataset to disk. When the worker service is
+enabled (see the "worker" section of conf/defaults.yml), inline action rules instead send their
+code to a long-lived local worker process (see WorkerServer), which already has the
+dependencies of the action code imported, and keeps the datasets most recently read or written
+by rules in memory (see DataCache), so that the rules using them next can pick them up without
+reading and decompressing them.
+
+Outputs are still written to disk, so that snakemake can track them, and cached datasets are
+only used if their file is unchanged (see _get_signature). Datasets are cached as
+Arrow tables, the in-memory form of the feather files they are written to, so that rules see
+exactly the same data whether or not it comes from the cache.
+
+The worker communicates over a unix socket in a private directory, and only accepts requests
+from clients with the key it writes alongside the socket. It is started automatically by
+"snakes --run" (unless one is already running), and stopped once the pipeline has finished; it
+can also be managed using "snakes worker" (see main()). If no worker is running, rules run their
+code in the snakemake process, as usual.
+
+Since the worker is a local process, it is only used by rules running on the same machine; when
+using a cluster profile, rules run their code in their own job.
+"""
+import hashlib
+import logging
+import os
+import socket
+import sys
+import textwrap
+import threading
+import time
+import traceback
+from argparse import ArgumentParser
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from .util import parse_size
+
+# size of the block at the end of a file used to detect changes
+SIGNATURE_BLOCK_SIZE = 65536
+
+# default worker socket location
+ADDRESS = os.path.join("~", ".cache", "snakes", "worker", "worker.sock")
+
+# modules available to action code, as imported by the Snakefile
+ACTION_MODULES = {
+    "glob": "glob",
+    "gzip": "gzip",
+    "operator": "operator",
+    "os": "os",
+    "pathlib": "pathlib",
+    "warnings": "warnings",
+    "yaml": "yaml",
+    "np": "numpy",
+    "pd": "pandas",
+}
+
+SNAKES_MODULES = ["chunked", "clustering", "dtypes", "filters", "gene_sets", "impute",
+                  "integration", "loaders", "pivot", "profiling", "shards", "stats",
+                  "training_sets", "transforms"]
+
+
+class WorkerError(Exception):
+    """Raised when action code fails in the worker process"""
+
+
+class DataCache:
+    def __init__(self, max_size="4GB"):
+        """
+        Creates a new DataCache instance: an in-memory LRU cache of datasets, keyed by path.
+
+        Arguments
+        ---------
+        max_size : str|int
+            Maximum total size of cached datasets (e.g. "4GB").
+        """
+        self.max_size = parse_size(max_size)
+        self.hits = 0
+        self.misses = 0
+
+        # cached tables and file signatures, least recently used first
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """Returns the cached table for a file, or None if it is not cached or has changed"""
+        key = os.path.realpath(path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[1] != _get_signature(key):
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return entry[0]
+
+    def put(self, path, table):
+        """Adds the table read from or written to a file to the cache"""
+        key = os.path.realpath(path)
+
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[0].nbytes
+
+            # tables larger than the cache are not cached
+            if table.nbytes > self.max_size:
+                return
+
+            self._entries[key] = (table, _get_signature(key))
+            self._size += table.nbytes
+
+            # remove least recently used tables
+            while self._size > self.max_size:
+                self._size -= self._entries.popitem(last=False)[1][0].nbytes
+
+    def load_data(self, path):
+        """Loads a dataset, using the cache (see load_data)"""
+        return load_data(path, self)
+
+    def save_data(self, dat, path):
+        """Writes a dataset, adding it to the cache (see save_data)"""
+        save_data(dat, path, self)
+
+    @staticmethod
+    def load_stats(path, dat=None):
+        """Loads the statistics sidecar of a dataset (see stats.load_stats)"""
+        from . import stats
+
+        return stats.load_stats(path, dat)
+
+    @staticmethod
+    def write_stats(dat, path):
+        """Writes the statistics sidecar of a dataset (see stats.write_stats)"""
+        from . import stats
+
+        stats.write_stats(dat, path)
+
+    def info(self):
+        """Returns the number and total size of cached datasets, and the cache hit counts"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size": self._size,
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def load_data(path, cache=None):
+    """
+    Loads a dataset written by a rule, indexed by its first column.
+
+    Arguments
+    ---------
+    path : str
+        Path to a feather file.
+    cache : DataCache
+        Cache to load the dataset from, if present, and add it to otherwise.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Dataset, as a new DataFrame which may be modified in place.
+    """
+    from pyarrow import feather
+
+    table = cache.get(path) if cache is not None else None
+
+    if table is None:
+        table = feather.read_table(path)
+
+        if cache is not None:
+            cache.put(path, table)
+
+    return from_table(table)
+
+
+def save_data(dat, path, cache=None):
+    """
+    Writes a dataset to a feather file (as DataFrame.to_feather), moving its index to the first
+    column.
+
+    Arguments
+    ---------
+    dat : pandas.DataFrame
+        Dataset to write.
+    path : str
+        Path to write the dataset to.
+    cache : DataCache
+        Cache to add the dataset to.
+    """
+    from pyarrow import feather
+
+    table = to_table(dat)
+    feather.write_feather(table, path, compression="lz4")
+
+    if cache is not None:
+        cache.put(path, table)
+
+
+def to_table(dat):
+    """Converts a dataset to an Arrow table, as written to feather files by rules"""
+    import pyarrow as pa
+
+    return pa.Table.from_pandas(dat.reset_index(), preserve_index=None)
+
+
+def from_table(table):
+    """Converts an Arrow table to a dataset, as loaded from feather files by rules"""
+    dat = table.to_pandas()
+
+    return dat.set_index(dat.columns[0])
+
+
+def execute(request, store=None):
+    """
+    Runs the code of an action rule.
+
+    Arguments
+    ---------
+    request : dict
+        Action code ("code"), and the "input", "output", "threads" and "params" of the rule.
+    store : DataCache
+        Object providing the "load_data", "save_data", "load_stats" and "write_stats" functions
+        used by action code to read and write datasets and their statistics; by default,
+        datasets are read and written without caching.
+    """
+    if store is None:
+        store = DataCache(0)
+
+    namespace = _get_globals()
+
+    namespace.update({
+        "input": request["input"],
+        "output": request["output"],
+        "threads": request["threads"],
+        "params": request["params"],
+        "load_data": store.load_data,
+        "save_data": store.save_data,
+        "load_stats": store.load_stats,
+        "write_stats": store.write_stats,
+    })
+
+    # as in the snakemake process, thread limits apply to the whole worker process, so they are
+    # best-effort for concurrent requests (see resources.limit_threads)
+    namespace["limit_threads"](request["threads"])
+
+    code = textwrap.dedent(request["code"])
+
+    exec(compile(code, request.get("name", "<action>"), "exec"), namespace)
+
+
+class WorkerServer:
+    def __init__(self, address=ADDRESS, cache_size="4GB"):
+        """
+        Creates a new WorkerServer instance.
+
+        Arguments
+        ---------
+        address : str
+            Path of the unix socket to listen on.
+        cache_size : str|int
+            Maximum total size of datasets kept in memory (e.g. "4GB").
+        """
+        self.address = os.path.expanduser(address)
+        self.cache = DataCache(cache_size)
+
+        self._listener = None
+        self._stopped = threading.Event()
+
+        # working directory of the running requests, and the number of running requests
+        self._cwd = None
+        self._active = 0
+        self._cwd_changed = threading.Condition()
+
+    def serve(self):
+        """Handles requests until the worker is stopped"""
+        if connect(self.address) is not None:
+            sys.exit("[ERROR] A worker is already running at {}".format(self.address))
+
+        # the socket and key are only accessible by the current user
+        os.makedirs(os.path.dirname(self.address), mode=0o700, exist_ok=True)
+
+        if os.path.exists(self.address):
+            os.remove(self.address)
+
+        authkey = os.urandom(32)
+
+        key_file = _get_key_file(self.address)
+        fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(authkey)
+
+        # import the dependencies of action code before accepting requests
+        _get_globals()
+
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=authkey)
+
+        logging.info("Worker listening on %s (pid %d)", self.address, os.getpid())
+
+        try:
+            while True:
+                try:
+                    conn = self._listener.accept()
+                except (OSError, EOFError, AuthenticationError):
+                    # connections without the key are ignored (see stop())
+                    conn = None
+
+                if self._stopped.is_set():
+                    break
+
+                if conn is not None:
+                    threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            self._listener.close()
+
+            if os.path.exists(key_file):
+                os.remove(key_file)
+
+    def stop(self):
+        """Stops accepting requests"""
+        self._stopped.set()
+
+        # wake up the thread waiting for new connections
+        with socket.socket(socket.AF_UNIX) as sock:
+            sock.connect(self.address)
+
+    def _handle(self, conn):
+        """Handles the requests sent over a single connection"""
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                if request["op"] == "run":
+                    try:
+                        with self._working_dir(request["cwd"]):
+                            execute(request, self.cache)
+                        reply = {"ok": True}
+                    except Exception:
+                        reply = {"ok": False, "error": traceback.format_exc()}
+                elif request["op"] == "status":
+                    reply = {"ok": True, "pid": os.getpid(), "cache": self.cache.info()}
+                elif request["op"] == "stop":
+                    conn.send({"ok": True})
+                    self.stop()
+                    return
+                else:
+                    reply = {"ok": False, "error": "Unknown request: {}".format(request["op"])}
+
+                conn.send(reply)
+
+
+    @contextmanager
+    def _working_dir(self, cwd):
+        """
+        Runs a request in the working directory of the rule sending it, so that relative paths
+        are resolved as they would be by snakemake. Since the working directory is shared by all
+        threads, requests from different directories are run one directory at a time.
+        """
+        with self._cwd_changed:
+            while self._active > 0 and self._cwd != cwd:
+                self._cwd_changed.wait()
+
+            if self._cwd != cwd:
+                os.chdir(cwd)
+                self._cwd = cwd
+
+            self._active += 1
+
+        try:
+            yield
+        finally:
+            with self._cwd_changed:
+                self._active -= 1
+                self._cwd_changed.notify_all()
+
+
+class WorkerClient:
+    def __init__(self, address=ADDRESS):
+        """
+        Creates a new WorkerClient instance, used by rules to run their code in the worker.
+
+        Arguments
+        ---------
+        address : str
+            Path of the worker socket.
+        """
+        self.address = os.path.expanduser(address)
+
+    def run(self, code, input, output, threads=1, params=None, name=None):
+        """
+        Runs the code of an action rule using the worker, if it is running, or in the current
+        process otherwise.
+
+        Arguments
+        ---------
+        code : str
+            Action code, which reads its input using "load_data", and writes its output using
+            "save_data".
+        input : list
+            Rule input files.
+        output : list
+            Rule output files.
+        threads : int
+            Number of threads allocated to the rule.
+        params : dict
+            Rule parameters (for generic rules; see generic.py).
+        name : str
+            Rule name, used in tracebacks.
+        """
+        request = {
+            "op": "run",
+            "code": code,
+            "input": list(input),
+            "output": list(output),
+            "threads": threads,
+            "params": params,
+            "name": "<{}>".format(name or "action"),
+            "cwd": os.getcwd(),
+        }
+
+        conn = connect(self.address)
+
+        if conn is None:
+            execute(request)
+            return
+
+        with conn:
+            conn.send(request)
+            reply = conn.recv()
+
+        if not reply["ok"]:
+            raise WorkerError(reply["error"])
+
+    def status(self):
+        """Returns the worker process id and cache statistics, or None if it is not running"""
+        return self._send({"op": "status"})
+
+    def stop(self):
+        """Stops the worker; returns None if it is not running"""
+        return self._send({"op": "stop"})
+
+    def _send(self, request):
+        """Sends a request to the worker, and returns its reply"""
+        conn = connect(self.address)
+
+        if conn is None:
+            return None
+
+        with conn:
+            conn.send(request)
+            return conn.recv()
+
+
+def connect(address=ADDRESS):
+    """Connects to the worker at an address, or returns None if it is not running"""
+    address = os.path.expanduser(address)
+
+    try:
+        with open(_get_key_file(address), "rb") as fp:
+            authkey = fp.read()
+
+        return Client(address, family="AF_UNIX", authkey=authkey)
+    except (OSError, EOFError, AuthenticationError):
+        return None
+
+
+def start(address=ADDRESS, cache_size="4GB", timeout=30):
+    """
+    Starts a worker in a background process, and waits for it to accept requests.
+
+    Returns
+    -------
+    subprocess.Popen
+        Worker process.
+    """
+    import subprocess
+
+    cmd = [sys.executable, "-m", "snakes.worker", "--address", address, "start",
+           "--cache-size", str(cache_size)]
+
+    proc = subprocess.Popen(cmd)
+
+    client = WorkerClient(address)
+    deadline = time.time() + timeout
+
+    while client.status() is None:
+        if proc.poll() is not None or time.time() > deadline:
+            proc.kill()
+            sys.exit("[ERROR] Unable to start worker at {}".format(address))
+
+        time.sleep(0.1)
+
+    return proc
+
+
+def main(args=None):
+    """
+    Command-line interface for managing the worker service ("snakes worker").
+
+    Arguments
+    ---------
+    args : list
+        Command-line arguments; defaults to sys.argv[2:].
+    """
+    parser = ArgumentParser(
+        prog="snakes worker", description="Manages the snakes worker service."
+    )
+
+    parser.add_argument(
+        "-a", "--address", default=ADDRESS,
+        help="Worker socket path (default: {})".format(ADDRESS)
+    )
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    start_parser = subparsers.add_parser("start", help="Runs a worker in the foreground.")
+    start_parser.add_argument("--cache-size", default="4GB",
+                              help="Maximum size of datasets kept in memory (default: 4GB).")
+
+    subparsers.add_parser("status", help="Shows whether a worker is running, and its cache.")
+    subparsers.add_parser("stop", help="Stops a running worker.")
+
+    args = parser.parse_args(sys.argv[2:] if args is None else args)
+
+    if args.command == "start":
+        logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                            format="[%(levelname)s] (%(asctime)s) - %(message)s",
+                            datefmt="%Y-%m-%d %H:%M:%S")
+        WorkerServer(args.address, args.cache_size).serve()
+        return
+
+    client = WorkerClient(args.address)
+
+    if args.command == "status":
+        status = client.status()
+
+        if status is None:
+            print("No worker running at {}".format(client.address))
+        else:
+            cache = status["cache"]
+
+            print("Worker pid   : {}".format(status["pid"]))
+            print("Cached data  : {} datasets ({:.1f} / {:.1f} MB)".format(
+                cache["entries"], cache["size"] / 1024 ** 2, cache["max_size"] / 1024 ** 2))
+            print("Cache hits   : {} / {}".format(cache["hits"], cache["hits"] + cache["misses"]))
+    elif client.stop() is None:
+        print("No worker running at {}".format(client.address))
+
+
+def _get_key_file(address):
+    """Returns the path of the file containing the key used to connect to a worker"""
+    return address + ".key"
+
+
+def _get_signature(path):
+    """
+    Returns the inode and size of a file, and a digest of its last block (containing the
+    footer of feather files), or None if it does not exist.
+
+    Modification times are not used, since snakemake updates those of rule outputs once each
+    job has finished.
+    """
+    try:
+        with open(path, "rb") as fp:
+            info = os.fstat(fp.fileno())
+
+            fp.seek(max(info.st_size - SIGNATURE_BLOCK_SIZE, 0))
+            digest = hashlib.blake2b(fp.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+    return (info.st_ino, info.st_size, digest)
+
+
+# globals of action code, imported once per process; action code may be run by several threads
+# at once (e.g. by the worker service, or the in-process executor)
+_globals = {}
+_globals_lock = threading.Lock()
+
+
+def _get_globals():
+    """Returns a new namespace containing the modules available to action code"""
+    import importlib
+
+    with _globals_lock:
+        if not _globals:
+            for name, module in ACTION_MODULES.items():
+                _globals[name] = importlib.import_module(module)
+
+            for name in SNAKES_MODULES:
+                _globals[name] = importlib.import_module("snakes." + name)
+
+            from snakes.resources import estimate_mem_mb, limit_threads
+
+            _globals.update(estimate_mem_mb=estimate_mem_mb, limit_threads=limit_threads)
+
+        return dict(_globals)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -10,13 +10,33 @@ for cross-references, as well as rule name generation.
 This class provides helps to manage these elements and provide helper functions for
 determining the rulenames, input and output filepaths, and associated parameters.
 """
+import hashlib
+import json
+import logging
 import os
 import re
 import sys
-import pandas as pd
 import pathlib
 from collections import OrderedDict
+from snakes.loaders import PUSHDOWN_ACTIONS
 from snakes.rules import *
+from snakes.util import parse_size
+
+# dataset settings which affect the output of a dataset's rules; rules are only merged with
+# identical rules from other datasets if these settings also match (see merge_shared_rules)
+EXECUTION_SETTINGS = [
+    "file_type",
+    "compression",
+    "encoding",
+    "sep",
+    "sheet",
+    "index_col",
+    "xid",
+    "yid",
+    "dtypes",
+    "stats",
+    "backend",
+]
 
 
 class SnakeWrangler:
@@ -31,6 +51,28 @@ class SnakeWrangler:
         self.feature_selection = []
         self.data_integration = []
 
+        # ids of rules which have been merged into identical rules (see merge_shared_rules)
+        self.aliases = {}
+
+        # rules rendered as generic rules, by generic rule name (see set_generic_rules)
+        self.generic_rules = OrderedDict()
+
+        # directory temporary outputs are written to, if any (see set_retention)
+        self.scratch_dir = None
+
+        # ids of rules with a user-specified id or filename, whose outputs are retained when
+        # only checkpoints are kept (see set_retention)
+        self._checkpoints = set()
+
+        # rule index: dataset rules by id, and the ids of the rules using each rule's output
+        self._rules = {}
+        self._children = {}
+
+        # all rule ids assigned so far, and the next numeric suffix to try for each id prefix
+        # (see _get_unique_rule_id)
+        self._rule_ids = set()
+        self._id_counters = {}
+
     def add_actions(self, dataset_name, actions, parent_id=None, **kwargs):
         """
         Adds one or more actions to a specified dataset pipeline.
@@ -74,7 +116,8 @@ class SnakeWrangler:
             parent_id = rule_id
 
             # create OrderedDict and store load_data rule
-            self.datasets[dataset_name] = OrderedDict({rule_id: rule})
+            self.datasets[dataset_name] = OrderedDict()
+            self._add_rule(dataset_name, rule)
 
             # if "input" meta-rule specified, check for requested reports to generate
             if actions[0]['action_name'] == 'input' and len(actions[0]['reports']) > 0:
@@ -83,6 +126,24 @@ class SnakeWrangler:
 
                 del actions[0]
 
+            # push any leading column/row filter actions down into the load step, so that only
+            # the needed columns and rows are read from disk
+            if kwargs.get("pushdown", False) and kwargs["file_type"] in ["csv", "feather"]:
+                pushdown = []
+
+                while len(actions) > 0 and self._is_pushdown_action(actions[0]):
+                    action = actions.pop(0)
+
+                    params = {
+                        k: v
+                        for k, v in action.items()
+                        if k not in ["action_name", "filename", "inline", "local", "reports"]
+                    }
+                    pushdown.append((action["action_name"], params))
+
+                if len(pushdown) > 0:
+                    rule.params["pushdown"] = pushdown
+
         # next, iterate over user-defined actions and add to wrangler
         for action in actions:
             # dataset branch
@@ -100,14 +161,19 @@ class SnakeWrangler:
                 del action["id"]
 
                 # check to make sure user-specified id isn't already in use
-                if rule_id in self.get_all_rule_ids():
+                if rule_id in self._rule_ids:
                     sys.exit(
                         '[ERROR] Action id "{}" is already being used; '
                         "please choose a different name".format(rule_id)
                     )
+
+                self._checkpoints.add(rule_id)
             else:
                 rule_id = self._get_action_rule_id(dataset_name, action_name)
 
+            if action["filename"] is not None:
+                self._checkpoints.add(rule_id)
+
             # determine input filepath
             input = self.get_output(parent_id)
 
@@ -144,7 +210,7 @@ class SnakeWrangler:
                 )
 
             # add to dataset
-            self.datasets[dataset_name][rule_id] = rule
+            self._add_rule(dataset_name, rule)
 
             # update parent node
             parent_id = rule_id
@@ -157,6 +223,650 @@ class SnakeWrangler:
             for report_name in action["reports"]:
                 self.add_report_rule(report_name, rule_output, parent_id, **kwargs)
 
+    def set_backend(self, dataset_name, backend, action_cfgs):
+        """
+        Determines which of the rules for a dataset are executed using the chunked backend.
+
+        Parameters
+        ----------
+        dataset_name: str
+            Name of the dataset
+        backend: dict
+            Dataset backend settings (see conf/defaults.yml)
+        action_cfgs: dict
+            Supported action configurations (see conf/actions.yml)
+        """
+        rules = self.datasets[dataset_name]
+        load_rule = next(iter(rules.values()))
+
+        backend_type = backend["type"]
+
+        # if "auto" specified, choose backend based on the size of the input dataset
+        if backend_type == "auto":
+            if os.path.exists(load_rule.input):
+                input_size = os.path.getsize(load_rule.input)
+            else:
+                input_size = 0
+
+            if input_size >= parse_size(backend["size_threshold"]):
+                backend_type = "chunked"
+            else:
+                backend_type = "pandas"
+
+        if backend_type == "pandas":
+            return
+        elif backend_type != "chunked":
+            msg = '[ERROR] Config error: unsupported backend "{}" specified for {}.'
+            sys.exit(msg.format(backend_type, dataset_name))
+
+        for rule_id, rule in rules.items():
+            if rule is load_rule:
+                # csv and feather datasets can be loaded in batches
+                template = os.path.basename(load_rule.template)
+
+                if template in ["load_csv.snakefile", "load_feather.snakefile"]:
+                    rule.chunked = {"combine": None}
+                    continue
+                else:
+                    settings = None
+            else:
+                settings = self._get_rule_chunked_settings(rule, action_cfgs)
+
+            if settings is not None:
+                rule.chunked = settings
+                continue
+
+            # rules which require the entire dataset are either executed in memory, or
+            # result in an error, depending on user settings
+            if backend["on_unsupported"] == "error":
+                msg = ('[ERROR] Config error: rule "{}" cannot be executed using the chunked '
+                       "backend; set 'on_unsupported' to 'fallback' to load the dataset into "
+                       "memory for this rule instead.")
+                sys.exit(msg.format(rule_id))
+
+            logging.warning("Rule %s requires the entire dataset; executing in memory.", rule_id)
+
+    def set_resources(self, dataset_name, defaults, action_cfgs):
+        """
+        Determines the threads and memory requirements of the rules for a dataset.
+
+        Requirements are taken from the "resources" entry for each action in conf/actions.yml,
+        falling back on the dataset defaults, and may be overridden for individual actions using
+        a "resources" parameter. Grouped actions use the largest requirements of their
+        sub-actions.
+
+        Parameters
+        ----------
+        dataset_name: str
+            Name of the dataset
+        defaults: dict
+            Default dataset resource settings (see conf/defaults.yml)
+        action_cfgs: dict
+            Supported action configurations (see conf/actions.yml)
+        """
+        for rule in self.datasets[dataset_name].values():
+            if isinstance(rule, GroupedActionRule):
+                actions = list(rule.actions.values())
+            else:
+                actions = [rule]
+
+            settings = [self._get_action_resources(x, defaults, action_cfgs) for x in actions]
+
+            resources = {k: max(x[k] for x in settings) for k in defaults}
+            resources.update(rule.params.pop("resources", {}))
+
+            # rules executed in batches only hold a single batch in memory at a time
+            if rule.chunked is not None:
+                resources["mem_scale"] = 0
+
+            rule.resources = resources
+
+    def _get_action_resources(self, rule, defaults, action_cfgs):
+        """Returns the resource requirements for a single action"""
+        resources = dict(defaults)
+        resources.update(action_cfgs.get(rule.action_name, {}).get("resources", {}))
+
+        # user-specified overrides for sub-actions within a group
+        resources.update(rule.params.pop("resources", {}))
+
+        return resources
+
+    def merge_shared_rules(self, dataset_cfgs):
+        """
+        Merges rules which would produce identical outputs, so that work shared by multiple
+        datasets or dataset branches (e.g. the same load and filter steps) is only performed
+        once.
+
+        Each rule is fingerprinted by its input (the fingerprint of its parent rule, or the
+        input path for load rules), template, normalized parameters, and the dataset settings
+        that affect its output (see EXECUTION_SETTINGS). Rules with the same fingerprint as an
+        earlier rule are removed, and any rules, reports, or dataset parameters referring to
+        their outputs are updated to use the output of the earlier rule instead.
+
+        Rules with a user-specified filename, or whose output is used by a training set or data
+        integration, are never removed, since their output paths are significant.
+
+        This should be called once all rules have been added, and dataset paths expanded.
+
+        Parameters
+        ----------
+        dataset_cfgs: dict
+            Dataset configurations, indexed by dataset name
+        """
+        # maps from fingerprints to the first rule with that fingerprint, and vice versa
+        fingerprints = {}
+        rule_keys = {}
+
+        # maps from the outputs of removed rules to the outputs used in their place
+        outputs = {}
+
+        protected = []
+
+        if self.training_set is not None:
+            protected += self.training_set.input["features"]
+            protected.append(self.training_set.input["response"])
+
+        for rule in self.data_integration:
+            protected += rule.inputs
+
+        for dataset_name, rules in self.datasets.items():
+            settings = {k: dataset_cfgs[dataset_name].get(k) for k in EXECUTION_SETTINGS}
+
+            for rule_id, rule in list(rules.items()):
+                # rules whose parent has been merged use the output of the shared rule instead
+                if rule.parent_id in self.aliases:
+                    self._set_parent(rule, self.aliases[rule.parent_id])
+                    rule.input = self.get_output(rule.parent_id)
+
+                if "dataset" in rule.params:
+                    path = rule.params["dataset"]
+                    rule.params["dataset"] = outputs.get(path, path)
+
+                key = self._get_rule_fingerprint(rule, rule_keys.get(rule.parent_id), settings)
+                rule_keys[rule_id] = key
+
+                if key not in fingerprints:
+                    fingerprints[key] = rule_id
+                    continue
+
+                if rule.params.get("filename") or rule.output in protected:
+                    continue
+
+                logging.debug("Merging rule %s into %s", rule_id, fingerprints[key])
+
+                outputs[rule.output] = self.get_output(fingerprints[key])
+                self.aliases[rule_id] = fingerprints[key]
+
+                # the output of merged checkpoints is provided by the shared rule
+                if rule_id in self._checkpoints:
+                    self._checkpoints.add(fingerprints[key])
+
+                self._remove_rule(dataset_name, rule_id)
+
+        # update any remaining references to the outputs of removed rules
+        for report in self.reports.values():
+            report.input = outputs.get(report.input, report.input)
+
+        for rules in self.datasets.values():
+            for rule in rules.values():
+                if "dataset" in rule.params:
+                    path = rule.params["dataset"]
+                    rule.params["dataset"] = outputs.get(path, path)
+
+    def _get_rule_fingerprint(self, rule, parent_key, settings):
+        """
+        Returns a string identifying the output of a rule, based on its input, template,
+        parameters, and the settings of the dataset it belongs to.
+        """
+        if isinstance(rule, GroupedActionRule):
+            body = [[x.template, x.params] for x in rule.actions.values()]
+        else:
+            body = rule.template
+
+        # reports and filenames do not affect the contents of the output
+        params = {k: v for k, v in rule.params.items() if k not in ["reports", "filename"]}
+
+        # load rules are identified by the path to the dataset they load
+        if parent_key is None:
+            parent_key = os.path.abspath(rule.input)
+
+        key = json.dumps([parent_key, body, params, settings], sort_keys=True, default=str)
+
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def shard_actions(self, dataset_name, sharding, action_cfgs):
+        """
+        Splits sequences of row-independent actions for a dataset into parallel per-shard rules.
+
+        Each maximal sequence of inline actions which operate on each row independently (see
+        the "chunked" entries in conf/actions.yml) is preceded by a "scatter" rule, which splits
+        its input into row shards, and followed by a "gather" rule, which concatenates the
+        results into the output path of the final action in the sequence. Sequences end at
+        actions whose output is used by more than one rule, referenced elsewhere (e.g. by
+        reports or training sets), or which have a user-specified id or filename, so that the
+        corresponding files are still created.
+
+        This should be called once all rules have been added, and dataset paths expanded.
+
+        Parameters
+        ----------
+        dataset_name: str
+            Name of the dataset
+        sharding: dict
+            Dataset sharding settings (see conf/defaults.yml)
+        action_cfgs: dict
+            Supported action configurations (see conf/actions.yml)
+        """
+        rules = self.datasets[dataset_name]
+
+        # all of the rules of a dataset may have been merged into those of another dataset (see
+        # merge_shared_rules)
+        if len(rules) == 0:
+            return
+
+        load_rule = next(iter(rules.values()))
+
+        num_shards = sharding["num_shards"]
+
+        # if "auto" specified, use one shard per "shard_size" bytes of input data
+        if num_shards == "auto":
+            if os.path.exists(load_rule.input):
+                input_size = os.path.getsize(load_rule.input)
+            else:
+                input_size = 0
+
+            num_shards = -(-input_size // parse_size(sharding["shard_size"]))
+            num_shards = min(num_shards, sharding["max_shards"])
+
+        if not isinstance(num_shards, int):
+            msg = '[ERROR] Config error: invalid num_shards "{}" specified for {}.'
+            sys.exit(msg.format(num_shards, dataset_name))
+
+        if num_shards <= 1:
+            return
+
+        # rules which use each rule's output; after merging shared rules, these may belong to
+        # other datasets
+        children = {rule_id: self.get_children(rule_id) for rule_id in rules}
+
+        referenced = self.get_referenced_outputs()
+
+        def is_shardable(rule):
+            return (
+                rule is not load_rule
+                and "dataset" not in rule.params
+                and self._get_rule_chunked_settings(rule, action_cfgs) == {"combine": None}
+            )
+
+        def ends_segment(rule_id):
+            rule = rules[rule_id]
+
+            return (
+                len(children[rule_id]) != 1
+                or rule.output in referenced
+                or rule.params.get("filename")
+                or rule_id in self._checkpoints
+                or children[rule_id][0] not in rules
+                or not is_shardable(rules[children[rule_id][0]])
+            )
+
+        # assign rules to sequences
+        segments = []
+        rule_segments = {}
+
+        for rule_id, rule in rules.items():
+            if not is_shardable(rule):
+                continue
+
+            if rule.parent_id in rule_segments and not ends_segment(rule.parent_id):
+                segment = rule_segments[rule.parent_id]
+                segment.append(rule_id)
+            else:
+                segment = [rule_id]
+                segments.append(segment)
+
+            rule_segments[rule_id] = segment
+
+        scatter_rules = {}
+        gather_rules = {}
+
+        for segment in segments:
+            first = rules[segment[0]]
+            last = rules[segment[-1]]
+
+            # shards are stored in a "shards" sub-directory of the dataset output directory
+            shard_dir = os.path.join(os.path.dirname(last.output), "shards")
+
+            def shard_path(rule_id):
+                return os.path.join(shard_dir, rule_id + ".{shard}.feather")
+
+            # rule splitting the input of the sequence into shards
+            scatter_id = self._get_action_rule_id(segment[0], "scatter")
+
+            scatter_rule = ActionRule(
+                scatter_id,
+                first.parent_id,
+                first.input,
+                [shard_path(scatter_id).format(shard=i) for i in range(num_shards)],
+                template="actions/shard/shard_scatter.snakefile",
+                inline=False,
+            )
+
+            # rule combining the shards into the expected output of the sequence
+            gather_id = self._get_action_rule_id(segment[-1], "gather")
+
+            gather_rule = ActionRule(
+                gather_id,
+                segment[-1],
+                [shard_path(segment[-1]).format(shard=i) for i in range(num_shards)],
+                last.output,
+                template="actions/shard/shard_gather.snakefile",
+                inline=False,
+            )
+
+            # the outputs of checkpoints are produced by the gather rule (see set_retention)
+            if segment[-1] in self._checkpoints:
+                self._checkpoints.add(gather_id)
+
+            # shards are read and written in batches when using the chunked backend
+            scatter_rule.chunked = gather_rule.chunked = last.chunked
+
+            # splitting and combining shards is i/o-bound
+            if last.resources is not None:
+                scatter_rule.resources = dict(last.resources, threads=1)
+                gather_rule.resources = dict(last.resources, threads=1)
+
+            # update sequence rules to operate on a single shard
+            input = shard_path(scatter_id)
+
+            for rule_id in segment:
+                rules[rule_id].input = input
+                rules[rule_id].output = shard_path(rule_id)
+                rules[rule_id].shards = num_shards
+
+                input = rules[rule_id].output
+
+            self._index_rule(scatter_rule)
+            self._index_rule(gather_rule)
+
+            self._set_parent(first, scatter_id)
+
+            scatter_rules[segment[0]] = scatter_rule
+            gather_rules[segment[-1]] = gather_rule
+
+        # add scatter/gather rules before/after each sequence
+        self.datasets[dataset_name] = OrderedDict()
+
+        for rule_id, rule in rules.items():
+            if rule_id in scatter_rules:
+                self.datasets[dataset_name][scatter_rules[rule_id].rule_id] = scatter_rules[rule_id]
+
+            self.datasets[dataset_name][rule_id] = rule
+
+            if rule_id in gather_rules:
+                self.datasets[dataset_name][gather_rules[rule_id].rule_id] = gather_rules[rule_id]
+
+    def set_retention(self, keep, scratch_dir=None):
+        """
+        Marks the outputs of dataset rules which are not retained as temporary, so that they are
+        removed by snakemake once the rules using them have finished, and optionally moves them
+        to a scratch directory.
+
+        The final outputs of each dataset and dataset branch, and outputs used by reports,
+        training sets, data integration, or the parameters of other actions, are always
+        retained.
+
+        This should be called once all rules have been added, merged and sharded.
+
+        Parameters
+        ----------
+        keep: str
+            Outputs to retain: "all", "terminal" (final and referenced outputs only), or
+            "checkpoints" (also retains the outputs of actions with a user-specified id or
+            filename)
+        scratch_dir: str
+            Directory to write temporary outputs to, in place of the output directory, or None
+        """
+        if keep not in ["all", "terminal", "checkpoints"]:
+            sys.exit('[ERROR] Invalid retention "keep" setting: {}'.format(keep))
+
+        if keep == "all":
+            return
+
+        retained = self.get_referenced_outputs()
+
+        # outputs used by other dataset rules
+        used = set()
+
+        for rules in self.datasets.values():
+            for rule in rules.values():
+                used.update(rule.input if isinstance(rule.input, list) else [rule.input])
+
+            # final output of each dataset (see get_terminal_rules)
+            if len(rules) > 0:
+                retained.add(next(reversed(rules.values())).output)
+
+        for rules in self.datasets.values():
+            for rule_id, rule in rules.items():
+                # row shards (and scatter rules, which output a list of shards) are always
+                # intermediate
+                if isinstance(rule.output, str) and not rule.shards:
+                    if rule.output in retained or rule.output not in used:
+                        continue
+
+                    if keep == "checkpoints" and rule_id in self._checkpoints:
+                        continue
+
+                rule.temp = True
+
+        if scratch_dir is not None:
+            self._move_to_scratch(scratch_dir)
+
+    def _move_to_scratch(self, scratch_dir):
+        """Moves the temporary outputs of dataset rules to a scratch directory"""
+        self.scratch_dir = scratch_dir
+
+        prefix = self.output_dir + "/"
+
+        # maps from the original to the new paths of moved outputs, including individual shards
+        moved = {}
+
+        def move(path):
+            if not path.startswith(prefix):
+                return path
+
+            moved[path] = os.path.join(scratch_dir, path[len(prefix):])
+
+            return moved[path]
+
+        for rules in self.datasets.values():
+            for rule in rules.values():
+                if not rule.temp:
+                    continue
+
+                if isinstance(rule.output, list):
+                    rule.output = [move(x) for x in rule.output]
+                else:
+                    for i in range(rule.shards or 0):
+                        move(rule.output.format(shard=i))
+
+                    rule.output = move(rule.output)
+
+        # update the inputs of the rules using moved outputs; shard patterns (see shard_actions)
+        # are moved if their first shard is
+        def get_input(path):
+            key = path.format(shard=0) if "{shard}" in path else path
+
+            if key in moved:
+                return os.path.join(scratch_dir, path[len(prefix):])
+
+            return path
+
+        for rules in self.datasets.values():
+            for rule in rules.values():
+                if isinstance(rule.input, list):
+                    rule.input = [get_input(x) for x in rule.input]
+                else:
+                    rule.input = get_input(rule.input)
+
+    def set_generic_rules(self):
+        """
+        Assigns dataset actions to generic rules, one for each action type, which take "dataset"
+        and "step" wildcards (see snakes/generic.py).
+
+        Inline actions are assigned to a generic rule if they are neither run locally nor
+        applied to row shards, and their output is stored as
+        "<output_dir>/data/<dataset>/<step>.feather", where the step ends with the action name,
+        optionally followed by a numeric suffix (i.e. actions with the default rule id and
+        filename). Load rules are assigned to a generic rule for each file type if their output
+        is stored as "<output_dir>/data/<dataset>/input.feather". All other rules are rendered
+        as usual. Temporary outputs (see set_retention) are produced by separate generic rules,
+        and may be stored in a scratch directory in place of "<output_dir>/data".
+
+        This should be called once all rules have been added, merged, sharded, and assigned a
+        retention policy.
+        """
+        # directories containing the dataset output directories
+        data_dirs = "|".join(re.escape(x) for x in self.get_data_dirs())
+
+        generic_names = {}
+
+        for dataset_name, rules in self.datasets.items():
+            for rule in rules.values():
+                if rule.groupped or rule.inline:
+                    if rule.shards or rule.local:
+                        continue
+                elif not self._is_load_rule(rule):
+                    continue
+
+                output_pattern = r"({})/[^/]+/{}\.feather".format(
+                    data_dirs, self.get_generic_step_pattern(rule)
+                )
+
+                match = re.fullmatch(output_pattern, rule.output)
+
+                if match is None:
+                    continue
+
+                key = (rule.action_name, rule.temp, match.group(1))
+
+                if key not in generic_names:
+                    prefix = "generic_{}{}".format(rule.action_name, "_temp" if rule.temp else "")
+
+                    name = self._get_unique_rule_id(prefix, prefix)
+                    generic_names[key] = name
+                    self.generic_rules[name] = []
+
+                rule.generic = generic_names[key]
+                self.generic_rules[rule.generic].append((dataset_name, rule))
+
+    def get_data_dirs(self):
+        """
+        Returns the directories containing the dataset output directories: the "data" directory
+        of the output directory, and of the scratch directory, if any (see set_retention)
+        """
+        return [os.path.join(x, "data") for x in [self.output_dir, self.scratch_dir] if x]
+
+    def get_generic_step_pattern(self, rule):
+        """Returns a regular expression matching the "step" wildcard of a generic rule"""
+        if self._is_load_rule(rule):
+            return "input"
+
+        return r"[^/]*{}(?:_\d+)?".format(re.escape(rule.action_name))
+
+    @staticmethod
+    def _is_load_rule(rule):
+        """Returns True if a rule loads a dataset"""
+        return not rule.groupped and rule.template.startswith("actions/load/")
+
+    def get_referenced_outputs(self):
+        """Returns the rule outputs used by reports, training sets, and other datasets"""
+        referenced = [report.input for report in self.reports.values()]
+
+        if self.training_set is not None:
+            referenced += self.training_set.input["features"]
+            referenced.append(self.training_set.input["response"])
+
+        for rule in self.data_integration:
+            referenced += rule.inputs
+
+        for dataset_name in self.datasets:
+            for rule in self.datasets[dataset_name].values():
+                if "dataset" in rule.params:
+                    referenced.append(rule.params["dataset"])
+
+        return set(referenced)
+
+    def _get_rule_chunked_settings(self, rule, action_cfgs):
+        """
+        Determines whether a rule can be applied to one batch of rows at a time; see
+        _get_chunked_settings().
+        """
+        if isinstance(rule, GroupedActionRule):
+            # groups may only contain actions that are applied to each row independently
+            settings = [self._get_chunked_settings(x, action_cfgs) for x in rule.actions.values()]
+
+            if any(x is None or x["combine"] is not None for x in settings):
+                return None
+
+            return {"combine": None}
+        elif isinstance(rule, ActionRule) and rule.inline:
+            return self._get_chunked_settings(rule, action_cfgs)
+
+        return None
+
+    def _get_chunked_settings(self, rule, action_cfgs):
+        """
+        Determines whether an action can be applied to one batch of rows at a time, based on the
+        "chunked" entry in conf/actions.yml.
+
+        Returns None if the action requires the entire dataset, or otherwise a dict indicating the
+        function used to combine per-batch results, if any.
+        """
+        action_name = pathlib.Path(rule.template).stem
+
+        # fused transforms are supported if each of the transforms is
+        if action_name == "transform_chain":
+            for step_name, step_params in rule.params["steps"]:
+                step = ActionRule(None, None, None, None,
+                                  template="transform_{}.snakefile".format(step_name),
+                                  **step_params)
+
+                if self._get_chunked_settings(step, action_cfgs) != {"combine": None}:
+                    return None
+
+            return {"combine": None}
+
+        cfg = action_cfgs.get(action_name, {}).get("chunked", False)
+
+        if not cfg:
+            return None
+        elif cfg is True:
+            cfg = {}
+
+        # check any parameter conditions, e.g. {quantile: null}
+        for param, allowed in cfg.get("when", {}).items():
+            if not isinstance(allowed, list):
+                allowed = [allowed]
+
+            if rule.params.get(param) not in allowed:
+                return None
+
+        # per-batch aggregation results are combined using the function specified by one of the
+        # action parameters
+        combine = None
+
+        if "combine" in cfg:
+            # imported here to avoid loading pandas when rendering pipelines without aggregations
+            from snakes.chunked import COMBINE_FUNCS
+
+            combine = rule.params[cfg["combine"]]
+
+            if combine not in COMBINE_FUNCS:
+                return None
+
+        return {"combine": combine}
+
     def add_report_rule(self, report_name, rule_output, rule_id, **kwargs):
         """Add a single report rule to the pipeline"""
         # get report rule id
@@ -165,6 +875,8 @@ class SnakeWrangler:
         # get output filepath
         report_output = os.path.join(self.output_dir, "reports", f"{report_id}.html")
 
+        self._rule_ids.add(report_id)
+
         # create new ReportRule instance and add to wrangler
         self.reports[report_id] = ReportRule(
             report_id,
@@ -175,7 +887,8 @@ class SnakeWrangler:
             name=kwargs["name"],
             metadata=kwargs["metadata"],
             styles=kwargs["styles"],
-            theme="theme_bw"
+            theme="theme_bw",
+            threads=self.report_cfgs[report_name].get("threads", 1)
         )
 
         # add any dependency rules of the report
@@ -260,11 +973,13 @@ class SnakeWrangler:
                 del fsel["id"]
 
                 # check to make sure user-specified id isn't already in use
-                if rule_id in self.get_all_rule_ids():
+                if rule_id in self._rule_ids:
                     sys.exit(
                         '[ERROR] feature_selection id "{}" is already being used; '
                         "please choose a different name".format(rule_id)
                     )
+
+                self._rule_ids.add(rule_id)
             else:
                 rule_id = self._get_feature_selection_rule_id(fsel["method"])
 
@@ -294,11 +1009,13 @@ class SnakeWrangler:
                 del data_int["id"]
 
                 # check to make sure user-specified id isn't already in use
-                if rule_id in self.get_all_rule_ids():
+                if rule_id in self._rule_ids:
                     sys.exit(
                         '[ERROR] data_integration id "{}" is already being used; '
                         "please choose a different name".format(rule_id)
                     )
+
+                self._rule_ids.add(rule_id)
             else:
                 rule_id = self._get_data_integration_rule_id(data_int['datasets'], data_int["type"])
 
@@ -351,9 +1068,16 @@ class SnakeWrangler:
 
         for dataset_name in self.datasets:
             for rule_id in self.datasets[dataset_name]:
-                if self.datasets[dataset_name][rule_id].local:
+                rule = self.datasets[dataset_name][rule_id]
+
+                if rule.local and not rule.generic:
                     localrules.append(rule_id)
 
+        # generic rules are run locally if the rules they replace are
+        for name, rules in self.generic_rules.items():
+            if rules[0][1].local:
+                localrules.append(name)
+
         return ", ".join(localrules)
 
     def get_terminal_rules(self):
@@ -362,11 +1086,17 @@ class SnakeWrangler:
 
         # get terminal dataset rules
         for dataset_name in self.datasets:
+            # datasets whose rules have all been merged into those of other datasets
+            if len(self.datasets[dataset_name]) == 0:
+                continue
+
             key = next(reversed(self.datasets[dataset_name]))
             out = self.datasets[dataset_name][key].output.replace(
                 self.output_dir + "/", ""
             )
-            terminal_rules.append(out)
+
+            if out not in terminal_rules:
+                terminal_rules.append(out)
 
         # add report rules
         for report in self.reports.values():
@@ -375,26 +1105,24 @@ class SnakeWrangler:
 
         return "['{}']".format("', '".join(terminal_rules))
 
+    def _is_pushdown_action(self, action):
+        """
+        Returns True if an action can be applied while a dataset is being loaded; this is only
+        the case for column and row filters whose output is not otherwise referenced.
+        """
+        return (
+            isinstance(action, dict)
+            and action["action_name"] in PUSHDOWN_ACTIONS
+            and "id" not in action
+            and not action.get("filename")
+            and len(action.get("reports", [])) == 0
+        )
+
     def _get_feature_selection_rule_id(self, feat_selection_method):
         """Determines a unique rule identifier to assign to a given feature selection
         rule"""
         # base rule id: <feature_selection_method>
-        rule_id = feat_selection_method
-
-        # only allow letters, number, and underscores in rule names
-        rule_id = re.sub(r"[^\w]", "_", rule_id)
-
-        existing_ids = self.get_all_rule_ids()
-
-        # if id is already being used, append first available numeric suffix
-        id_counter = 2
-
-        while rule_id in existing_ids:
-            rule_id = "_".join([feat_selection_method, str(id_counter)])
-            rule_id = re.sub(r"[^\w]", "_", rule_id)
-            id_counter += 1
-
-        return rule_id
+        return self._get_unique_rule_id(feat_selection_method, feat_selection_method)
 
     def _get_data_integration_rule_id(self, datasets, data_integration_type):
         """Determines a unique rule identifier to assign to a given data integration 
@@ -402,56 +1130,89 @@ class SnakeWrangler:
         # base rule id: <dataset1>...<datasetn>_<data_integration_type>
         rule_id = "_".join(datasets + [data_integration_type])
 
-        # only allow letters, number, and underscores in rule names
-        rule_id = re.sub(r"[^\w]", "_", rule_id)
-
-        existing_ids = self.get_all_rule_ids()
-
-        # if id is already being used, append first available numeric suffix
-        id_counter = 2
-
-        while rule_id in existing_ids:
-            rule_id = "_".join([data_integration_type, str(id_counter)])
-            rule_id = re.sub(r"[^\w]", "_", rule_id)
-            id_counter += 1
-
-        return rule_id
+        return self._get_unique_rule_id(rule_id, data_integration_type)
 
     def _get_action_rule_id(self, rule_prefix, rule_suffix):
         """Determines a unique rule identifier to assign to a given action"""
         # base rule id: <dataset_name>_<action>
         rule_id = rule_prefix + "_" + rule_suffix
 
+        return self._get_unique_rule_id(rule_id, rule_id)
+
+    def _get_unique_rule_id(self, rule_id, prefix):
+        """
+        Returns a rule id that is not already in use, and reserves it.
+
+        If the base rule id is already being used, the first available id of the form
+        "<prefix>_<n>" (n >= 2) is used instead. Rule ids are never released, so the suffix
+        search for each prefix resumes from the last suffix assigned.
+        """
         # only allow letters, number, and underscores in rule names
         rule_id = re.sub(r"[^\w]", "_", rule_id)
 
-        existing_ids = self.get_all_rule_ids()
+        if rule_id in self._rule_ids:
+            id_counter = self._id_counters.get(prefix, 2)
 
-        # if id is already being used, append first available numeric suffix
-        id_counter = 2
+            while True:
+                rule_id = re.sub(r"[^\w]", "_", "_".join([prefix, str(id_counter)]))
+                id_counter += 1
 
-        while rule_id in existing_ids:
-            rule_id = "_".join([rule_prefix, rule_suffix, str(id_counter)])
-            rule_id = re.sub(r"[^\w]", "_", rule_id)
-            id_counter += 1
+                if rule_id not in self._rule_ids:
+                    break
+
+            self._id_counters[prefix] = id_counter
+
+        self._rule_ids.add(rule_id)
 
         return rule_id
 
-    def get_all_rule_ids(self):
-        """Returns a list of all rule ids currently being used"""
-        ids = []
+    def _add_rule(self, dataset_name, rule):
+        """Adds a rule to a dataset pipeline and to the rule index"""
+        self.datasets[dataset_name][rule.rule_id] = rule
+        self._index_rule(rule)
 
-        for dataset_name in self.datasets:
-            ids = ids + list(self.datasets[dataset_name].keys())
+    def _index_rule(self, rule):
+        """Adds a dataset rule to the rule index"""
+        self._rules[rule.rule_id] = rule
+        self._rule_ids.add(rule.rule_id)
+
+        if rule.parent_id is not None:
+            self._children.setdefault(rule.parent_id, []).append(rule.rule_id)
+
+    def _remove_rule(self, dataset_name, rule_id):
+        """Removes a rule from a dataset pipeline and from the rule index; its id stays reserved"""
+        rule = self.datasets[dataset_name].pop(rule_id)
+        del self._rules[rule_id]
+
+        if rule.parent_id is not None:
+            self._children[rule.parent_id].remove(rule_id)
 
-        ids = ids + list(self.reports.keys())
+    def _set_parent(self, rule, parent_id):
+        """Updates the parent of an indexed rule"""
+        if rule.parent_id is not None:
+            self._children[rule.parent_id].remove(rule.rule_id)
 
-        return ids
+        rule.parent_id = parent_id
+        self._children.setdefault(parent_id, []).append(rule.rule_id)
+
+    def get_children(self, rule_id):
+        """Returns the ids of the dataset rules which use the output of a given rule"""
+        return list(self._children.get(rule_id, []))
+
+    def get_all_rule_ids(self):
+        """Returns a list of all rule ids currently being used"""
+        return list(self._rules) + list(self.reports)
+
+    def has_rule(self, rule_id):
+        """Returns True if a dataset or report rule with the given id exists"""
+        return rule_id in self._rules or rule_id in self.reports
 
     def get_output(self, target_id):
         """Returns the output filepath associated with a given rule_id"""
-        for dataset_name in self.datasets:
-            for rule_id in self.datasets[dataset_name]:
-                if rule_id == target_id:
-                    return self.datasets[dataset_name][rule_id].output
+        # rules which have been merged into another rule share its output
+        target_id = self.aliases.get(target_id, target_id)
+
+        if target_id in self._rules:
+            return self._rules[target_id].output
 
+        return None
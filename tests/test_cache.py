@@ -0,0 +1,89 @@
+"""
+Snakes result cache tests
+"""
+import os
+import pytest
+from snakes.cache import ResultCache, get_param_files
+
+
+@pytest.fixture
+def result_cache(tmp_path):
+    """Creates an empty result cache"""
+    return ResultCache(str(tmp_path / 'cache'))
+
+
+def _write(path, contents):
+    """Writes a text file and returns its path"""
+    with open(path, 'w') as fp:
+        fp.write(contents)
+
+    return str(path)
+
+
+def test_get_key(result_cache, tmp_path):
+    """Cache keys depend on input file contents and rule code"""
+    infile = _write(tmp_path / 'input.txt', 'a')
+    key = result_cache.get_key([infile], 'code')
+
+    assert result_cache.get_key([infile], 'code') == key
+    assert result_cache.get_key([infile], 'other code') != key
+
+    # files with the same contents share a key, regardless of their location
+    assert result_cache.get_key([_write(tmp_path / 'copy.txt', 'a')], 'code') == key
+
+    _write(infile, 'b')
+    assert result_cache.get_key([infile], 'code') != key
+
+
+def test_get_key_param_files(result_cache, tmp_path):
+    """Cache keys depend on the contents of files specified in action parameters"""
+    infile = _write(tmp_path / 'input.txt', 'a')
+    gmt = _write(tmp_path / 'gene_sets.gmt', 'set1\tdesc\tA\tB\n')
+
+    files = get_param_files({'gmt': gmt, 'func': 'sum', 'mapping': 'grch38'})
+
+    assert files[0] == gmt
+    assert files[1].endswith('grch38.tsv.gz')
+    assert len(files) == 2
+
+    key = result_cache.get_key([infile], 'code', files)
+
+    assert result_cache.get_key([infile], 'code', files) == key
+
+    _write(gmt, 'set1\tdesc\tA\tC\n')
+    assert result_cache.get_key([infile], 'code', files) != key
+
+
+def test_store_restore(result_cache, tmp_path):
+    """Outputs and statistics sidecars are restored from the cache"""
+    outfile = _write(tmp_path / 'output.feather', 'data')
+    _write(tmp_path / 'output.feather.stats', 'stats')
+
+    result_cache.store('abc', [outfile])
+
+    dest = str(tmp_path / 'other' / 'output.feather')
+    os.makedirs(os.path.dirname(dest))
+
+    assert not result_cache.restore('def', [dest])
+    assert result_cache.restore('abc', [dest])
+
+    assert open(dest).read() == 'data'
+    assert open(dest + '.stats').read() == 'stats'
+
+
+def test_prune(tmp_path):
+    """The least recently used entries are removed when the cache is too large"""
+    result_cache = ResultCache(str(tmp_path / 'cache'), max_size=25)
+
+    for key in ['a', 'b', 'c']:
+        outfile = _write(tmp_path / (key + '.feather'), key * 10)
+        result_cache.store(key, [outfile])
+
+        # use first entry, so that the second entry is evicted
+        result_cache.restore('a', [str(tmp_path / 'restored.feather')])
+
+    assert [x['key'] for x in result_cache.entries()] == ['a', 'c']
+    assert result_cache.size() == 20
+
+    assert result_cache.prune(0) == ['c', 'a']
+    assert result_cache.entries() == []
@@ -0,0 +1,131 @@
+"""
+Snakes chunked execution backend tests
+"""
+import operator
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.errors import EmptyDataError
+from pandas.testing import assert_frame_equal
+from snakes import chunked, filters, gene_sets, transforms
+from snakes.wrangler import SnakeWrangler
+
+# input dataframe (genes x samples)
+INPUT = pd.DataFrame(np.arange(40, dtype=np.float64).reshape(10, 4) % 7,
+                     index=pd.Index(['g{}'.format(i) for i in range(10)], name='gene'),
+                     columns=['s1', 's2', 's3', 's4'])
+
+GENE_SETS = {'set1': ['g0', 'g3', 'g8'], 'set2': ['g1', 'g2', 'g9'], 'set3': ['g5']}
+
+ACTION_CFGS = {
+    'filter_rows_var_gt': {'chunked': {'when': {'quantile': None}}},
+    'aggregate_gene_sets': {'chunked': {'combine': 'func', 'when': {'func': ['sum', 'min', 'max']}}},
+    'transform_log2p': {'chunked': True},
+    'transform_zscore': {'chunked': {'when': {'axis': 1}}},
+}
+
+
+@pytest.fixture
+def infile(tmp_path):
+    """Writes the input dataset to a feather file"""
+    path = str(tmp_path / 'input.feather')
+    INPUT.reset_index().to_feather(path)
+    return path
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 100])
+def test_apply_batches(infile, tmp_path, batch_size):
+    """Row-wise actions applied in batches give the same result as in memory"""
+    def func(dat):
+        dat = filters.filter_rows_by_func(dat, func=np.var, op=operator.gt, value=4)
+        return transforms.log2p(dat)
+
+    outfile = str(tmp_path / 'output.feather')
+    chunked.apply_batches(infile, outfile, func, batch_size=batch_size)
+
+    res = pd.read_feather(outfile).set_index('gene')
+    assert_frame_equal(func(INPUT), res)
+
+
+@pytest.mark.parametrize("func", ['sum', 'min', 'max'])
+def test_apply_batches_combine(infile, tmp_path, func):
+    """Per-batch aggregation results are combined"""
+    outfile = str(tmp_path / 'output.feather')
+
+    chunked.apply_batches(infile, outfile, lambda dat: gene_sets.gene_set_apply(dat, GENE_SETS, func),
+                          combine=func, batch_size=3)
+
+    res = pd.read_feather(outfile).set_index('index')
+    res.index.name = None
+
+    assert_frame_equal(gene_sets.gene_set_apply(INPUT, GENE_SETS, func), res)
+
+
+def test_apply_batches_empty(infile, tmp_path):
+    """An exception is raised if no rows remain in any batch"""
+    def func(dat):
+        return filters.filter_rows_by_func(dat, func=np.sum, op=operator.gt, value=1000)
+
+    with pytest.raises(EmptyDataError):
+        chunked.apply_batches(infile, str(tmp_path / 'output.feather'), func, batch_size=3)
+
+
+def test_write_batches_schema(tmp_path):
+    """Integer columns are stored as floats so that batches with missing values can be written"""
+    outfile = str(tmp_path / 'output.feather')
+
+    batches = [pd.DataFrame({'x': [1, 2]}, index=['a', 'b']),
+               pd.DataFrame({'x': [np.nan, 4.0]}, index=['c', 'd'])]
+
+    chunked.write_batches(batches, outfile, policy={'float': 'float32', 'index': 'category'})
+
+    res = pd.read_feather(outfile).set_index('index')
+
+    assert list(res.index) == ['a', 'b', 'c', 'd']
+    assert res.x.dtype == np.float64
+    np.testing.assert_array_equal(res.x, [1, 2, np.nan, 4])
+
+
+def _add_dataset(actions, backend_type='chunked', on_unsupported='fallback'):
+    """Creates a SnakeWrangler with a single dataset and assigns its execution backend"""
+    defaults = {'filename': None, 'inline': True, 'local': False, 'reports': []}
+    actions = [dict(defaults, action_name=name, **params) for name, params in actions]
+
+    wrangler = SnakeWrangler('output', {})
+    wrangler.add_actions('dat', actions, name='dat', file_type='feather', path='dat.feather',
+                         compression=None)
+
+    backend = {'type': backend_type, 'batch_size': 10, 'size_threshold': '1GB',
+               'on_unsupported': on_unsupported}
+
+    wrangler.set_backend('dat', backend, ACTION_CFGS)
+
+    return {rule_id: rule.chunked for rule_id, rule in wrangler.datasets['dat'].items()}
+
+
+def test_set_backend():
+    """Test selection of rules that can be executed in batches"""
+    res = _add_dataset([
+        ('filter_rows_var_gt', {'value': 0, 'quantile': None}),
+        ('filter_rows_var_gt', {'value': None, 'quantile': 0.5}),
+        ('transform_zscore', {'axis': 1}),
+        ('transform_zscore', {'axis': 0}),
+        ('aggregate_gene_sets', {'func': 'sum'}),
+        ('aggregate_gene_sets', {'func': 'median'}),
+    ])
+
+    assert list(res.values()) == [{'combine': None}, {'combine': None}, None,
+                                  {'combine': None}, None, {'combine': 'sum'}, None]
+
+
+def test_set_backend_pandas():
+    """Rules are executed in memory for the pandas backend, or small datasets with auto"""
+    for backend_type in ['pandas', 'auto']:
+        res = _add_dataset([('transform_log2p', {})], backend_type)
+        assert list(res.values()) == [None, None]
+
+
+def test_set_backend_unsupported():
+    """Actions which require the entire dataset can be configured to result in an error"""
+    with pytest.raises(SystemExit):
+        _add_dataset([('transform_cpm', {})], on_unsupported='error')
@@ -0,0 +1,64 @@
+"""
+Snakes dtype policy tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+from snakes import dtypes, gene_sets
+
+#
+# input dataframe
+#
+#    x    y    z
+# a  1.0  2.0  3
+# b  5.0  10.0 15
+# c  2.0  0.0  0
+#
+INPUT = pd.DataFrame({'x': [1.0, 5.0, 2.0], 'y': [2.0, 10.0, 0.0], 'z': [3, 15, 0]},
+                     index=['a', 'b', 'c'])
+
+
+def test_apply_dtype_policy_float32():
+    """Test that only floating point columns are downcast"""
+    res = dtypes.apply_dtype_policy(INPUT, {'float': 'float32', 'index': None})
+
+    assert list(res.dtypes) == [np.float32, np.float32, np.int64]
+    assert res.index.dtype == object
+
+
+@pytest.mark.parametrize("index_dtype", ['category', 'string'])
+def test_apply_dtype_policy_index(index_dtype):
+    """Test casting of non-numeric indices"""
+    res = dtypes.apply_dtype_policy(INPUT, {'float': None, 'index': index_dtype})
+
+    assert res.index.dtype == index_dtype
+    assert list(res.index) == ['a', 'b', 'c']
+
+
+def test_apply_dtype_policy_numeric_index():
+    """Numeric indices are left unchanged"""
+    res = dtypes.apply_dtype_policy(INPUT.reset_index(drop=True), {'float': None, 'index': 'category'})
+
+    assert res.index.dtype == np.int64
+
+
+def test_promote():
+    """Test promotion of reduced-precision values to the accumulator dtype"""
+    df = INPUT.astype({'x': np.float32})
+
+    assert dtypes.promote(df['x']).dtype == np.float64
+    assert dtypes.promote(df['z']).dtype == np.int64
+    assert list(dtypes.promote(df).dtypes) == [np.float64, np.float64, np.int64]
+
+
+def test_gene_set_apply_preserves_float32():
+    """Gene set aggregation results use the storage dtype of the input dataset"""
+    df = INPUT[['x', 'y']].astype(np.float32)
+    gsets = {'set1': ['a', 'b'], 'set2': ['b', 'c']}
+
+    res = gene_sets.gene_set_apply(df, gsets, 'sum')
+
+    expected = pd.DataFrame({'x': [6.0, 7.0], 'y': [12.0, 10.0]},
+                            index=['set1', 'set2'], dtype=np.float32)
+    assert_frame_equal(expected, res)
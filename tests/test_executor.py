@@ -0,0 +1,159 @@
+"""
+Snakes in-process executor tests
+"""
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+from snakes import SnakefileRenderer
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Creates a small dataset, and changes to its directory"""
+    rng = np.random.default_rng(0)
+
+    dat = pd.DataFrame(rng.random((20, 4)) * 100, columns=['a', 'b', 'c', 'd'],
+                       index=pd.Index(['gene{}'.format(i) for i in range(20)], name='id'))
+    dat.to_csv(tmp_path / 'data.csv')
+
+    monkeypatch.chdir(tmp_path)
+
+    return tmp_path
+
+
+def _get_renderer(monkeypatch, tmp_path, actions, **kwargs):
+    """Returns a SnakefileRenderer for a pipeline with a single dataset"""
+    config = {
+        'name': 'test',
+        'version': '1.0',
+        'output_dir': 'output',
+        'rendering': {'bytecode_cache': None},
+        'datasets': [{'name': 'data', 'path': 'data.csv', 'actions': actions}],
+    }
+    config.update(kwargs)
+
+    path = tmp_path / 'config.yml'
+    path.write_text(yaml.safe_dump(config))
+
+    monkeypatch.setattr(sys, 'argv', ['snakes', '--config', str(path)])
+
+    return SnakefileRenderer()
+
+
+def _read(path):
+    """Reads a dataset written by a rule"""
+    dat = pd.read_feather(path)
+    return dat.set_index(dat.columns[0])
+
+
+ACTIONS = [
+    'transform_log2p',
+    {'branch': [{'filter_rows_var_gt': {'value': 0.5}}]},
+    {'transform_zscore': {'axis': 1}},
+]
+
+
+def test_execute(data_dir, monkeypatch):
+    """Final datasets are returned and written to disk; intermediate datasets are not written"""
+    renderer = _get_renderer(monkeypatch, data_dir, ACTIONS)
+
+    res = renderer.execute(cores=2)
+
+    assert sorted(res) == ['data_filter_rows_var_gt', 'data_transform_zscore']
+
+    for rule_id, dat in res.items():
+        outfile = 'output/1.0/data/data/{}.feather'.format(rule_id)
+        pd.testing.assert_frame_equal(dat, _read(outfile))
+
+    expected = pd.read_csv('data.csv', index_col=0).astype(np.float32)
+    expected = np.log2(expected + 1)
+    expected = expected.sub(expected.mean(axis=1), axis=0)
+    expected = expected.div(expected.std(axis=1, ddof=0), axis=0)
+
+    np.testing.assert_allclose(res['data_transform_zscore'].values, expected.values, rtol=1e-5)
+
+    assert (data_dir / 'output/1.0/data/data/data_filter_rows_var_gt.feather').exists()
+    assert not (data_dir / 'output/1.0/data/data/input.feather').exists()
+    assert not (data_dir / 'output/1.0/data/data/data_transform_log2p.feather').exists()
+
+
+def test_execute_write(data_dir, monkeypatch):
+    """Intermediate datasets are written when requested, as they would be by rules"""
+    renderer = _get_renderer(monkeypatch, data_dir, ACTIONS)
+
+    res = renderer.execute(targets=['data_transform_log2p'], write=['load_data'])
+
+    assert list(res) == ['data_transform_log2p']
+
+    # only the rules needed for the targets are run
+    assert not (data_dir / 'output/1.0/data/data/data_transform_zscore.feather').exists()
+
+    written = _read('output/1.0/data/data/input.feather')
+    written.reset_index().to_feather('copy.feather', compression='lz4')
+
+    assert ((data_dir / 'copy.feather').read_bytes() ==
+            (data_dir / 'output/1.0/data/data/input.feather').read_bytes())
+
+    with pytest.raises(SystemExit):
+        renderer.execute(targets=['unknown'])
+
+
+def test_execute_shards(data_dir, monkeypatch):
+    """Sharded actions produce the same datasets as unsharded actions"""
+    actions = ['transform_log2p', {'filter_rows_var_gt': {'value': 0.5}}]
+
+    expected = _get_renderer(monkeypatch, data_dir, actions).execute()
+
+    sharded = _get_renderer(monkeypatch, data_dir, actions, sharding={'num_shards': 3},
+                            backend={'type': 'chunked'}, output_dir='sharded')
+
+    res = sharded.execute(write='all')
+
+    assert list(res) == ['data_filter_rows_var_gt_gather']
+
+    pd.testing.assert_frame_equal(res['data_filter_rows_var_gt_gather'],
+                                  expected['data_filter_rows_var_gt'])
+
+    assert len(list((data_dir / 'sharded/1.0/data/data/shards').glob('*.feather'))) == 9
+
+
+# runs several independent datasets at once in a new process, where the globals of action code
+# have yet to be imported (see worker._get_globals)
+PARALLEL_CODE = '''
+import sys
+import yaml
+from snakes import SnakefileRenderer
+
+config = {
+    'name': 'test',
+    'version': '1.0',
+    'output_dir': 'output',
+    'rendering': {'bytecode_cache': None},
+    'datasets': [{'name': 'data{}'.format(i), 'path': 'data{}.csv'.format(i),
+                  'actions': ['transform_log2p']} for i in range(4)],
+}
+
+with open('config.yml', 'w') as fp:
+    yaml.safe_dump(config, fp)
+
+sys.argv = ['snakes', '--config', 'config.yml']
+
+print(sorted(SnakefileRenderer().execute(cores=4)))
+'''
+
+
+def test_execute_parallel(data_dir):
+    """Rules started at the same time in a new process are run successfully"""
+    for i in range(4):
+        (data_dir / 'data{}.csv'.format(i)).write_text((data_dir / 'data.csv').read_text())
+
+    res = subprocess.run([sys.executable, '-c', PARALLEL_CODE], cwd=str(data_dir),
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    assert res.returncode == 0, res.stderr.decode()
+
+    expected = ['data{}_transform_log2p'.format(i) for i in range(4)]
+    assert res.stdout.decode().splitlines()[-1] == str(expected)
@@ -124,3 +124,51 @@ def test_filter_rows_by_group_size():
     res = filters.filter_rows_by_group_func(DF_GROUPED, 'group', 'X', len, op=operator.ge, value=3)
     assert_frame_equal(expected, res)
 
+
+def test_filter_rows_by_gene_biotype():
+    """Tests filtering of genes by biotype, using the bundled gene annotations."""
+    df = pd.DataFrame({'x': [1, 2, 3]}, index=['TP53', 'MYH16', 'EGFR'])
+
+    res = filters.filter_rows_by_gene_biotype(df, ['protein_coding'], 'external_gene_name')
+    assert_frame_equal(df.loc[['TP53', 'EGFR']], res)
+
+    res = filters.filter_rows_by_gene_biotype(df, ['protein_coding'], 'symbol', exclude=True)
+    assert_frame_equal(df.loc[['MYH16']], res)
+
+    # entrez gene ids may be stored as integers
+    res = filters.filter_rows_by_gene_biotype(df.set_axis([7157, 0, 1956]), ['protein_coding'],
+                                              'entrezgene_id')
+    assert list(res.index) == [7157, 1956]
+
+    with pytest.raises(EmptyDataError):
+        filters.filter_rows_by_gene_biotype(df, ['protein_coding'], 'ensembl_gene_id')
+
+# 4. correlation matrix with two pairs of correlated variables (caret: 1, 2)
+COR_MAT = np.array([[1.0, 0.95, 0.2, 0.1],
+                    [0.95, 1.0, 0.3, 0.2],
+                    [0.2, 0.3, 1.0, 0.92],
+                    [0.1, 0.2, 0.92, 1.0]])
+
+@pytest.mark.parametrize('exact', [True, False])
+def test_find_correlation(exact):
+    """Tests selection of correlated variables to remove, as in caret's findCorrelation."""
+    assert list(filters.find_correlation(COR_MAT, cutoff=0.9, exact=exact)) == [1, 2]
+    assert list(filters.find_correlation(COR_MAT, cutoff=0.93, exact=exact)) == [1]
+    assert list(filters.find_correlation(COR_MAT, cutoff=0.96, exact=exact)) == []
+
+def test_filter_rows_by_max_correlation():
+    """Tests removal of correlated rows."""
+    df = pd.DataFrame([[1, 2, 3, 4], [2, 4, 6, 9], [4, 1, 3, 2], [1, 1, 0, 2.5]],
+                      index=['a', 'b', 'c', 'd'])
+
+    res = filters.filter_rows_by_max_correlation(df, cutoff=0.9)
+    assert list(res.index) == ['a', 'c', 'd']
+
+    # missing values are handled pairwise, by default
+    df.iloc[0, 3] = np.nan
+    res = filters.filter_rows_by_max_correlation(df, cutoff=0.85)
+    assert list(res.index) == ['b', 'c', 'd']
+
+    # "complete.obs" only uses columns with no missing values
+    res = filters.filter_rows_by_max_correlation(df, cutoff=0.85, use='complete.obs')
+    assert list(res.index) == ['c', 'd']
@@ -46,3 +46,16 @@ def test_gene_set_apply(func, expected):
     """Test gene set aggregation"""
     assert_frame_equal(pd.DataFrame(expected, index=['x', 'y']),
                        gene_sets.gene_set_apply(INPUT, GENE_SETS, func))
+
+
+def test_map_gmt_ids(tmp_path):
+    """Test mapping of gene set gene identifiers"""
+    infile = tmp_path / 'gene_sets.gmt'
+    outfile = tmp_path / 'gene_sets_mapped.gmt'
+
+    infile.write_text('set1\tdesc1\tTP53\tEGFR\nset2\tdesc2\tBRCA1\tNOT_A_GENE\n')
+
+    gene_sets.map_gmt_ids(str(infile), str(outfile), 'external_gene_name', 'ensembl_gene_id')
+
+    assert outfile.read_text() == ('set1\tdesc1\tENSG00000141510\tENSG00000146648\n'
+                                   'set2\tdesc2\tENSG00000012048\n')
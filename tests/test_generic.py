@@ -0,0 +1,63 @@
+"""
+Snakes generic rule tests
+"""
+import json
+from types import SimpleNamespace
+import pytest
+from jinja2 import Template
+from snakes.generic import JobTable, render_generic_code
+from snakes.rules import ActionRule
+
+
+def _render(template):
+    """Returns a function rendering a template for a rule"""
+    return lambda action: Template(template).render(action=action)
+
+
+def _rule(**params):
+    """Creates an action rule with the specified parameters"""
+    return ActionRule('a_filter', None, 'in.feather', 'out.feather', template='filter.snakefile',
+                      **params)
+
+
+def test_render_generic_code():
+    """Parameters rendered as values are looked up at runtime"""
+    render = _render("value={{ action.params['value'] }}, names={{ action.params.names }}")
+    rule = _rule(value=0.5, names=['a', 'b'], reports=[])
+
+    code, params = render_generic_code(render, rule)
+
+    assert code == "value=params['value'], names=params['names']"
+    assert params == {'value': 0.5, 'names': ['a', 'b']}
+
+    # code is shared by rules with different parameter values
+    assert render_generic_code(render, _rule(value=2, names=[], reports=[]))[0] == code
+
+
+@pytest.mark.parametrize('template', [
+    "col='{{ action.params['col'] }}'",
+    "{% if action.params['col'] %}drop{% endif %}",
+    "{{ 'x' if action.params['col'] == 'a' else 'y' }}",
+    "args={{ action.params }}",
+])
+def test_render_generic_code_literal(template):
+    """Parameters used in conditionals or string literals are rendered into the code"""
+    rule = _rule(col='a')
+
+    assert render_generic_code(_render(template), rule) == (_render(template)(rule), {})
+
+
+def test_job_table(tmp_path):
+    """Jobs are looked up by generic rule name and output wildcards"""
+    path = tmp_path / 'Snakefile.jobs.json'
+
+    with open(path, 'w') as fp:
+        json.dump({'generic_filter': {'a/a_filter': {'rule': 'a_filter'}}}, fp)
+
+    jobs = JobTable(str(path))
+    wildcards = SimpleNamespace(dataset='a', step='a_filter')
+
+    assert jobs.get('generic_filter', wildcards) == {'rule': 'a_filter'}
+
+    with pytest.raises(KeyError):
+        jobs.get('generic_transform', wildcards)
@@ -0,0 +1,44 @@
+"""
+Snakes import time tests
+"""
+import subprocess
+import sys
+import pytest
+
+# maximum cumulative time (seconds) to import the snakes renderer; without heavy dependencies,
+# this is typically ~0.2s
+IMPORT_TIME_BUDGET = 1.0
+
+# modules which should only be loaded once they are needed
+HEAVY_MODULES = ['jinja2', 'numpy', 'pandas', 'pkg_resources', 'pyarrow', 'scipy', 'sklearn']
+
+
+def _run(code):
+    """Runs python code in a new interpreter, and returns its output and import times"""
+    res = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                         capture_output=True, text=True, check=True)
+    return res.stdout, res.stderr
+
+
+def test_import_time():
+    """The renderer is imported within the import time budget"""
+    _, stderr = _run('from snakes import SnakefileRenderer')
+
+    # "import time: <self us> | <cumulative us> | <module>"
+    times = {}
+
+    for line in stderr.splitlines():
+        fields = [x.strip() for x in line.replace('import time:', '').split('|')]
+
+        if len(fields) == 3 and fields[1].isdigit():
+            times[fields[2]] = int(fields[1]) / 1e6
+
+    assert times['snakes'] + times['snakes.renderer'] < IMPORT_TIME_BUDGET
+
+
+@pytest.mark.parametrize('module', ['snakes', 'snakes.renderer'])
+def test_heavy_modules(module):
+    """Heavy dependencies are not imported along with the renderer"""
+    stdout, _ = _run('import sys, {}; print(" ".join(sys.modules))'.format(module))
+
+    assert set(stdout.split()).isdisjoint(HEAVY_MODULES)
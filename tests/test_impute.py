@@ -0,0 +1,54 @@
+"""
+Snakes imputation tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+from snakes.impute import impute_knn
+
+#
+# dataframe with missing values
+#
+#      a    b    c
+# 0  1.0  1.0  2.0
+# 1  2.0  2.0  4.0
+# 2  NaN  3.0  6.0
+# 3  4.0  NaN  8.0
+# 4  5.0  5.0  NaN
+#
+DF_MISSING = pd.DataFrame({'a': [1, 2, np.nan, 4, 5.0],
+                           'b': [1, 2, 3, np.nan, 5.0],
+                           'c': [2, 4, 6, 8, np.nan]})
+
+
+def test_impute_knn():
+    """Missing values are replaced with the median of the nearest rows (Gower distance)"""
+    res = impute_knn(DF_MISSING, k=2)
+
+    # (2, a): nearest rows are 1 (distance 7/24) and 3 (1/3)
+    # (3, b): nearest rows are 4 (distance 1/4) and 2 (7/24, using the imputed value of a)
+    # (4, c): nearest rows are 3 (distance 1/4, using the imputed value of b) and 2 (1/2)
+    expected = DF_MISSING.fillna({'a': 3.0, 'b': 4.0, 'c': 7.0})
+
+    assert_frame_equal(res, expected)
+
+
+def test_impute_knn_original_dist():
+    """Imputed values can be excluded from distance calculations"""
+    res = impute_knn(DF_MISSING, k=2, use_imputed_dist=False)
+
+    # (4, c): nearest rows are 3 (distance 1/4, using only column a) and 2 (1/2)
+    assert res.loc[4, 'c'] == 7.0
+
+    res = impute_knn(DF_MISSING, k=1, agg_func='mean', use_imputed_dist=False)
+
+    assert res.loc[2, 'a'] == 2.0
+
+
+def test_impute_knn_dtype():
+    """Reduced-precision datasets are imputed at full precision and cast back"""
+    res = impute_knn(DF_MISSING.astype(np.float32), k=2)
+
+    assert (res.dtypes == np.float32).all()
+    assert not res.isna().any().any()
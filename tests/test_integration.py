@@ -0,0 +1,114 @@
+"""
+Snakes data integration tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from snakes.integration import cca_permute, cross_cor, get_shared_rows, sparse_cca
+
+X = pd.DataFrame({'a': [1.0, 2, 3, 4], 'b': [4.0, 3, 2, 1]}, index=['g1', 'g2', 'g3', 'g4'])
+Y = pd.DataFrame({'c': [2.0, 4, 6, 8, 10]}, index=['g1', 'g2', 'g3', 'g4', 'g5'])
+
+
+def test_cross_cor():
+    """Columns are correlated using shared rows"""
+    with pytest.warns(UserWarning):
+        res = cross_cor(X, Y, axis=0)
+
+    assert res.shape == (1, 2)
+    assert np.allclose(res.loc['c'], [1, -1])
+
+
+def test_cross_cor_no_shared_indices():
+    """An exception is raised if the datasets have no indices in common"""
+    with pytest.raises(Exception):
+        cross_cor(X, Y.set_axis(['x1', 'x2', 'x3', 'x4', 'x5']), axis=0)
+
+
+def test_get_shared_rows():
+    """Datasets are limited to their shared rows, in the order of the second dataset"""
+    A = pd.DataFrame({'a': [1.0, 2, 3]}, index=['s1', 's2', 's3'])
+    B = pd.DataFrame({'b': [4.0, 5, 6]}, index=['s4', 's3', 's1'])
+
+    with pytest.warns(UserWarning):
+        A, B = get_shared_rows(A, B)
+
+    assert A.index.tolist() == ['s3', 's1']
+    assert B.index.tolist() == ['s3', 's1']
+    assert A['a'].tolist() == [3.0, 1.0]
+
+    with pytest.raises(Exception):
+        get_shared_rows(A, B.set_axis(['x1', 'x2']))
+
+
+def test_sparse_cca():
+    """Without penalties, canonical vectors are the leading singular vectors of X'Y"""
+    rng = np.random.default_rng(1)
+
+    A = pd.DataFrame(rng.normal(size=(20, 6)))
+    B = pd.DataFrame(rng.normal(size=(20, 4)), columns=['b{}'.format(i) for i in range(4)])
+
+    res = sparse_cca(A, B, penaltyx=1, penaltyz=1, K=2)
+
+    # standardized datasets
+    A = (A - A.mean()) / A.std()
+    B = (B - B.mean()) / B.std()
+
+    u, d, vt = np.linalg.svd(A.T.to_numpy() @ B.to_numpy())
+
+    assert list(res['v'].index) == list(B.columns)
+    assert list(res['u'].columns) == ['cv1', 'cv2']
+    assert np.allclose(res['d'], d[:2])
+
+    # canonical vectors are unique up to sign
+    assert np.allclose(np.abs(res['u']), np.abs(u[:, :2]))
+    assert np.allclose(np.abs(res['v']), np.abs(vt[:2].T))
+
+
+def test_sparse_cca_penalized():
+    """Penalized canonical vectors are sparse unit vectors within the L1 bound"""
+    rng = np.random.default_rng(1)
+
+    # two related datasets, with a shared signal in the first two features of each
+    signal = rng.normal(size=(50, 1))
+
+    A = pd.DataFrame(np.hstack([signal, signal, rng.normal(size=(50, 8))]) +
+                     rng.normal(scale=0.1, size=(50, 10)))
+    B = pd.DataFrame(np.hstack([signal, -signal, rng.normal(size=(50, 8))]) +
+                     rng.normal(scale=0.1, size=(50, 10)))
+
+    res = sparse_cca(A, B, penaltyx=0.5, penaltyz=0.5)
+
+    for vec in [res['u']['cv1'], res['v']['cv1']]:
+        assert np.isclose(np.linalg.norm(vec), 1)
+        assert np.abs(vec).sum() <= 0.5 * np.sqrt(10) + 1e-4
+        assert set(vec.abs().nlargest(2).index) == {0, 1}
+        assert (vec == 0).sum() > 0
+
+    assert res['cors'][0] > 0.9
+
+
+def test_cca_permute():
+    """Permutation tests detect a shared signal, with the same results in parallel"""
+    rng = np.random.default_rng(1)
+
+    signal = rng.normal(size=(30, 1))
+
+    A = pd.DataFrame(np.hstack([signal, rng.normal(size=(30, 20))]))
+    B = pd.DataFrame(np.hstack([-signal, rng.normal(size=(30, 10))]))
+
+    res = cca_permute(A, B, penaltyxs=[0.1, 0.5], penaltyzs=0.3, nperms=8)
+
+    assert list(res['penaltyx']) == [0.1, 0.5]
+    assert list(res['penaltyz']) == [0.3, 0.3]
+    assert (res['pval'] == 0).all()
+    assert (res['cor'] > 0.9).all()
+
+    # permutations are farmed out to worker processes, which read the datasets from shared
+    # memory
+    parallel = cca_permute(A, B, penaltyxs=[0.1, 0.5], penaltyzs=0.3, nperms=8, processes=2)
+
+    pd.testing.assert_frame_equal(res, parallel)
+
+    with pytest.raises(ValueError):
+        cca_permute(A, B, penaltyxs=[0.1, 0.5], penaltyzs=[0.1, 0.3, 0.5])
@@ -0,0 +1,117 @@
+"""
+Snakes data loading tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.errors import EmptyDataError
+from pandas.testing import assert_frame_equal
+from snakes import filters, loaders
+from snakes.wrangler import SnakeWrangler
+
+#
+# input dataframe
+#
+#     tissue  batch  x_a  x_b  y_a
+# s1  liver   1.0    1.0  2.0  3.0
+# s2  brain   2.0    4.0  5.0  6.0
+# s3  liver   NaN    7.0  8.0  9.0
+# s4  kidney  1.0    0.0  1.0  2.0
+#
+INPUT = pd.DataFrame({'tissue': ['liver', 'brain', 'liver', 'kidney'],
+                      'batch': [1.0, 2.0, np.nan, 1.0],
+                      'x_a': [1.0, 4.0, 7.0, 0.0],
+                      'x_b': [2.0, 5.0, 8.0, 1.0],
+                      'y_a': [3.0, 6.0, 9.0, 2.0]},
+                     index=pd.Index(['s1', 's2', 's3', 's4'], name='sample'))
+
+OPS = [
+    # projection only
+    ([('filter_cols_name_in', {'names': ['y_a', 'x_a', 'sample']})],
+     lambda df: df[['y_a', 'x_a']]),
+    ([('filter_cols_name_not_in', {'names': ['x_b', 'foo'], 'errors': 'ignore'})],
+     lambda df: df.drop(columns=['x_b'])),
+    ([('filter_cols_name_startswith', {'prefix': 'x_', 'drop': True})],
+     lambda df: df.drop(columns=['x_a', 'x_b'])),
+    ([('filter_cols_name_endswith', {'suffix': '_a', 'drop': False})],
+     lambda df: df[['x_a', 'y_a']]),
+    # predicates only
+    ([('filter_rows_col_in', {'col': 'tissue', 'values': ['liver', 'kidney']})],
+     lambda df: filters.filter_rows_col_val_in(df, 'tissue', ['liver', 'kidney'])),
+    ([('filter_rows_col_not_in', {'col': 'batch', 'values': [2]})],
+     lambda df: filters.filter_rows_col_val_not_in(df, 'batch', [2])),
+    ([('filter_rows_col_in', {'col': 'batch', 'values': [1.5, 2]})],
+     lambda df: filters.filter_rows_col_val_in(df, 'batch', [1.5, 2])),
+    ([('filter_rows_col_in', {'col': 'tissue', 'values': [1, 2]}),
+      ('filter_rows_col_not_na', {'col': 'batch'})],
+     None),
+    # predicate on a column which is later dropped
+    ([('filter_rows_col_not_na', {'col': 'batch'}),
+      ('filter_rows_col_in', {'col': 'tissue', 'values': ['liver']}),
+      ('filter_cols_name_startswith', {'prefix': 'x_', 'drop': False})],
+     lambda df: df[df.batch.notnull() & (df.tissue == 'liver')][['x_a', 'x_b']]),
+]
+
+
+@pytest.fixture(params=['feather', 'csv'])
+def read_input(request, tmp_path):
+    """Writes the input dataset to disk and returns a function to load it"""
+    if request.param == 'feather':
+        infile = str(tmp_path / 'input.feather')
+        INPUT.reset_index().to_feather(infile)
+
+        return lambda ops: loaders.read_feather(infile, ops=ops)
+    else:
+        infile = str(tmp_path / 'input.tsv')
+        INPUT.to_csv(infile, sep='\t')
+
+        return lambda ops: loaders.read_csv(infile, sep='\t', index_col=0, ops=ops)
+
+
+@pytest.mark.parametrize("ops,func", OPS)
+def test_pushdown(read_input, ops, func, monkeypatch):
+    """Filters applied while loading give the same result as filtering after loading"""
+    # read csv files in multiple chunks
+    monkeypatch.setattr(loaders, 'BATCH_SIZE', 3)
+
+    if func is None:
+        with pytest.raises(EmptyDataError):
+            read_input(ops)
+    else:
+        assert_frame_equal(func(read_input(None)), read_input(ops))
+
+
+def test_pushdown_missing_column(read_input):
+    """Filters referring to missing columns raise an exception"""
+    with pytest.raises(KeyError):
+        read_input([('filter_cols_name_in', {'names': ['foo']})])
+
+    with pytest.raises(KeyError):
+        read_input([('filter_cols_name_in', {'names': ['x_a']}),
+                    ('filter_rows_col_in', {'col': 'tissue', 'values': ['liver']})])
+
+
+def test_wrangler_pushdown():
+    """Leading column/row filters are moved into the load rule"""
+    def action(name, **params):
+        return dict({'action_name': name, 'filename': None, 'inline': True, 'local': False,
+                     'reports': []}, **params)
+
+    actions = [
+        action('filter_cols_name_in', names=['x_a', 'x_b']),
+        action('filter_rows_col_not_na', col='x_a'),
+        action('transform_log2p'),
+        action('filter_cols_name_not_in', names=['x_b']),
+    ]
+
+    wrangler = SnakeWrangler('output', {})
+    wrangler.add_actions('dat', actions, name='dat', file_type='feather', path='dat.feather',
+                         compression=None, pushdown=True)
+
+    rules = wrangler.datasets['dat']
+
+    assert list(rules) == ['load_dat', 'dat_transform_log2p', 'dat_filter_cols_name_not_in']
+    assert rules['load_dat'].params['pushdown'] == [
+        ('filter_cols_name_in', {'names': ['x_a', 'x_b']}),
+        ('filter_rows_col_not_na', {'col': 'x_a'}),
+    ]
@@ -0,0 +1,87 @@
+"""
+Snakes metadata profiling tests
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from snakes import metadata
+from snakes.metadata import MetadataProfiles, count_distinct, estimate_distinct
+
+
+@pytest.fixture
+def metadata_file(tmp_path):
+    """Creates a sample metadata file"""
+    mdat = pd.DataFrame({
+        'sample_id': ['s{}'.format(i) for i in range(6)],
+        'batch': [1, 1, 2, 2, 3, np.nan],
+        'sex': ['M', 'F', 'M', 'F', 'M', 'F'],
+        'tissue': ['blood'] * 6,
+    })
+
+    path = str(tmp_path / 'sample_metadata.csv')
+    mdat.to_csv(path, index=False)
+
+    return path
+
+
+def test_count_distinct(metadata_file):
+    """Distinct non-missing values are counted for each field"""
+    assert count_distinct(metadata_file) == {'batch': 3, 'sex': 2, 'tissue': 1}
+
+
+@pytest.mark.parametrize('ext', ['.csv', '.tsv', '.feather'])
+def test_estimate_distinct(tmp_path, ext):
+    """Streaming estimates are exact for small cardinalities, and approximate for large ones"""
+    rng = np.random.default_rng(1)
+    num_rows = 50000
+
+    mdat = pd.DataFrame({
+        'sample_id': np.arange(num_rows),
+        'batch': rng.integers(0, 10, num_rows),
+        'group': rng.choice(['a', 'b', None], num_rows),
+        'barcode': ['bc{}'.format(x) for x in rng.permutation(num_rows)],
+    })
+
+    path = str(tmp_path / ('metadata' + ext))
+
+    if ext == '.feather':
+        mdat.to_feather(path)
+    else:
+        mdat.to_csv(path, sep='\t' if ext == '.tsv' else ',', index=False)
+
+    res = estimate_distinct(path, batch_size=7000)
+
+    assert list(res) == ['batch', 'group', 'barcode']
+    assert res['batch'] == 10
+    assert res['group'] == 2
+    assert res['barcode'] == pytest.approx(num_rows, rel=0.1)
+
+
+def test_metadata_profiles(metadata_file, tmp_path, monkeypatch):
+    """Profiles are cached on disk until the metadata file changes"""
+    cache_dir = str(tmp_path / 'cache')
+
+    assert MetadataProfiles(cache_dir).get_cardinalities(metadata_file)['sex'] == 2
+    assert len(os.listdir(cache_dir)) == 1
+
+    # cached profiles are used by subsequent renders
+    def fail(path):
+        raise AssertionError('metadata file loaded')
+
+    monkeypatch.setattr(metadata, 'load_data', fail)
+
+    assert MetadataProfiles(cache_dir).get_cardinalities(metadata_file)['sex'] == 2
+
+    monkeypatch.undo()
+
+    # modified files are profiled again
+    with open(metadata_file, 'a') as fp:
+        fp.write('s6,4,X,blood\n')
+
+    assert MetadataProfiles(cache_dir).get_cardinalities(metadata_file)['sex'] == 3
+
+    # files larger than the exact size limit are profiled using estimates
+    profiles = MetadataProfiles(None, exact_max_size=10)
+
+    assert profiles.get_cardinalities(metadata_file) == {'batch': 4, 'sex': 3, 'tissue': 1}
@@ -0,0 +1,89 @@
+"""
+Snakes pivot tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+from snakes import pivot
+
+#
+# long-format input dataframe
+#
+#      drug  ac50
+# B    d2    1.0
+# A    d1    2.0
+# A    d2    3.0
+# C    d1    4.0
+# B    d1    NaN
+#
+INPUT = pd.DataFrame({'drug': ['d2', 'd1', 'd2', 'd1', 'd1'],
+                      'ac50': [1.0, 2.0, 3.0, 4.0, np.nan]},
+                     index=pd.Index(['B', 'A', 'A', 'C', 'B'], name='cell_line'))
+
+# input with duplicate cell line / drug pairs
+DUPLICATED = pd.concat([INPUT, pd.DataFrame({'drug': ['d2', 'd2'], 'ac50': [5.0, 7.0]},
+                                            index=pd.Index(['A', 'A'], name='cell_line'))])
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 100])
+def test_pivot_wide(batch_size):
+    """Test pivoting using the dataset index as row names"""
+    expected = INPUT.pivot(columns='drug', values='ac50')
+    res = pivot.pivot_wide(INPUT, columns='drug', values='ac50', batch_size=batch_size)
+    assert_frame_equal(expected, res)
+
+
+def test_pivot_wide_index_column():
+    """Test pivoting using a column as row names"""
+    df = INPUT.reset_index()
+    expected = df.pivot(index='cell_line', columns='drug', values='ac50')
+    res = pivot.pivot_wide(df, index='cell_line', columns='drug', values='ac50')
+    assert_frame_equal(expected, res)
+
+
+def test_pivot_wide_duplicates():
+    """Duplicate entries raise an exception if no reducer is specified"""
+    with pytest.raises(ValueError, match="index 'A' and column 'd2'"):
+        pivot.pivot_wide(DUPLICATED, columns='drug', values='ac50', batch_size=2)
+
+
+@pytest.mark.parametrize("reducer", ['sum', 'mean', 'min', 'max', 'first', 'last'])
+@pytest.mark.parametrize("sparse", [False, True])
+def test_pivot_wide_reducer(reducer, sparse):
+    """Test combining of duplicate entries"""
+    # entries with only missing values remain missing after reduction
+    if reducer == 'sum':
+        aggfunc = lambda x: x.sum(min_count=1)
+    else:
+        aggfunc = reducer
+
+    expected = DUPLICATED.reset_index().pivot_table(index='cell_line', columns='drug',
+                                                    values='ac50', aggfunc=aggfunc)
+    res = pivot.pivot_wide(DUPLICATED, columns='drug', values='ac50', reducer=reducer,
+                           sparse=sparse, batch_size=3)
+
+    if sparse:
+        # missing entries are treated as zeros in sparse output
+        expected = expected.fillna(0)
+        res = res.sparse.to_dense()
+
+    assert_frame_equal(expected, res, check_names=False)
+
+
+def test_pivot_wide_float32():
+    """Single-precision values keep their dtype"""
+    res = pivot.pivot_wide(INPUT.astype({'ac50': np.float32}), columns='drug', values='ac50')
+    assert (res.dtypes == np.float32).all()
+
+
+@pytest.mark.parametrize("df,reducer", [(INPUT, None), (DUPLICATED, 'mean')])
+def test_pivot_wide_feather(tmp_path, df, reducer):
+    """Test streaming pivot from a feather file"""
+    infile = str(tmp_path / 'long.feather')
+    df.reset_index().to_feather(infile)
+
+    expected = pivot.pivot_wide(df, columns='drug', values='ac50', reducer=reducer)
+    res = pivot.pivot_wide_feather(infile, columns='drug', values='ac50', reducer=reducer,
+                                   batch_size=2)
+    assert_frame_equal(expected, res)
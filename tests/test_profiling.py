@@ -0,0 +1,61 @@
+"""
+Snakes pipeline profiling tests
+"""
+import os
+import numpy as np
+import pandas as pd
+from snakes import profiling
+
+
+def _add_run(output_dir, rule_id, action_name, num_rows, wall_time):
+    """Records a rule with a benchmark and a profile log entry"""
+    infile = str(output_dir / (rule_id + '.in.feather'))
+    outfile = str(output_dir / (rule_id + '.feather'))
+
+    pd.DataFrame(np.zeros((num_rows, 3)), columns=['a', 'b', 'c']).reset_index().to_feather(infile)
+    pd.DataFrame(np.zeros((num_rows, 2)), columns=['a', 'b']).reset_index().to_feather(outfile)
+
+    log_file = str(output_dir / profiling.PROFILE_LOG)
+    profiling.record(log_file, rule_id, 'dat', action_name, [infile], [outfile],
+                     profiling.start())
+
+    benchmark_dir = output_dir / profiling.BENCHMARK_DIR / 'dat' / action_name
+    os.makedirs(str(benchmark_dir), exist_ok=True)
+
+    pd.DataFrame({'s': [wall_time], 'max_rss': [100.0], 'io_in': [1.0], 'io_out': [2.0],
+                  'cpu_time': [wall_time]}).to_csv(str(benchmark_dir / (rule_id + '.tsv')),
+                                                   sep='\t', index=False)
+
+
+def test_load_profile(tmp_path):
+    """Benchmarks and profile log records are combined"""
+    _add_run(tmp_path, 'dat_transform_log2p', 'transform_log2p', 10, 1.5)
+    _add_run(tmp_path, 'dat_transform_log2p_2', 'transform_log2p', 20, 0.5)
+    _add_run(tmp_path, 'dat_filter_rows_var_gt', 'filter_rows_var_gt', 5, 3)
+
+    profile = profiling.load_profile(str(tmp_path)).set_index('rule')
+
+    assert profile.loc['dat_transform_log2p', 'wall_time'] == 1.5
+    assert profile.loc['dat_transform_log2p_2', 'input_rows'] == 20
+    assert profile.loc['dat_transform_log2p_2', 'input_cols'] == 3
+    assert profile.loc['dat_transform_log2p_2', 'output_cols'] == 2
+
+    summary = profiling.summarize(profile.reset_index(), by='action')
+
+    assert list(summary.index) == ['filter_rows_var_gt', 'transform_log2p']
+    assert summary.loc['transform_log2p', 'jobs'] == 2
+    assert summary.loc['transform_log2p', 'wall_time'] == 2
+    assert summary.loc['transform_log2p', 'input_rows'] == 20
+
+
+def test_compare(tmp_path):
+    """Profiles are compared across pipeline versions"""
+    for version, wall_time in [('1.0', 2.0), ('1.1', 1.0)]:
+        os.makedirs(str(tmp_path / version))
+        _add_run(tmp_path / version, 'dat_transform_log2p', 'transform_log2p', 10, wall_time)
+
+    profiles = {x: profiling.load_profile(str(tmp_path / x)) for x in ['1.0', '1.1']}
+
+    res = profiling.compare(profiles)
+
+    assert res.loc['transform_log2p'].tolist() == [2.0, 1.0, 0.5]
@@ -0,0 +1,173 @@
+"""
+Snakes renderer tests
+"""
+import subprocess
+import sys
+import pytest
+import yaml
+from snakes import SnakefileRenderer
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    """Creates a minimal pipeline config, and changes to its directory"""
+    (tmp_path / 'data.csv').write_text('id,a,b\nx,1,2\ny,3,4\n')
+
+    config = {
+        'name': 'test',
+        'version': '1.0',
+        'output_dir': 'output',
+        'rendering': {'bytecode_cache': str(tmp_path / 'templates')},
+        'datasets': [{'name': 'data', 'path': 'data.csv', 'actions': ['transform_log2p']}],
+    }
+
+    path = tmp_path / 'config.yml'
+    path.write_text(yaml.safe_dump(config))
+
+    monkeypatch.chdir(tmp_path)
+
+    return path
+
+
+def _render(monkeypatch, *args):
+    """Renders the Snakefile for a config, using the specified command-line arguments"""
+    monkeypatch.setattr(sys, 'argv', ['snakes'] + list(args))
+    SnakefileRenderer().render()
+
+
+def test_render_skip_unchanged(config_file, monkeypatch, tmp_path):
+    """The Snakefile is only rewritten if something affecting it has changed"""
+    snakefile = tmp_path / 'Snakefile'
+
+    _render(monkeypatch, '--config', str(config_file))
+
+    assert 'Fingerprint: ' in snakefile.read_text()
+    assert len(list((tmp_path / 'templates').iterdir())) > 0
+
+    # unchanged config
+    snakefile.write_text(snakefile.read_text() + '# unchanged\n')
+    _render(monkeypatch, '--config', str(config_file))
+
+    assert snakefile.read_text().endswith('# unchanged\n')
+
+    # forced rendering
+    _render(monkeypatch, '--config', str(config_file), '--force')
+
+    assert not snakefile.read_text().endswith('# unchanged\n')
+
+    # modified input data
+    snakefile.write_text(snakefile.read_text() + '# unchanged\n')
+    (tmp_path / 'data.csv').write_text('id,a,b\nx,1,2\ny,3,4\nz,5,6\n')
+
+    _render(monkeypatch, '--config', str(config_file))
+
+    assert not snakefile.read_text().endswith('# unchanged\n')
+
+    # modified config
+    snakefile.write_text(snakefile.read_text() + '# unchanged\n')
+    config_file.write_text(config_file.read_text().replace('transform_log2p', 'transform_zscore'))
+
+    _render(monkeypatch, '--config', str(config_file))
+
+    assert 'transform_zscore' in snakefile.read_text()
+
+
+def test_render_skip_unchanged_execution(config_file, monkeypatch, tmp_path):
+    """Snakemake-only execution settings do not cause the Snakefile to be rewritten"""
+    snakefile = tmp_path / 'Snakefile'
+
+    _render(monkeypatch, '--config', str(config_file), '--cores', '1')
+
+    snakefile.write_text(snakefile.read_text() + '# unchanged\n')
+    _render(monkeypatch, '--config', str(config_file), '--cores', '4', '--keep-going')
+
+    assert snakefile.read_text().endswith('# unchanged\n')
+
+    # grouping of dataset rules is part of the Snakefile
+    config = yaml.safe_load(config_file.read_text())
+    config['execution'] = {'group_datasets': True}
+    config_file.write_text(yaml.safe_dump(config))
+
+    _render(monkeypatch, '--config', str(config_file))
+
+    assert not snakefile.read_text().endswith('# unchanged\n')
+
+
+def _get_renderer(monkeypatch, config_file, *args, **execution):
+    """Returns a SnakefileRenderer for a config, with the specified execution settings"""
+    config = yaml.safe_load(config_file.read_text())
+    config['execution'] = execution
+    config_file.write_text(yaml.safe_dump(config))
+
+    monkeypatch.setattr(sys, 'argv', ['snakes', '--config', str(config_file)] + list(args))
+
+    return SnakefileRenderer()
+
+
+def test_snakemake_args(config_file, monkeypatch):
+    """Snakemake arguments are built from the execution settings"""
+    renderer = _get_renderer(monkeypatch, config_file)
+
+    assert renderer._get_snakemake_args() == ['--snakefile', 'Snakefile', '--cores', 'all']
+
+    renderer = _get_renderer(monkeypatch, config_file, cores=4, resources={'mem_mb': 16000},
+                             profile='cluster', keep_going=True, rerun_incomplete=True,
+                             group_components={'rna': 10})
+
+    assert renderer._get_snakemake_args() == [
+        '--snakefile', 'Snakefile', '--cores', '4', '--resources', 'mem_mb=16000',
+        '--profile', 'cluster', '--keep-going', '--rerun-incomplete',
+        '--group-components', 'rna=10'
+    ]
+
+
+def test_snakemake_args_command_line(config_file, monkeypatch):
+    """Command-line execution options override the execution settings"""
+    renderer = _get_renderer(monkeypatch, config_file, '-j', '8', '--resources', 'mem_mb=32000',
+                             'gpu=1', '--keep-going', '--group-components', 'a=2', 'b=3',
+                             cores=4, resources={'mem_mb': 16000}, profile='cluster')
+
+    assert renderer.config['execution']['resources'] == {'mem_mb': 32000, 'gpu': 1}
+    assert renderer.config['execution']['group_components'] == {'a': 2, 'b': 3}
+
+    assert renderer._get_snakemake_args() == [
+        '--snakefile', 'Snakefile', '--cores', '8', '--resources', 'mem_mb=32000', 'gpu=1',
+        '--profile', 'cluster', '--keep-going', '--group-components', 'a=2', 'b=3'
+    ]
+
+
+@pytest.mark.parametrize('value', ['mem_mb', 'mem_mb=', 'mem_mb=1.5', 'mem_mb=-1', '=100',
+                                   'mem_mb=16GB'])
+def test_parse_key_value_args_invalid(value):
+    """Malformed NAME=INT values are reported as errors"""
+    with pytest.raises(SystemExit, match='Invalid --group-components value'):
+        SnakefileRenderer._parse_key_value_args('group_components', [value])
+
+
+def test_parse_key_value_args_command_line(config_file, monkeypatch):
+    """Malformed command-line resource limits are reported as errors"""
+    with pytest.raises(SystemExit, match="Invalid --resources value specified: 'mem_mb:100'"):
+        _get_renderer(monkeypatch, config_file, '--resources', 'mem_mb:100')
+
+
+def test_run(config_file, monkeypatch):
+    """Snakemake is run with the execution settings, and failures are reported"""
+    calls = []
+    returncode = 0
+
+    def run(cmd):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, returncode)
+
+    monkeypatch.setattr(subprocess, 'run', run)
+
+    renderer = _get_renderer(monkeypatch, config_file, '--run', '--cores', '2')
+    renderer.render()
+
+    assert calls == [[sys.executable, '-m', 'snakemake', '--snakefile', 'Snakefile',
+                      '--cores', '2']]
+
+    returncode = 1
+
+    with pytest.raises(SystemExit, match='exit status 1'):
+        renderer.run()
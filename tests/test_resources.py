@@ -0,0 +1,57 @@
+"""
+Snakes rule resource tests
+"""
+import os
+import numpy as np
+import pandas as pd
+from snakes.resources import estimate_mem_mb, get_data_size, limit_threads
+from snakes.wrangler import SnakeWrangler
+
+DEFAULTS = {'threads': 1, 'mem_mb': 1000, 'mem_scale': 2}
+
+ACTION_CFGS = {
+    'project_pca': {'resources': {'threads': 4, 'mem_scale': 3}},
+    'transform_log2p': {'chunked': True, 'resources': {'mem_scale': 1}},
+}
+
+
+def test_get_data_size(tmp_path):
+    """Feather dataset sizes are estimated from their shape"""
+    path = str(tmp_path / 'dat.feather')
+    pd.DataFrame(np.zeros((100, 3)), columns=['a', 'b', 'c']).to_feather(path)
+
+    assert get_data_size(path) == 100 * 3 * 8
+    assert get_data_size(str(tmp_path / 'missing.feather')) == 0
+
+    assert estimate_mem_mb([path, path], 10, 2 ** 20 / 4800) == 11
+
+
+def test_limit_threads():
+    """Thread limits are passed on to BLAS/OpenMP libraries"""
+    limit_threads(2)
+    assert os.environ['OMP_NUM_THREADS'] == '2'
+
+
+def test_set_resources():
+    """Rule requirements combine dataset defaults, action settings and user overrides"""
+    defaults = {'filename': None, 'inline': True, 'local': False, 'reports': []}
+    actions = [
+        dict(defaults, action_name='transform_log2p'),
+        dict(defaults, action_name='project_pca', resources={'mem_mb': 500}),
+        dict(defaults, action_name='transform_zscore', resources={'threads': 2}),
+    ]
+
+    wrangler = SnakeWrangler('output', {})
+    wrangler.add_actions('dat', actions, name='dat', file_type='feather', path='dat.feather',
+                         compression=None)
+    wrangler.set_resources('dat', DEFAULTS, ACTION_CFGS)
+
+    rules = wrangler.datasets['dat']
+
+    assert rules['load_dat'].resources == DEFAULTS
+    assert rules['dat_transform_log2p'].resources == {'threads': 1, 'mem_mb': 1000, 'mem_scale': 1}
+    assert rules['dat_project_pca'].resources == {'threads': 4, 'mem_mb': 500, 'mem_scale': 3}
+    assert rules['dat_transform_zscore'].resources == {'threads': 2, 'mem_mb': 1000, 'mem_scale': 2}
+
+    # overrides are not passed on to actions
+    assert 'resources' not in rules['dat_project_pca'].params
@@ -0,0 +1,165 @@
+"""
+Snakes row-sharded execution tests
+"""
+import operator
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.errors import EmptyDataError
+from pandas.testing import assert_frame_equal
+from snakes import filters, shards, transforms
+from snakes.wrangler import SnakeWrangler
+
+# input dataframe (genes x samples)
+INPUT = pd.DataFrame(np.arange(40, dtype=np.float64).reshape(10, 4) % 7,
+                     index=pd.Index(['g{}'.format(i) for i in range(10)], name='gene'),
+                     columns=['s1', 's2', 's3', 's4'])
+
+ACTION_CFGS = {
+    'filter_rows_var_gt': {'chunked': {'when': {'quantile': None}}},
+    'aggregate_gene_sets': {'chunked': {'combine': 'func', 'when': {'func': ['sum', 'min', 'max']}}},
+    'transform_log2p': {'chunked': True},
+    'transform_zscore': {'chunked': {'when': {'axis': 1}}},
+}
+
+
+@pytest.fixture
+def infile(tmp_path):
+    """Writes the input dataset to a feather file"""
+    path = str(tmp_path / 'input.feather')
+    INPUT.reset_index().to_feather(path)
+    return path
+
+
+def _run_shards(infile, tmp_path, func, num_shards, batch_size=None, stats=False):
+    """Scatters a dataset, applies a function to each shard and gathers the results"""
+    inputs = [str(tmp_path / 'input.{}.feather'.format(i)) for i in range(num_shards)]
+    outputs = [str(tmp_path / 'output.{}.feather'.format(i)) for i in range(num_shards)]
+
+    shards.scatter(infile, inputs, batch_size=3)
+
+    for shard_input, shard_output in zip(inputs, outputs):
+        shards.apply_shard(shard_input, shard_output, func, stats=stats, batch_size=batch_size)
+
+    outfile = str(tmp_path / 'output.feather')
+    shards.gather(outputs, outfile, batch_size=batch_size)
+
+    return pd.read_feather(outfile).set_index('gene')
+
+
+@pytest.mark.parametrize("num_shards", [1, 3, 4, 12])
+def test_scatter(infile, tmp_path, num_shards):
+    """Shards contain contiguous ranges of rows"""
+    outfiles = [str(tmp_path / 'shard.{}.feather'.format(i)) for i in range(num_shards)]
+
+    shards.scatter(infile, outfiles, batch_size=3)
+
+    res = [pd.read_feather(x).set_index('gene') for x in outfiles]
+
+    assert max(x.shape[0] for x in res) - min(x.shape[0] for x in res) <= 1
+    assert_frame_equal(pd.concat(res), INPUT)
+
+
+@pytest.mark.parametrize("num_shards,batch_size", [(3, None), (12, None), (3, 2)])
+def test_apply_shards(infile, tmp_path, num_shards, batch_size):
+    """Row-wise actions applied to each shard give the same result as in memory"""
+    def func(dat, dat_stats=None):
+        dat = filters.filter_rows_by_func(dat, func=np.var, op=operator.gt, value=4,
+                                          stats=dat_stats)
+        return transforms.log2p(dat)
+
+    res = _run_shards(infile, tmp_path, func, num_shards, batch_size, stats=True)
+
+    assert_frame_equal(func(INPUT), res)
+
+
+def test_apply_shards_empty(infile, tmp_path):
+    """An exception is raised if no rows remain in any shard"""
+    def func(dat, dat_stats=None):
+        return filters.filter_rows_by_func(dat, func=np.sum, op=operator.gt, value=1000)
+
+    with pytest.raises(EmptyDataError):
+        _run_shards(infile, tmp_path, func, num_shards=3)
+
+
+def _add_dataset(actions, num_shards=2, reports=None):
+    """Creates a SnakeWrangler with a single dataset and splits its actions into shards"""
+    defaults = {'filename': None, 'inline': True, 'local': False, 'reports': []}
+    actions = [dict(defaults, action_name=name, **params) for name, params in actions]
+
+    wrangler = SnakeWrangler('output', {})
+    wrangler.add_actions('dat', actions, name='dat', file_type='feather', path='dat.feather',
+                         compression=None)
+
+    for rule_id in reports or []:
+        wrangler.reports['report_' + rule_id] = type('Report', (), {
+            'input': wrangler.get_output(rule_id)
+        })
+
+    sharding = {'num_shards': num_shards, 'shard_size': '1GB', 'max_shards': 8}
+    wrangler.shard_actions('dat', sharding, ACTION_CFGS)
+
+    return wrangler.datasets['dat']
+
+
+def test_shard_actions():
+    """Test insertion of scatter/gather rules around row-independent actions"""
+    rules = _add_dataset([
+        ('filter_rows_var_gt', {'value': 0, 'quantile': None}),
+        ('transform_log2p', {}),
+        ('transform_zscore', {'axis': 0}),
+        ('transform_zscore', {'axis': 1}),
+        ('aggregate_gene_sets', {'func': 'sum'}),
+    ])
+
+    assert list(rules) == [
+        'load_dat',
+        'dat_filter_rows_var_gt_scatter',
+        'dat_filter_rows_var_gt',
+        'dat_transform_log2p',
+        'dat_transform_log2p_gather',
+        'dat_transform_zscore',
+        'dat_transform_zscore_2_scatter',
+        'dat_transform_zscore_2',
+        'dat_transform_zscore_2_gather',
+        'dat_aggregate_gene_sets',
+    ]
+
+    assert rules['dat_filter_rows_var_gt_scatter'].output == [
+        'output/data/dat/shards/dat_filter_rows_var_gt_scatter.0.feather',
+        'output/data/dat/shards/dat_filter_rows_var_gt_scatter.1.feather',
+    ]
+    assert rules['dat_transform_log2p'].input == \
+        'output/data/dat/shards/dat_filter_rows_var_gt.{shard}.feather'
+    assert rules['dat_transform_log2p'].shards == 2
+
+    # downstream rules are unchanged
+    assert rules['dat_transform_log2p_gather'].output == \
+        'output/data/dat/dat_transform_log2p.feather'
+    assert rules['dat_transform_zscore'].input == 'output/data/dat/dat_transform_log2p.feather'
+
+
+def test_shard_actions_referenced():
+    """Sequences end at actions whose output is used elsewhere"""
+    rules = _add_dataset([
+        ('filter_rows_var_gt', {'value': 0, 'quantile': None}),
+        ('transform_log2p', {}),
+    ], reports=['dat_filter_rows_var_gt'])
+
+    assert list(rules) == [
+        'load_dat',
+        'dat_filter_rows_var_gt_scatter',
+        'dat_filter_rows_var_gt',
+        'dat_filter_rows_var_gt_gather',
+        'dat_transform_log2p_scatter',
+        'dat_transform_log2p',
+        'dat_transform_log2p_gather',
+    ]
+
+
+def test_shard_actions_disabled():
+    """Rules are left as-is when a single shard is requested"""
+    rules = _add_dataset([('transform_log2p', {})], num_shards=1)
+
+    assert list(rules) == ['load_dat', 'dat_transform_log2p']
+    assert rules['dat_transform_log2p'].shards is None
@@ -0,0 +1,136 @@
+"""
+Snakes dataset statistics tests
+"""
+import operator
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+from snakes import filters, stats
+
+#
+# input dataframe
+#
+#    x    y     z
+# a  1.0  2.0   3.0
+# b  5.0  10.0  15.0
+# c  2.0  0.0   NaN
+# d  4.0  4.0   4.0
+# e  0.0  7.0   1.0
+# f  NaN  NaN   NaN
+#
+INPUT = pd.DataFrame({'x': [1.0, 5.0, 2.0, 4.0, 0.0, np.nan],
+                      'y': [2.0, 10.0, 0.0, 4.0, 7.0, np.nan],
+                      'z': [3.0, 15.0, np.nan, 4.0, 1.0, np.nan]},
+                     index=['a', 'b', 'c', 'd', 'e', 'f'])
+
+
+@pytest.mark.parametrize("axis", [0, 1])
+@pytest.mark.parametrize("block_size", [None, 1, 4])
+def test_compute_stats(axis, block_size):
+    """Test computation of row and column statistics"""
+    res = stats.compute_stats(INPUT, block_size=block_size)
+
+    expected = {
+        'count': INPUT.count(axis=axis),
+        'na': INPUT.isnull().sum(axis=axis),
+        'nonzero': ((INPUT != 0) & INPUT.notnull()).sum(axis=axis),
+        'sum': INPUT.sum(axis=axis),
+        'sumsq': (INPUT ** 2).sum(axis=axis),
+        'min': INPUT.min(axis=axis),
+        'max': INPUT.max(axis=axis),
+        'mean': INPUT.mean(axis=axis),
+    }
+
+    for name, vals in expected.items():
+        np.testing.assert_allclose(stats.get_stat(res, name, axis=axis), vals)
+
+    for ddof in [0, 1]:
+        np.testing.assert_allclose(stats.get_stat(res, 'var', axis=axis, ddof=ddof),
+                                   INPUT.var(axis=axis, ddof=ddof))
+
+
+def test_compute_stats_constant():
+    """Rows with a single distinct value have a variance of exactly zero"""
+    df = pd.DataFrame({'x': [0.1] * 10, 'y': [1e8 + 0.1] * 10}).T
+    res = stats.compute_stats(df)
+
+    assert (stats.get_stat(res, 'var') == 0).all()
+
+
+def test_compute_stats_non_numeric():
+    """No statistics are computed for datasets with non-numeric columns"""
+    assert stats.compute_stats(INPUT.assign(w='foo')) is None
+
+
+def test_write_load_stats(tmp_path):
+    """Test sidecar round trip and stale sidecar detection"""
+    path = str(tmp_path / 'dat.feather')
+
+    INPUT.reset_index().to_feather(path)
+    stats.write_stats(INPUT, path)
+
+    res = stats.load_stats(path, INPUT)
+    expected = stats.compute_stats(INPUT)
+
+    assert_frame_equal(expected['rows'], res['rows'])
+    assert_frame_equal(expected['cols'], res['cols'])
+
+    # dimension mismatch
+    assert stats.load_stats(path, INPUT.iloc[:2]) is None
+
+    # snakemake touches outputs once each job has finished
+    os.utime(path, ns=(0, 0))
+    assert stats.load_stats(path, INPUT) is not None
+
+    # dataset modified after sidecar was written
+    INPUT.iloc[:2].reset_index().to_feather(path)
+    assert stats.load_stats(path) is None
+
+    # dataset rewritten with the same size after sidecar was written
+    INPUT.reset_index().to_feather(path, compression='uncompressed')
+    stats.write_stats(INPUT, path)
+    size = os.path.getsize(path)
+
+    (INPUT * 2).reset_index().to_feather(path, compression='uncompressed')
+    assert os.path.getsize(path) == size
+    assert stats.load_stats(path) is None
+
+    # non-numeric data removes existing sidecar
+    stats.write_stats(INPUT.assign(w='foo'), path)
+    assert not os.path.exists(stats.sidecar_path(path))
+    assert stats.load_stats(path) is None
+
+
+def test_remove_orphaned_sidecars(tmp_path):
+    """Sidecars are removed once their dataset has been removed"""
+    paths = [str(tmp_path / 'a.feather'), str(tmp_path / 'shards' / 'b.0.feather')]
+    os.makedirs(str(tmp_path / 'shards'))
+
+    for path in paths:
+        INPUT.reset_index().to_feather(path)
+        stats.write_stats(INPUT, path)
+
+    assert stats.remove_orphaned_sidecars([str(tmp_path)]) == []
+
+    os.remove(paths[1])
+
+    assert stats.remove_orphaned_sidecars([str(tmp_path)]) == [stats.sidecar_path(paths[1])]
+    assert os.path.exists(stats.sidecar_path(paths[0]))
+
+
+@pytest.mark.parametrize("func,kwargs", [
+    (filters.filter_rows_by_func, {'func': np.var, 'op': operator.gt, 'value': 0}),
+    (filters.filter_rows_by_func, {'func': np.sum, 'op': operator.gt, 'value': 7}),
+    (filters.filter_rows_by_func, {'func': np.var, 'op': operator.gt, 'quantile': 0.5}),
+    (filters.filter_cols_by_func, {'func': np.max, 'op': operator.gt, 'value': 5}),
+    (filters.filter_rows_by_na, {'op': operator.le, 'value': 0}),
+    (filters.filter_rows_by_nonzero, {'op': operator.ge, 'value': 3}),
+])
+def test_filters_with_stats(func, kwargs):
+    """Filters give the same result with and without precomputed statistics"""
+    expected = func(INPUT, **kwargs)
+    res = func(INPUT, stats=stats.compute_stats(INPUT), **kwargs)
+
+    assert_frame_equal(expected, res)
@@ -0,0 +1,51 @@
+"""
+Snakes synthetic data generator tests
+"""
+import os
+import pandas as pd
+import yaml
+from snakes import synthetic
+
+
+def test_get_sizes():
+    """Genes scale linearly and samples with the square root of the scale"""
+    assert synthetic.get_sizes(100) == {'genes': 50000, 'samples': 100, 'drugs': 1000,
+                                        'gene_sets': 2000}
+    assert synthetic.get_sizes(1, genes=20)['genes'] == 20
+
+
+def test_generate(tmp_path):
+    """Datasets and configs are written with the requested sizes and structure"""
+    output_dir = str(tmp_path / 'synthetic')
+
+    config_file = synthetic.generate(output_dir, genes=200, samples=8, drugs=4, gene_sets=5,
+                                     sparsity=0.2, missingness=0.1, duplicates=0.05)
+
+    data_dir = os.path.join(output_dir, 'data')
+
+    rnaseq = pd.read_csv(os.path.join(data_dir, 'features', 'rnaseq.csv'), index_col=0)
+    assert rnaseq.shape == (200, 8)
+    assert rnaseq.index.duplicated().sum() > 0
+    assert (rnaseq == 0).values.mean() >= 0.2
+
+    cnv = pd.read_csv(os.path.join(data_dir, 'features', 'cnv.csv'), index_col=0)
+    assert cnv.isnull().values.mean() > 0
+
+    curves = pd.read_csv(os.path.join(data_dir, 'response', 'drug_curves.csv'))
+    assert curves.shape[0] == 4 * 8
+    assert list(curves.columns[:3]) == ['cell_line', 'drug_id', 'drug_name']
+
+    with open(os.path.join(data_dir, 'gene_sets', 'gene_sets.gmt')) as fp:
+        assert len(fp.readlines()) == 5
+
+    with open(config_file) as fp:
+        config = yaml.safe_load(fp)
+
+    assert len(config['datasets']) == 4
+
+    with open(config['datasets'][0]) as fp:
+        rnaseq_cfg = yaml.safe_load(fp)
+
+    # duplicated gene ids are aggregated first
+    assert list(rnaseq_cfg['actions'][0]) == ['aggregate_duplicate_rows']
+    assert rnaseq_cfg['path'] == os.path.join(data_dir, 'features', 'rnaseq.csv')
@@ -0,0 +1,58 @@
+"""
+Snakes training set construction tests
+"""
+import pandas as pd
+import pytest
+from pandas.errors import EmptyDataError
+from snakes import training_sets
+
+SAMPLES = pd.Index(['s1', 's2', 's3'], name='sample')
+
+
+def _write(tmp_path, name, dat):
+    """Writes a dataset to a feather file and returns its path"""
+    path = str(tmp_path / (name + '.feather'))
+    dat.reset_index().to_feather(path)
+    return path
+
+
+def test_training_sets(tmp_path):
+    """Feature datasets are combined and joined with each response column"""
+    infiles = [
+        _write(tmp_path, 'rna', pd.DataFrame({'g1': [1.0, 2, 3]}, index=SAMPLES[::-1])),
+        _write(tmp_path, 'cnv', pd.DataFrame({'g1': [0.1, 0.2, 0.3]}, index=SAMPLES)),
+    ]
+
+    features = training_sets.load_features(infiles, include_column_prefix=True)
+
+    assert list(features.columns) == ['rna_g1', 'cnv_g1']
+    assert features.loc['s1'].tolist() == [3, 0.1]
+
+    response = pd.DataFrame({'drug1': [1, 2, 3], 'drug2': [4, 5, 6]}, index=SAMPLES)
+    res = dict(training_sets.create_training_sets(features, response))
+
+    assert list(res) == ['drug1', 'drug2']
+    assert list(res['drug2'].columns) == ['rna_g1', 'cnv_g1', 'response']
+    assert res['drug2']['response'].tolist() == [4, 5, 6]
+
+
+def test_training_sets_mismatched(tmp_path):
+    """Datasets with different rows are only combined if mismatched indices are allowed"""
+    infiles = [
+        _write(tmp_path, 'rna', pd.DataFrame({'a': [1.0, 2, 3]}, index=SAMPLES)),
+        _write(tmp_path, 'cnv', pd.DataFrame({'b': [1.0, 2]}, index=SAMPLES[:2])),
+    ]
+
+    with pytest.raises(ValueError):
+        training_sets.load_features(infiles)
+
+    features = training_sets.load_features(infiles, allow_mismatched_indices=True)
+
+    # rows of the first dataset are kept
+    assert features.index.equals(SAMPLES)
+    assert features['b'].isna().tolist() == [False, False, True]
+
+    response = pd.DataFrame({'drug1': [1, 2]}, index=pd.Index(['x1', 'x2'], name='sample'))
+
+    with pytest.raises(EmptyDataError):
+        list(training_sets.create_training_sets(features, response, True))
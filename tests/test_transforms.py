@@ -0,0 +1,112 @@
+"""
+Snakes transform tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+from snakes import transforms
+from snakes.rules import GroupedActionRule
+
+#
+# input dataframe (counts)
+#
+#    x    y     z
+# a  1.0  2.0   3.0
+# b  5.0  10.0  15.0
+# c  2.0  0.0   NaN
+# d  8.0  4.0   6.0
+# e  0.0  7.0   1.0
+#
+INPUT = pd.DataFrame({'x': [1.0, 5.0, 2.0, 8.0, 0.0],
+                      'y': [2.0, 10.0, 0.0, 4.0, 7.0],
+                      'z': [3.0, 15.0, np.nan, 6.0, 1.0]},
+                     index=['a', 'b', 'c', 'd', 'e'])
+
+
+def _zscore(df, axis):
+    """Reference z-score implementation"""
+    return df.apply(lambda x: (x - np.mean(x)) / np.std(x), axis=axis)
+
+
+@pytest.mark.parametrize("block_size", [None, 1, 2, 3])
+def test_cpm(block_size):
+    """Test counts-per-million normalization"""
+    expected = (INPUT / INPUT.sum()) * 1E6
+    assert_frame_equal(expected, transforms.cpm(INPUT, block_size=block_size))
+
+
+def test_log2():
+    """Test log2 transformations"""
+    assert_frame_equal(np.log2(INPUT + 1), transforms.log2p(INPUT))
+
+    with np.errstate(divide='ignore'):
+        assert_frame_equal(np.log2(INPUT), transforms.log2(INPUT))
+
+
+@pytest.mark.parametrize("axis", [0, 1])
+@pytest.mark.parametrize("block_size", [None, 1, 2])
+def test_zscore(axis, block_size):
+    """Test column and row-wise z-scores"""
+    expected = _zscore(INPUT, axis)
+    res = transforms.zscore(INPUT, axis=axis, block_size=block_size)
+    assert_frame_equal(expected, res)
+
+
+@pytest.mark.parametrize("block_size", [None, 1, 2])
+def test_apply_transforms_chain(block_size):
+    """Fused transforms give the same result as applying each transform in turn"""
+    steps = ['cpm', 'log2p', ('zscore', {'axis': 0})]
+
+    expected = _zscore(np.log2((INPUT / INPUT.sum()) * 1E6 + 1), 0)
+    res = transforms.apply_transforms(INPUT, steps, block_size=block_size)
+
+    assert_frame_equal(expected, res)
+
+
+def test_apply_transforms_inplace():
+    """Input is left unchanged unless inplace=True"""
+    df = INPUT.copy()
+
+    transforms.log2p(df)
+    assert_frame_equal(INPUT, df)
+
+    res = transforms.log2p(df, inplace=True)
+    assert np.shares_memory(res.to_numpy(), df.to_numpy())
+
+
+def test_apply_transforms_dtypes():
+    """Single-precision values keep their dtype; integers are converted to floats"""
+    res = transforms.zscore(INPUT.astype(np.float32))
+    assert (res.dtypes == np.float32).all()
+    np.testing.assert_allclose(res, _zscore(INPUT, 0), rtol=1e-5)
+
+    res = transforms.cpm(INPUT.fillna(0).astype(np.int64))
+    assert (res.dtypes == np.float64).all()
+
+
+def test_apply_transforms_invalid():
+    """Non-numeric data and unknown transforms raise an exception"""
+    with pytest.raises(ValueError, match="numeric"):
+        transforms.log2(INPUT.assign(w='foo'))
+
+    with pytest.raises(ValueError, match="Unknown transform"):
+        transforms.apply_transforms(INPUT, ['foo'])
+
+
+def test_group_transform_fusion():
+    """Consecutive transforms within an action group are fused into a single action"""
+    defaults = {'filename': None, 'inline': True, 'local': False, 'reports': []}
+
+    actions = [
+        dict(defaults, action_name='transform_cpm'),
+        dict(defaults, action_name='transform_log2p'),
+        dict(defaults, action_name='filter_rows_var_gt', value=0),
+        dict(defaults, action_name='transform_zscore', axis=1),
+    ]
+
+    rule = GroupedActionRule('group1', 'load', actions, 'in.feather', 'out.feather')
+
+    assert list(rule.actions) == ['transform_chain', 'filter_rows_var_gt', 'transform_zscore']
+    assert rule.actions['transform_chain'].params['steps'] == [('cpm', {}), ('log2p', {})]
+    assert rule.actions['transform_zscore'].params['axis'] == 1
@@ -0,0 +1,166 @@
+"""
+Snakes worker service tests
+"""
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from snakes import worker
+from snakes.renderer import _format_worker_call
+from snakes.worker import DataCache, WorkerClient, WorkerError, WorkerServer
+
+ACTION_CODE = '''
+        dat = load_data(input[0])
+        dat = dat * 2
+        save_data(dat, output[0])
+'''
+
+
+@pytest.fixture
+def dat():
+    """Creates a small dataset with a string index"""
+    index = pd.Index(['a', 'b', 'c'], dtype='string[pyarrow]', name='id')
+
+    return pd.DataFrame({'x': np.arange(3, dtype=np.float32), 'y': [1.0, np.nan, 3.0]},
+                        index=index)
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Runs a worker in a background thread"""
+    server = WorkerServer(str(tmp_path / 'worker.sock'), cache_size='1MB')
+
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+
+    client = WorkerClient(server.address)
+
+    while client.status() is None:
+        time.sleep(0.05)
+
+    yield server
+
+    client.stop()
+    thread.join()
+
+
+def test_save_load(dat, tmp_path):
+    """Datasets are written as by DataFrame.to_feather, and loaded as by pandas.read_feather"""
+    expected = str(tmp_path / 'expected.feather')
+    dat.reset_index().to_feather(expected, compression='lz4')
+
+    outfile = str(tmp_path / 'output.feather')
+    cache = DataCache()
+
+    worker.save_data(dat, outfile, cache)
+
+    assert open(outfile, 'rb').read() == open(expected, 'rb').read()
+
+    res = pd.read_feather(expected)
+    res = res.set_index(res.columns[0])
+
+    # cached and uncached datasets are identical
+    for loaded in [worker.load_data(outfile, cache), worker.load_data(outfile)]:
+        pd.testing.assert_frame_equal(loaded, res)
+
+    assert cache.hits == 1
+
+
+def test_cache_changed(dat, tmp_path):
+    """Cached datasets are not used once their file has changed"""
+    outfile = str(tmp_path / 'output.feather')
+    cache = DataCache()
+
+    worker.save_data(dat, outfile, cache)
+
+    # files are changed in place, keeping the same inode and size
+    dat.reset_index().assign(x=dat['x'].values[::-1]).to_feather(outfile, compression='lz4')
+
+    assert cache.get(outfile) is None
+    assert worker.load_data(outfile, cache)['x'].tolist() == [2.0, 1.0, 0.0]
+
+    os.remove(outfile)
+    assert cache.get(outfile) is None
+
+
+def test_cache_eviction(dat, tmp_path):
+    """The least recently used datasets are removed when the cache is full"""
+    paths = [str(tmp_path / '{}.feather'.format(i)) for i in range(3)]
+
+    cache = DataCache(1)
+    worker.save_data(dat, paths[0], cache)
+
+    # datasets larger than the cache are not cached
+    assert cache.info()['entries'] == 0
+
+    size = DataCache()
+    worker.save_data(dat, paths[0], size)
+
+    # cache with room for two datasets
+    cache = DataCache(2 * size.info()['size'])
+
+    worker.save_data(dat, paths[0], cache)
+    worker.save_data(dat, paths[1], cache)
+
+    cache.get(paths[0])
+    worker.save_data(dat, paths[2], cache)
+
+    assert cache.get(paths[0]) is not None
+    assert cache.get(paths[1]) is None
+    assert cache.get(paths[2]) is not None
+
+
+def test_server(dat, server, tmp_path):
+    """Action code is run by the worker, which keeps its outputs in memory"""
+    infile = str(tmp_path / 'input.feather')
+    outfile = str(tmp_path / 'output.feather')
+
+    dat.reset_index().to_feather(infile, compression='lz4')
+
+    client = WorkerClient(server.address)
+    client.run(ACTION_CODE, [infile], [outfile], threads=1)
+
+    pd.testing.assert_frame_equal(worker.load_data(outfile), worker.load_data(infile) * 2)
+
+    assert client.status()['cache']['entries'] == 2
+
+    # errors are raised in the client, with the worker traceback
+    with pytest.raises(WorkerError, match='FileNotFoundError'):
+        client.run(ACTION_CODE, [str(tmp_path / 'missing.feather')], [outfile], threads=1)
+
+
+def test_client_without_worker(dat, tmp_path):
+    """Action code is run in the current process if no worker is running"""
+    infile = str(tmp_path / 'input.feather')
+    outfile = str(tmp_path / 'output.feather')
+
+    dat.reset_index().to_feather(infile, compression='lz4')
+
+    client = WorkerClient(str(tmp_path / 'worker.sock'))
+
+    assert client.status() is None
+
+    client.run(ACTION_CODE, [infile], [outfile], threads=1)
+
+    pd.testing.assert_frame_equal(worker.load_data(outfile), worker.load_data(infile) * 2)
+
+
+def test_format_worker_call():
+    """Rule code is passed to the worker as a string literal, keeping its indentation"""
+    code = '        dat = load_data(input[0])\n        dat = dat.replace("\\\\t", " ")\n\n'
+
+    call = _format_worker_call(code, 'rule_a')
+
+    assert call.startswith('        worker_client.run(r"""\n')
+    assert call.endswith('""", input, output, threads, name=\'rule_a\')')
+
+    literal = call.strip()[len('worker_client.run('):].split(', input')[0]
+    assert eval(literal).strip('\n') == code.rstrip()
+
+    # code containing triple quotes is passed as a regular string literal
+    call = _format_worker_call('        x = """a"""', 'rule_b', generic=True)
+
+    assert call == ('        worker_client.run(\'        x = """a"""\', input, output, threads, '
+                    'params=params, name=\'rule_b\')')
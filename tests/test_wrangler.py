@@ -0,0 +1,225 @@
+"""
+Snakes SnakeWrangler tests
+"""
+from snakes.wrangler import SnakeWrangler
+
+DATASET_CFG = {'file_type': 'feather', 'compression': None, 'dtypes': {'float': 'float64'},
+               'stats': True, 'backend': {'type': 'pandas'}}
+
+
+def _action(name, **params):
+    """Returns an action config with default settings"""
+    return dict({'action_name': name, 'filename': None, 'inline': True, 'local': False,
+                 'reports': []}, **params)
+
+
+def _add_datasets(datasets, **kwargs):
+    """Creates a SnakeWrangler with one or more datasets and merges shared rules"""
+    wrangler = SnakeWrangler('output', {})
+    dataset_cfgs = {}
+
+    for name, path, actions in datasets:
+        dataset_cfgs[name] = dict(DATASET_CFG, name=name, path=path, **kwargs.get(name, {}))
+        wrangler.add_actions(name, actions, **dataset_cfgs[name])
+
+    wrangler.merge_shared_rules(dataset_cfgs)
+
+    return wrangler
+
+
+def test_merge_shared_rules_datasets():
+    """Datasets loaded from the same file share identical leading rules"""
+    wrangler = _add_datasets([
+        ('a', 'x.feather', [_action('filter_rows_max_na', value=0), _action('transform_log2p')]),
+        ('b', 'x.feather', [_action('filter_rows_max_na', value=0), _action('transform_cpm')]),
+        ('c', 'x.feather', [_action('filter_rows_max_na', value=1)]),
+    ])
+
+    assert list(wrangler.datasets['b']) == ['b_transform_cpm']
+    assert list(wrangler.datasets['c']) == ['c_filter_rows_max_na']
+
+    cpm = wrangler.datasets['b']['b_transform_cpm']
+
+    assert cpm.parent_id == 'a_filter_rows_max_na'
+    assert cpm.input == 'output/data/a/a_filter_rows_max_na.feather'
+    assert cpm.output == 'output/data/b/b_transform_cpm.feather'
+
+    assert wrangler.datasets['c']['c_filter_rows_max_na'].input == 'output/data/a/input.feather'
+
+    # references to merged rules resolve to the shared rules
+    assert wrangler.get_output('b_filter_rows_max_na') == wrangler.get_output('a_filter_rows_max_na')
+
+
+def test_merge_shared_rules_identical_datasets():
+    """Datasets whose rules are all merged into those of another dataset are left empty"""
+    wrangler = _add_datasets([
+        ('a', 'x.feather', [_action('transform_log2p')]),
+        ('b', 'x.feather', [_action('transform_log2p')]),
+    ])
+
+    assert list(wrangler.datasets['b']) == []
+    assert wrangler.get_output('b_transform_log2p') == wrangler.get_output('a_transform_log2p')
+
+    wrangler.shard_actions('b', {'num_shards': 2}, {'transform_log2p': {'chunked': True}})
+
+    assert list(wrangler.datasets['b']) == []
+
+
+def test_merge_shared_rules_branches():
+    """Identical branches within a dataset are merged"""
+    wrangler = _add_datasets([
+        ('a', 'x.feather', [
+            _action('transform_log2p'),
+            [_action('transform_zscore', axis=1)],
+            [_action('transform_zscore', axis=1), _action('filter_rows_sum_gt', value=0)],
+        ]),
+    ])
+
+    assert list(wrangler.datasets['a']) == [
+        'load_a', 'a_transform_log2p', 'a_transform_zscore', 'a_filter_rows_sum_gt'
+    ]
+    assert wrangler.datasets['a']['a_filter_rows_sum_gt'].parent_id == 'a_transform_zscore'
+
+
+def test_merge_shared_rules_settings():
+    """Rules are not merged if the dataset settings affecting their output differ"""
+    wrangler = _add_datasets([
+        ('a', 'x.feather', [_action('transform_log2p')]),
+        ('b', 'x.feather', [_action('transform_log2p')]),
+    ], b={'dtypes': {'float': 'float32'}})
+
+    assert list(wrangler.datasets['b']) == ['load_b', 'b_transform_log2p']
+
+
+def test_merge_shared_rules_filename():
+    """Rules with a user-specified output filename are kept"""
+    wrangler = _add_datasets([
+        ('a', 'x.feather', [_action('transform_log2p')]),
+        ('b', 'x.feather', [_action('transform_log2p', filename='log2.feather')]),
+    ])
+
+    assert list(wrangler.datasets['b']) == ['b_transform_log2p']
+    assert wrangler.datasets['b']['b_transform_log2p'].output == 'output/data/b/log2.feather'
+
+
+def test_merge_shared_rules_data_integration():
+    """Rules whose outputs are used for data integration are kept"""
+    wrangler = SnakeWrangler('output', {})
+    dataset_cfgs = {}
+
+    for name in ['a', 'b']:
+        dataset_cfgs[name] = dict(DATASET_CFG, name=name, path='x.feather')
+        wrangler.add_actions(name, [_action('transform_log2p')], **dataset_cfgs[name])
+
+    wrangler.add_data_integration_rules([
+        {'datasets': ['a_transform_log2p', 'b_transform_log2p'], 'type': 'cca'}
+    ])
+    wrangler.merge_shared_rules(dataset_cfgs)
+
+    assert list(wrangler.datasets['b']) == ['b_transform_log2p']
+    assert wrangler.data_integration[0].inputs == [
+        'output/data/a/a_transform_log2p.feather', 'output/data/b/b_transform_log2p.feather'
+    ]
+
+
+def test_rule_ids():
+    """Repeated actions are assigned the first available numeric suffix"""
+    wrangler = _add_datasets([
+        ('a', 'x.feather', [
+            _action('transform_log2p'),
+            _action('transform_zscore', id='a_transform_log2p_3'),
+            _action('transform_log2p'),
+            _action('transform_log2p'),
+        ]),
+    ])
+
+    assert list(wrangler.datasets['a']) == [
+        'load_a', 'a_transform_log2p', 'a_transform_log2p_3', 'a_transform_log2p_2',
+        'a_transform_log2p_4'
+    ]
+
+    # suffixes continue from the last one assigned
+    assert wrangler._get_action_rule_id('a', 'transform_log2p') == 'a_transform_log2p_5'
+
+
+def test_rule_index():
+    """Rule outputs and children are indexed, and updated when rules are merged"""
+    wrangler = _add_datasets([
+        ('a', 'x.feather', [_action('filter_rows_max_na', value=0), _action('transform_log2p')]),
+        ('b', 'x.feather', [_action('filter_rows_max_na', value=0), _action('transform_cpm')]),
+    ])
+
+    assert wrangler.get_output('a_transform_log2p') == 'output/data/a/a_transform_log2p.feather'
+    assert wrangler.get_output('unknown') is None
+
+    assert wrangler.get_children('a_filter_rows_max_na') == ['a_transform_log2p', 'b_transform_cpm']
+    assert wrangler.get_children('b_filter_rows_max_na') == []
+
+    assert wrangler.has_rule('load_a')
+    assert not wrangler.has_rule('load_b')
+
+
+def test_set_generic_rules():
+    """Actions with default ids and filenames are assigned to a generic rule for each type"""
+    wrangler = _add_datasets([
+        ('a', 'x.feather', [_action('transform_log2p'), _action('transform_log2p')]),
+        ('b', 'y.feather', [_action('transform_log2p'), _action('transform_zscore', id='z')]),
+    ])
+
+    wrangler.set_generic_rules()
+
+    assert list(wrangler.generic_rules) == ['generic_load_feather', 'generic_transform_log2p']
+    assert [x[1].rule_id for x in wrangler.generic_rules['generic_transform_log2p']] == [
+        'a_transform_log2p', 'a_transform_log2p_2', 'b_transform_log2p'
+    ]
+    assert wrangler.datasets['b']['z'].generic is None
+
+    assert wrangler.get_localrules() == 'generic_load_feather'
+
+
+def test_set_retention():
+    """Intermediate outputs are marked as temporary, and moved to the scratch directory"""
+    wrangler = _add_datasets([
+        ('a', 'x.feather', [
+            _action('transform_log2p'),
+            _action('transform_zscore', id='z'),
+            [_action('transform_cpm')],
+            _action('filter_rows_sum_gt', value=0),
+        ]),
+    ])
+
+    wrangler.set_retention('checkpoints', scratch_dir='scratch')
+
+    rules = wrangler.datasets['a']
+
+    assert [rule.temp for rule in rules.values()] == [True, True, False, False, False]
+
+    assert rules['load_a'].output == 'scratch/data/a/input.feather'
+    assert rules['a_transform_log2p'].input == 'scratch/data/a/input.feather'
+    assert rules['a_transform_log2p'].output == 'scratch/data/a/a_transform_log2p.feather'
+    assert rules['z'].input == 'scratch/data/a/a_transform_log2p.feather'
+    assert rules['z'].output == 'output/data/a/z.feather'
+
+    # generic rules for temporary outputs are separate
+    wrangler.set_generic_rules()
+
+    assert list(wrangler.generic_rules) == [
+        'generic_load_feather_temp', 'generic_transform_log2p_temp', 'generic_transform_cpm',
+        'generic_filter_rows_sum_gt'
+    ]
+
+
+def test_set_retention_terminal():
+    """Only the final outputs of each dataset and branch are kept"""
+    wrangler = _add_datasets([
+        ('a', 'x.feather', [
+            _action('transform_log2p', id='log2p'),
+            [_action('transform_cpm')],
+            _action('filter_rows_sum_gt', value=0),
+        ]),
+    ])
+
+    wrangler.set_retention('terminal')
+
+    assert [rule.temp for rule in wrangler.datasets['a'].values()] == [True, True, False, False]
+    assert wrangler.datasets['a']['log2p'].output == 'output/data/a/log2p.feather'